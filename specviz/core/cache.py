@@ -0,0 +1,115 @@
+from collections import OrderedDict
+
+__all__ = ['LRUCache']
+
+
+class LRUCache:
+    """
+    A small bounded mapping that evicts the least recently used entry once
+    more than ``maxsize`` entries are stored.
+
+    Parameters
+    ----------
+    maxsize : int
+        The maximum number of entries held by the cache.
+
+    Attributes
+    ----------
+    hits : int
+        The number of lookups that were answered from the cache.
+    misses : int
+        The number of lookups that were not found in the cache.
+    """
+    def __init__(self, maxsize=8):
+        self._maxsize = maxsize
+        self._store = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        """
+        The maximum number of entries held by the cache.
+        """
+        return self._maxsize
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, key):
+        return key in self._store
+
+    def get(self, key, default=None):
+        """
+        Retrieve the value stored for ``key`` and mark it as most recently
+        used.
+
+        Parameters
+        ----------
+        key : hashable
+            The key of the cached value.
+        default : object, optional
+            The value to return if ``key`` is not in the cache.
+
+        Returns
+        -------
+        object
+            The cached value, or ``default``.
+        """
+        if key not in self._store:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._store.move_to_end(key)
+
+        return self._store[key]
+
+    def put(self, key, value):
+        """
+        Store ``value`` under ``key``, evicting the least recently used
+        entries if the cache is full.
+
+        Parameters
+        ----------
+        key : hashable
+            The key of the cached value.
+        value : object
+            The value to cache.
+        """
+        self._store[key] = value
+        self._store.move_to_end(key)
+
+        while len(self._store) > self._maxsize:
+            self._store.popitem(last=False)
+
+    def get_or_compute(self, key, func):
+        """
+        Return the value cached under ``key``, calling ``func`` to compute and
+        store it if it is not present.
+
+        Parameters
+        ----------
+        key : hashable
+            The key of the cached value.
+        func : callable
+            A function taking no arguments that returns the value to cache.
+
+        Returns
+        -------
+        object
+            The cached or newly computed value.
+        """
+        value = self.get(key, self)
+
+        if value is self:
+            value = func()
+            self.put(key, value)
+
+        return value
+
+    def clear(self):
+        """
+        Remove all entries from the cache. Hit and miss counts are kept.
+        """
+        self._store.clear()
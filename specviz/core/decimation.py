@@ -0,0 +1,345 @@
+import numpy as np
+
+__all__ = ['MinMaxPyramid', 'DeclutterIndex']
+
+
+class MinMaxPyramid:
+    """
+    A precomputed level-of-detail representation of a step-mode spectrum.
+
+    Each level of the pyramid reduces the flux values of the previous level
+    in blocks of ``factor`` samples, keeping the minimum and maximum value of
+    each block so that peaks and troughs survive decimation. A decimated
+    block is rendered as two steps spanning the block, one at the minimum and
+    one at the maximum value.
+
+    Parameters
+    ----------
+    edges : array-like
+        The bin edges of the spectrum, of length ``len(values) + 1``. The
+        edges must be monotonically increasing or decreasing.
+    values : array-like
+        The flux values of each bin.
+    factor : int, optional
+        The number of blocks of a level that are combined into a single block
+        of the next level.
+    min_blocks : int, optional
+        No further levels are built once a level holds this many blocks or
+        fewer.
+
+    Raises
+    ------
+    ValueError
+        If the edges are not monotonic or do not match the length of the
+        values.
+    """
+    def __init__(self, edges, values, factor=4, min_blocks=512):
+        edges = np.asarray(edges, dtype=float)
+        values = np.asarray(values, dtype=float)
+
+        if edges.size != values.size + 1:
+            raise ValueError("Step mode requires len(edges) == len(values) + 1.")
+
+        diff = np.diff(edges)
+
+        if np.all(diff >= 0):
+            self._search_edges = edges
+            self._sign = 1
+        elif np.all(diff <= 0):
+            self._search_edges = -edges
+            self._sign = -1
+        else:
+            raise ValueError("Spectral axis must be monotonic to build a "
+                             "level-of-detail pyramid.")
+
+        self._edges = edges
+        self._values = values
+        self._factor = factor
+
+        # Each level holds the (minimum, maximum) values of its blocks. Level
+        # zero is the original data and is not stored twice.
+        self._levels = []
+
+        mins, maxs = values, values
+
+        while mins.size > max(min_blocks, 1):
+            mins = self._reduce(mins, np.fmin)
+            maxs = self._reduce(maxs, np.fmax)
+            self._levels.append((mins, maxs))
+
+        if self._levels:
+            top_mins, top_maxs = self._levels[-1]
+        else:
+            top_mins, top_maxs = values, values
+
+        self._value_bounds = (np.nanmin(top_mins) if top_mins.size else np.nan,
+                              np.nanmax(top_maxs) if top_maxs.size else np.nan)
+
+    def _reduce(self, values, ufunc):
+        """
+        Reduce ``values`` in blocks of ``factor`` using ``ufunc``, padding
+        the last block with NaN values, which ``fmin``/``fmax`` ignore.
+        """
+        remainder = values.size % self._factor
+
+        if remainder:
+            values = np.append(values,
+                               np.full(self._factor - remainder, np.nan))
+
+        return ufunc.reduce(values.reshape(-1, self._factor), axis=1)
+
+    @property
+    def levels(self):
+        """
+        The number of decimated levels in the pyramid, not including the
+        original data.
+        """
+        return len(self._levels)
+
+    def block_size(self, level):
+        """
+        The number of original samples covered by a block at ``level``.
+        """
+        return self._factor ** level
+
+    def bounds(self, axis):
+        """
+        The full data bounds along the given axis, as used by pyqtgraph's
+        ``dataBounds``.
+
+        Parameters
+        ----------
+        axis : int
+            ``0`` for the spectral axis and ``1`` for the flux axis.
+
+        Returns
+        -------
+        list
+            The minimum and maximum values, or ``[None, None]`` if the data
+            holds no finite values.
+        """
+        if axis == 0:
+            bounds = (np.nanmin(self._edges), np.nanmax(self._edges))
+        else:
+            bounds = self._value_bounds
+
+        if not np.all(np.isfinite(bounds)):
+            return [None, None]
+
+        return list(bounds)
+
+    def select(self, x_min, x_max, pixel_width, oversample=2):
+        """
+        Retrieve the step-mode data to render for the given visible range.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            The visible range of the spectral axis.
+        pixel_width : float
+            The width of the view in pixels.
+        oversample : float, optional
+            The number of rendered blocks allowed per pixel.
+
+        Returns
+        -------
+        x, y : `~numpy.ndarray`
+            The bin edges and values to render, satisfying
+            ``len(x) == len(y) + 1``.
+        """
+        size = self._values.size
+
+        # Find the range of original samples that are visible
+        lo, hi = sorted((self._sign * x_min, self._sign * x_max))
+        start = max(np.searchsorted(self._search_edges, lo, side='right') - 1, 0)
+        stop = min(np.searchsorted(self._search_edges, hi, side='left'), size)
+        stop = max(stop, start + 1)
+
+        # Choose the coarsest level that still provides enough blocks to
+        # fill the view at the requested resolution
+        budget = max(pixel_width, 1) * oversample
+        level = 0
+
+        while level < len(self._levels) and \
+                (stop - start) / self.block_size(level) > budget:
+            level += 1
+
+        if level == 0:
+            return self._edges[start:stop + 1], self._values[start:stop]
+
+        block = self.block_size(level)
+        mins, maxs = self._levels[level - 1]
+
+        # Include a block of padding on either side so that the rendered
+        # curve extends past the edges of the view
+        first = max(start // block - 1, 0)
+        last = min(-(-stop // block) + 1, mins.size)
+
+        # Each block is drawn as two half-block steps
+        half = block // 2
+        positions = np.arange(first * block, last * block, half)
+        positions = np.append(np.minimum(positions, size),
+                              min(last * block, size))
+
+        y = np.empty(2 * (last - first))
+        y[0::2] = mins[first:last]
+        y[1::2] = maxs[first:last]
+
+        return self._edges[positions], y
+
+
+class DeclutterIndex:
+    """
+    A precomputed multi-resolution index of point positions, used to thin
+    out annotations such as line labels so that they don't overlap at any
+    zoom level.
+
+    Level zero holds every point. Each following level divides the axis
+    into cells ``factor`` times wider than the previous level, anchored at
+    the first point, and keeps at most the first surviving point of each
+    cell. Points closer than half a cell to the previous candidate are
+    dropped as well, so that the survivors of a level are at least half a
+    cell apart. Since the cells are anchored to the data rather than to the
+    view, the points shown don't change while panning.
+
+    Parameters
+    ----------
+    x : array-like
+        The positions of the points, in any order. Non-finite positions are
+        never selected.
+    factor : int, optional
+        The ratio in between the cell widths of two successive levels.
+    """
+    def __init__(self, x, factor=2):
+        x = np.asarray(x, dtype=float)
+        rows = np.flatnonzero(np.isfinite(x))
+        rows = rows[np.argsort(x[rows], kind='stable')]
+
+        self._size = x.size
+        self._factor = factor
+
+        self._build(x[rows], rows)
+
+    def _build(self, positions, rows):
+        """
+        Build the levels of the index from the sorted positions of the
+        selectable points and their indices in the original array.
+        """
+        gaps = np.diff(positions)
+        gaps = gaps[gaps > 0]
+
+        # The first level separates the two closest distinct points
+        self._base = gaps.min() if gaps.size else 1.0
+
+        # Each level holds the sorted positions of its points along with
+        # their indices in the original array.
+        self._levels = [(positions, rows)]
+
+        while positions.size > 1:
+            width = self.cell_width(len(self._levels))
+            cells = np.floor((positions - positions[0]) / width)
+
+            keep = np.ones(positions.size, dtype=bool)
+            keep[1:] = (cells[1:] != cells[:-1]) & \
+                (np.diff(positions) >= width / 2)
+
+            positions = positions[keep]
+            rows = rows[keep]
+            self._levels.append((positions, rows))
+
+    def update(self, rows, x):
+        """
+        Move some of the points to new positions.
+
+        Only the moved points are sorted again, and merged into the sorted
+        positions of the other points, which is cheaper than building a new
+        index when few points move.
+
+        Parameters
+        ----------
+        rows : array-like of int
+            The indices in the original array of the points to move.
+        x : array-like
+            The new position of each moved point. Non-finite positions are
+            never selected.
+        """
+        rows = np.asarray(rows, dtype=int)
+        x = np.asarray(x, dtype=float)
+
+        positions, order = self._levels[0]
+
+        moved = np.zeros(self._size, dtype=bool)
+        moved[rows] = True
+        keep = ~moved[order]
+        positions, order = positions[keep], order[keep]
+
+        finite = np.isfinite(x)
+        rows, x = rows[finite], x[finite]
+        new_order = np.argsort(x, kind='stable')
+        rows, x = rows[new_order], x[new_order]
+
+        insert = np.searchsorted(positions, x, side='right')
+
+        self._build(np.insert(positions, insert, x),
+                    np.insert(order, insert, rows))
+
+    def __len__(self):
+        """The number of points that can be selected."""
+        return self._levels[0][0].size
+
+    @property
+    def levels(self):
+        """The number of levels in the index, including level zero."""
+        return len(self._levels)
+
+    def cell_width(self, level):
+        """
+        The width of a cell at ``level``, in data units. Level zero has no
+        cells and reports a width of zero.
+        """
+        if level == 0:
+            return 0.0
+
+        return self._base * self._factor ** (level - 1)
+
+    def select(self, x_min, x_max, separation):
+        """
+        Retrieve the points to display in the given visible range.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            The visible range of the axis.
+        separation : float
+            The minimum distance, in data units, in between two displayed
+            points. This is usually a number of pixels times the data units
+            per pixel of the view.
+
+        Returns
+        -------
+        `~numpy.ndarray`
+            The indices in the original array of the points to display,
+            sorted by position.
+        """
+        x_min, x_max = sorted((x_min, x_max))
+
+        # The coarsest level needed to keep survivors ``separation`` apart
+        level = 0
+
+        while level < len(self._levels) - 1 and \
+                self.cell_width(level) / 2 < separation:
+            level += 1
+
+        # When zoomed in on points that are represented by a neighbour at
+        # this level, fall back on finer levels rather than show nothing.
+        while level >= 0:
+            positions, rows = self._levels[level]
+            start = np.searchsorted(positions, x_min, side='left')
+            stop = np.searchsorted(positions, x_max, side='right')
+
+            if stop > start:
+                return rows[start:stop]
+
+            level -= 1
+
+        return np.empty(0, dtype=int)
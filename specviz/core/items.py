@@ -1,3 +1,5 @@
+import logging
+import weakref
 from itertools import cycle
 
 import astropy.units as u
@@ -7,6 +9,10 @@ from astropy.units import spectral, spectral_density
 from qtpy.QtCore import Qt, Signal
 from qtpy.QtGui import QStandardItem, QColor
 
+from .cache import LRUCache
+from .decimation import MinMaxPyramid
+from .lazy import LazySpectrum
+
 __all__ = ['DataItem', 'PlotDataItem']
 
 
@@ -24,8 +30,10 @@ class DataItem(QStandardItem):
         The name of this data item.
     identifier : :class:`uuid.UUID`
         The UUID of this data item.
-    data : :class:`specutils.Spectrum1D`
-        The internal spectrum object associated with this data item.
+    data : :class:`specutils.Spectrum1D` or :class:`~specviz.core.lazy.LazySpectrum`
+        The internal spectrum object associated with this data item. If a
+        lazy spectrum is given, its arrays are only memory-mapped when the
+        spectrum is first accessed.
 
     Attributes
     ----------
@@ -46,6 +54,14 @@ class DataItem(QStandardItem):
 
         self.setCheckable(True)
 
+        # Incremented whenever the stored spectrum is replaced so that
+        # consumers caching values derived from the data can detect changes
+        self._data_version = 0
+
+        # The plot data items currently displaying this data item, in any
+        # plot window
+        self._plot_items = weakref.WeakSet()
+
     @property
     def identifier(self):
         """
@@ -64,19 +80,35 @@ class DataItem(QStandardItem):
     def name(self, value):
         self.setData(value, self.NameRole)
 
+    @property
+    def plot_items(self):
+        """
+        The set of :class:`PlotDataItem` objects currently displaying this
+        data item, across all plot windows.
+        """
+        return self._plot_items
+
+    @property
+    def data_version(self):
+        """
+        A counter that is incremented every time the stored
+        :class:`~specutils.Spectrum1D` object is replaced.
+        """
+        return self._data_version
+
     @property
     def flux(self):
         """
         The flux values of the stored :class:`~specutils.Spectrum1D` object.
         """
-        return self.data(self.DataRole).flux
+        return self.spectrum.flux
 
     @property
     def spectral_axis(self):
         """
         The spectral axis of the stored :class:`~specutils.Spectrum1D` object.
         """
-        return self.data(self.DataRole).spectral_axis
+        return self.spectrum.spectral_axis
 
     @property
     def uncertainty(self):
@@ -84,21 +116,66 @@ class DataItem(QStandardItem):
         The flux uncertainty values of the stored :class:`~specutils.Spectrum1D`
         object.
         """
-        return self.data(self.DataRole).uncertainty
+        return self.spectrum.uncertainty
 
     def set_data(self, data):
         """
         Update the stored :class:`~specutils.Spectrum1D` data values.
         """
+        self._data_version += 1
         self.setData(data, self.DataRole)
         self.emitDataChanged()
 
     @property
     def spectrum(self):
         """
-        The stored :class:`~specutils.Spectrum1D` object.
+        The stored :class:`~specutils.Spectrum1D` object. If the data item is
+        backed by a :class:`~specviz.core.lazy.LazySpectrum`, it is
+        materialised on access.
         """
-        return self.data(self.DataRole)
+        data = self.data(self.DataRole)
+
+        if isinstance(data, LazySpectrum):
+            return data.spectrum
+
+        return data
+
+    @property
+    def is_lazy(self):
+        """
+        Whether the stored spectrum is backed by a
+        :class:`~specviz.core.lazy.LazySpectrum`.
+        """
+        return isinstance(self.data(self.DataRole), LazySpectrum)
+
+    @property
+    def lazy_spectrum(self):
+        """
+        The :class:`~specviz.core.lazy.LazySpectrum` backing the stored
+        spectrum, without materialising it, or `None` if the spectrum is not
+        lazily backed.
+        """
+        data = self.data(self.DataRole)
+
+        return data if isinstance(data, LazySpectrum) else None
+
+    def release(self):
+        """
+        Release the memory-mapped arrays of a lazily backed spectrum. This has
+        no effect for fully materialised spectra, or for lazy spectra holding
+        changes that are not in their backing files.
+
+        Returns
+        -------
+        bool
+            Whether the arrays of the spectrum were released.
+        """
+        data = self.data(self.DataRole)
+
+        if isinstance(data, LazySpectrum):
+            return data.release()
+
+        return False
 
 
 class PlotDataItem(pg.PlotDataItem):
@@ -120,6 +197,14 @@ class PlotDataItem(pg.PlotDataItem):
     width_changed = Signal(int)
     visibility_changed = Signal(bool)
 
+    # Step-mode spectra with at least this many samples are rendered through
+    # a level-of-detail pyramid
+    LOD_MIN_SAMPLES = 100000
+
+    # The level-of-detail pyramid, which ``getData`` may look up while the
+    # base class is being initialized
+    _lod = None
+
     def __init__(self, data_item, color=None, *args, **kwargs):
         super(PlotDataItem, self).__init__(stepMode=True, *args, **kwargs)
 
@@ -130,9 +215,15 @@ class PlotDataItem(pg.PlotDataItem):
         self._width = 1
         self._visible = False
 
+        # Cache of unit converted arrays keyed on the attribute name, the
+        # target unit, and the version of the underlying data
+        self._conversion_cache = LRUCache(maxsize=6)
+
         # Include error bar item
         self._error_bar_item = pg.ErrorBarItem(pen=[128, 128, 128, 200])
 
+        self._lod = None
+
         # Set data
         self.set_data()
         self._update_pen()
@@ -184,7 +275,7 @@ class PlotDataItem(pg.PlotDataItem):
         # they cross the middle of the bin.
         if self.opts.get('stepMode'):
             diff = np.diff(spectral_axis)
-            spectral_axis += np.append(diff, diff[-1]) * 0.5
+            spectral_axis = spectral_axis + np.append(diff, diff[-1]) * 0.5
 
         self._error_bar_item.setData(x=spectral_axis,
                                      y=self.flux,
@@ -277,6 +368,33 @@ class PlotDataItem(pg.PlotDataItem):
         self.data_unit = self.data_item.flux.unit.to_string()
         self.spectral_axis_unit = self.data_item.spectral_axis.unit.to_string()
 
+    def _converted(self, name, unit, func):
+        """
+        Retrieve a unit converted array from the conversion cache, computing
+        it with ``func`` if it has not been cached for the current unit and
+        data version.
+        """
+        def _compute():
+            value = func()
+
+            if value is not None:
+                value.flags.writeable = False
+
+            return value
+
+        key = (name, unit, self.data_item.data_version)
+
+        return self._conversion_cache.get_or_compute(key, _compute)
+
+    def clear_conversion_cache(self):
+        """
+        Discard all cached unit converted arrays. This is necessary if the
+        values of the underlying :class:`~specutils.Spectrum1D` object are
+        modified in place rather than replaced using
+        `~specviz.core.items.DataItem.set_data`.
+        """
+        self._conversion_cache.clear()
+
     @property
     def flux(self):
         """
@@ -284,9 +402,11 @@ class PlotDataItem(pg.PlotDataItem):
         object converted to the current data display units (given by
         `PlotDataItem.data_unit`).
         """
-        return self.data_item.flux.to(self.data_unit,
-                                      equivalencies=spectral_density(
-                                          self.data_item.spectral_axis)).value
+        return self._converted(
+            'flux', self.data_unit,
+            lambda: self.data_item.flux.to(
+                self.data_unit, equivalencies=spectral_density(
+                    self.data_item.spectral_axis)).value)
 
     @property
     def spectral_axis(self):
@@ -295,8 +415,10 @@ class PlotDataItem(pg.PlotDataItem):
         object converted to the current specrtal axis display units (given by
         `PlotDataItem.spectral_axis_unit`).
         """
-        return self.data_item.spectral_axis.to(self.spectral_axis_unit or "",
-                                               equivalencies=spectral()).value
+        return self._converted(
+            'spectral_axis', self.spectral_axis_unit,
+            lambda: self.data_item.spectral_axis.to(
+                self.spectral_axis_unit or "", equivalencies=spectral()).value)
 
     @property
     def uncertainty(self):
@@ -307,15 +429,18 @@ class PlotDataItem(pg.PlotDataItem):
 
         If no uncertainties are present, `None` is returned.
         """
-        if self.data_item.uncertainty is None:
-            return
+        def _convert():
+            if self.data_item.uncertainty is None:
+                return
+
+            uncertainty = self.data_item.uncertainty.array * \
+                          self.data_item.uncertainty.unit
 
-        uncertainty = self.data_item.uncertainty.array * \
-                      self.data_item.uncertainty.unit
+            return uncertainty.to(self.data_unit or "",
+                                  equivalencies=spectral_density(
+                                      self.data_item.spectral_axis)).value
 
-        return uncertainty.to(self.data_unit or "",
-                              equivalencies=spectral_density(
-                                  self.data_item.spectral_axis)).value
+        return self._converted('uncertainty', self.data_unit, _convert)
 
     @property
     def color(self):
@@ -374,26 +499,93 @@ class PlotDataItem(pg.PlotDataItem):
         """
         Sets the spectral_axis and flux. self.flux is called to convert flux
         units if they had been changed.
+
+        Any cached unit conversions are discarded, since callers use this
+        method to signal that the underlying data may have changed.
         """
+        self.clear_conversion_cache()
+
         spectral_axis = self.spectral_axis
+        flux = self.flux
 
         if self.opts.get('stepMode'):
-            spectral_axis = np.append(self.spectral_axis, self.spectral_axis[-1])
+            spectral_axis = np.append(spectral_axis, spectral_axis[-1])
+
+        self._build_lod(spectral_axis, flux)
 
-        self.setData(spectral_axis, self.flux, connect="finite")
+        self.setData(spectral_axis, flux, connect="finite")
 
         # Without this call, the plot tries to do autoRange based on DataItem (which does not change), when it should
         # instead be doing autoRange based on PlotDataItem, which updates based on what units are being used
         self._error_bar_item.setData(x=self.spectral_axis,
-                                     y=self.flux,
+                                     y=flux,
                                      height=self.uncertainty)
 
+    def _build_lod(self, spectral_axis, flux):
+        """
+        Build the level-of-detail pyramid used to render large step-mode
+        spectra. If the spectral axis is not monotonic the full resolution
+        data is always rendered.
+        """
+        self._lod = None
+
+        if not self.opts.get('stepMode') or flux.size < self.LOD_MIN_SAMPLES:
+            return
+
+        try:
+            self._lod = MinMaxPyramid(spectral_axis, flux)
+        except ValueError as e:
+            logging.debug("Level-of-detail rendering disabled for '%s': %s",
+                          self.data_item.name, e)
+
+    def _lod_data(self):
+        """
+        Select the level and visible slice of the level-of-detail pyramid
+        based on the current range and pixel width of the view box.
+        """
+        view = self.getViewBox()
+
+        if view is None or view.width() == 0:
+            return self.xData, self.yData
+
+        x_min, x_max = view.viewRange()[0]
+
+        return self._lod.select(x_min, x_max, view.width())
+
+    def viewRangeChanged(self, *args, **kwargs):
+        """
+        Re-render the visible slice of the spectrum when the view range
+        changes and level-of-detail rendering is in use.
+        """
+        super().viewRangeChanged(*args, **kwargs)
+
+        if self._lod is not None:
+            self.updateItems()
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        """
+        Override dataBounds so that auto-ranging considers the full spectrum,
+        rather than only the slice currently rendered from the
+        level-of-detail pyramid.
+        """
+        if self._lod is None or frac < 1.0 or orthoRange is not None or \
+                not self.curve.isVisible():
+            return super().dataBounds(ax, frac=frac, orthoRange=orthoRange)
+
+        return self._lod.bounds(ax)
+
     def getData(self):
         """
         Override getData method to ensure that the returned values fit the
         requirements of the pyqtgraph step mode: len(x) == len(y) + 1.
         Necessary for proper performance implementations.
+
+        If a level-of-detail pyramid has been built, the decimated data for
+        the current view is returned instead.
         """
+        if self._lod is not None:
+            return self._lod_data()
+
         try:
             x, y = super().getData()
         except (ValueError, IndexError):
@@ -0,0 +1,553 @@
+import atexit
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict, defaultdict, namedtuple
+
+import astropy.units as u
+import numpy as np
+from astropy.io import fits
+from astropy.modeling.tabular import Tabular1D
+from specutils import Spectrum1D
+
+__all__ = ['ArrayLocation', 'LazySpectrum', 'SourceArrays', 'get_spill_directory']
+
+
+_spill_directory = None
+
+
+def get_spill_directory():
+    """
+    Returns the directory used to hold the backing files of lazy spectra and
+    other memory-mapped arrays created during this session, creating it if
+    necessary. The directory is removed when the interpreter exits.
+    """
+    global _spill_directory
+
+    if _spill_directory is None:
+        _spill_directory = tempfile.mkdtemp(prefix='specviz-')
+        atexit.register(shutil.rmtree, _spill_directory, ignore_errors=True)
+
+    return _spill_directory
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# The location of an array in a file. Arrays written by specviz are
+# contiguous and have no strides, arrays referenced in a source file, e.g.
+# table columns, may be strided.
+ArrayLocation = namedtuple('ArrayLocation',
+                           ['path', 'offset', 'dtype', 'shape', 'strides'])
+
+# FITS table column formats that are stored as plain numeric arrays
+_NUMERIC_FORMATS = 'BIJKED'
+
+
+def _fingerprint(array):
+    """
+    A cheap key identifying the values of an array, made of its shape and a
+    few of its values, used to find candidate matches of an array among the
+    arrays of a file without comparing all their values.
+    """
+    samples = []
+
+    if array.size > 0:
+        for i in (0, array.size // 2, array.size - 1):
+            value = float(array.flat[i])
+            samples.append(None if np.isnan(value) else value)
+
+    return tuple(array.shape), tuple(samples)
+
+
+class SourceArrays:
+    """
+    An index of the arrays stored as they are in a FITS file, used to
+    reference the arrays of spectra read from the file in place rather than
+    copying them to a backing file.
+
+    Unscaled image data, and numeric table columns along with each row of
+    vector columns, can be referenced. Arrays that have been converted when
+    read, e.g. scaled or changed to other units, are not found in the file.
+    Files that are not FITS files hold no arrays that can be referenced.
+
+    The file is kept open until the index is closed, so this is best used as
+    a context manager while the spectra read from the file are stored.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file the spectra were read from.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._hdulist = None
+        self._candidates = defaultdict(list)
+
+        try:
+            self._hdulist = fits.open(path, memmap=True)
+
+            for hdu in self._hdulist:
+                self._add_hdu(hdu)
+        except (OSError, ValueError) as e:
+            logging.debug("No arrays of '%s' can be referenced: %s", path, e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Close the file. Arrays already referenced remain valid.
+        """
+        self._candidates.clear()
+
+        if self._hdulist is not None:
+            self._hdulist.close()
+            self._hdulist = None
+
+    def _add_hdu(self, hdu):
+        data_offset = hdu.fileinfo()['datLoc']
+
+        if isinstance(hdu, fits.BinTableHDU):
+            if hdu.data is None:
+                return
+
+            raw = np.ndarray.view(hdu.data, np.ndarray)
+
+            for column in hdu.columns:
+                if column.format.format not in _NUMERIC_FORMATS or \
+                        column.format.p_format is not None or \
+                        column.bscale not in (None, 1) or \
+                        column.bzero not in (None, 0):
+                    continue
+
+                values = raw[column.name]
+                self._add(values, raw, data_offset)
+
+                # Each row of a vector column may hold a spectrum
+                if values.ndim > 1:
+                    for row in values:
+                        self._add(row, raw, data_offset)
+        elif isinstance(hdu, (fits.PrimaryHDU, fits.ImageHDU)):
+            if hdu.header.get('BSCALE', 1) != 1 or \
+                    hdu.header.get('BZERO', 0) != 0 or hdu.data is None:
+                return
+
+            self._add(hdu.data, hdu.data, data_offset)
+
+    def _add(self, array, data, data_offset):
+        """
+        Add an array that is a view of the data of an HDU, which starts at
+        ``data_offset`` in the file.
+        """
+        if array.dtype.kind not in 'fiu' or array.size == 0:
+            return
+
+        offset = data_offset + array.ctypes.data - data.ctypes.data
+
+        self._candidates[_fingerprint(array)].append(
+            (array, ArrayLocation(self._path, offset, array.dtype.str,
+                                  array.shape, array.strides)))
+
+    def locate(self, array):
+        """
+        Find an array with the given values in the file.
+
+        Parameters
+        ----------
+        array : `~numpy.ndarray`
+            The values to look for.
+
+        Returns
+        -------
+        `ArrayLocation` or `None`
+            The location of the array in the file, or `None` if the file
+            holds no array with these values.
+        """
+        array = np.asarray(array)
+
+        if array.dtype.kind not in 'fiu' or array.size == 0:
+            return
+
+        for candidate, location in self._candidates.get(
+                _fingerprint(array), []):
+            if np.array_equal(candidate, array,
+                              equal_nan=array.dtype.kind == 'f'):
+                return location
+
+
+class LazySpectrum:
+    """
+    A lazily materialised :class:`~specutils.Spectrum1D` whose arrays are
+    memory-mapped from files.
+
+    The spectrum only keeps a reference to the file holding each array
+    along with its offset, data type, shape and strides, e.g. the HDU of the
+    FITS file the spectrum was read from. The arrays are memory-mapped and
+    wrapped in a :class:`~specutils.Spectrum1D` object on first access.
+    Changes made to the arrays in place are written to the backing file
+    owned by the lazy spectrum, if any, while changes to arrays mapped from
+    other files are kept in memory, and the spectrum is then no longer
+    released.
+    Materialised spectra are tracked in a least recently used registry and
+    released again once the total size of all materialised spectra exceeds
+    `LazySpectrum.max_resident_bytes`. Since the mapped pages are backed by a
+    file, the operating system is also free to reclaim them under memory
+    pressure.
+
+    Parameters
+    ----------
+    layout : dict
+        Mapping of array names (``'flux'``, ``'spectral_axis'``,
+        ``'uncertainty'`` and ``'mask'``) to the `ArrayLocation` of each
+        array.
+    units : dict
+        Mapping of array names to their units.
+    uncertainty_type : type, optional
+        The :class:`~astropy.nddata.NDUncertainty` subclass used to wrap the
+        uncertainty array.
+    meta : dict, optional
+        The meta data of the spectrum.
+    wcs : `~astropy.wcs.WCS` or `~gwcs.wcs.WCS`, optional
+        The WCS of the spectrum, from which its spectral axis is computed.
+        If not given, the spectral axis is mapped from the backing file.
+    velocity_convention : str, optional
+        The velocity convention of the spectrum.
+    rest_value : `~astropy.units.Quantity`, optional
+        The rest value of the spectral axis of the spectrum.
+    radial_velocity : `~astropy.units.Quantity`, optional
+        The radial velocity of the spectrum.
+    path : str, optional
+        Path to the backing file owned by this spectrum, which is deleted
+        when this object is garbage collected.
+    """
+    max_resident_bytes = 2 * 1024 ** 3
+
+    # Ordered mapping of the ids of materialised lazy spectra to weak
+    # references to the objects and their sizes, with the most recently used
+    # last, along with the total size of the registered spectra. Lazy
+    # spectra may be materialised from worker threads, so the registry and
+    # the materialisation are guarded by a lock.
+    _resident = OrderedDict()
+    _resident_bytes = 0
+    _lock = threading.RLock()
+
+    def __init__(self, layout, units, uncertainty_type=None, meta=None,
+                 wcs=None, velocity_convention=None, rest_value=None,
+                 radial_velocity=None, path=None):
+        self._path = path
+        self._layout = {name: ArrayLocation(*location)
+                        for name, location in layout.items()}
+        self._units = units
+        self._uncertainty_type = uncertainty_type
+        self._meta = meta
+        self._wcs = wcs
+        self._velocity_convention = velocity_convention
+        self._rest_value = rest_value
+        self._radial_velocity = radial_velocity
+        self._spectrum = None
+
+        if path is not None:
+            weakref.finalize(self, _remove_file, path)
+
+    @classmethod
+    def from_spectrum(cls, spectrum, directory=None, source=None):
+        """
+        Create a lazy spectrum referencing the arrays of a
+        :class:`~specutils.Spectrum1D` object.
+
+        Arrays found in the ``source`` file the spectrum was read from are
+        referenced in place. The other arrays are written to a backing file.
+        The spectrum itself is not referenced, so that its arrays can be
+        freed once the caller drops it.
+
+        Parameters
+        ----------
+        spectrum : :class:`~specutils.Spectrum1D`
+            The spectrum to store.
+        directory : str, optional
+            The directory in which to create the backing file. Defaults to a
+            temporary directory removed when specviz exits.
+        source : `SourceArrays`, optional
+            The arrays of the file the spectrum was read from.
+
+        Returns
+        -------
+        `LazySpectrum`
+            The lazy spectrum referencing the arrays.
+        """
+        arrays = OrderedDict([('flux', spectrum.flux.value)])
+        units = {'flux': spectrum.flux.unit}
+        uncertainty_type = None
+        wcs = spectrum.wcs
+
+        # A lookup table WCS holds the spectral axis itself, and is rebuilt
+        # from the mapped spectral axis instead of being kept in memory
+        if isinstance(getattr(wcs, 'forward_transform', None), Tabular1D):
+            wcs = None
+            arrays['spectral_axis'] = spectrum.spectral_axis.value
+            units['spectral_axis'] = spectrum.spectral_axis.unit
+
+        if spectrum.uncertainty is not None:
+            arrays['uncertainty'] = spectrum.uncertainty.array
+            units['uncertainty'] = spectrum.uncertainty.unit
+            uncertainty_type = type(spectrum.uncertainty)
+
+        if spectrum.mask is not None:
+            arrays['mask'] = spectrum.mask
+
+        layout = {}
+
+        if source is not None:
+            for name in list(arrays):
+                location = source.locate(arrays[name])
+
+                if location is not None:
+                    layout[name] = location
+                    del arrays[name]
+
+        path = None
+
+        if len(arrays) > 0:
+            path = os.path.join(directory or get_spill_directory(),
+                                "{}.bin".format(uuid.uuid4()))
+
+            with open(path, 'wb') as f:
+                for name, array in arrays.items():
+                    array = np.ascontiguousarray(array)
+
+                    # Align each array on a 64 byte boundary
+                    f.seek(-f.tell() % 64, os.SEEK_CUR)
+
+                    layout[name] = ArrayLocation(path, f.tell(),
+                                                 array.dtype.str,
+                                                 array.shape, None)
+                    array.tofile(f)
+
+        return cls(layout, units, uncertainty_type=uncertainty_type,
+                   meta=spectrum.meta, wcs=wcs,
+                   velocity_convention=spectrum.velocity_convention,
+                   rest_value=spectrum.rest_value,
+                   radial_velocity=spectrum.radial_velocity, path=path)
+
+    @property
+    def path(self):
+        """
+        Path to the backing file owned by this spectrum, or `None` if all its
+        arrays are referenced in other files.
+        """
+        return self._path
+
+    @property
+    def layout(self):
+        """
+        Mapping of array names to the `ArrayLocation` of each array.
+        """
+        return self._layout
+
+    @property
+    def nbytes(self):
+        """
+        The total size in bytes of the arrays of this spectrum.
+        """
+        return sum(np.dtype(location.dtype).itemsize *
+                   int(np.prod(location.shape))
+                   for location in self._layout.values())
+
+    @property
+    def is_materialized(self):
+        """
+        Whether the arrays of this spectrum are currently mapped.
+        """
+        return self._spectrum is not None
+
+    def _map(self, name, mode=None):
+        if name not in self._layout:
+            return
+
+        path, offset, dtype, shape, strides = self._layout[name]
+
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype=dtype)
+
+        # Owned backing files are private to this spectrum and take the
+        # changes made in place, other files are mapped copy-on-write
+        if mode is None:
+            mode = 'r+' if path == self._path else 'c'
+
+        if strides is None:
+            return np.memmap(path, dtype=dtype, mode=mode, offset=offset,
+                             shape=shape)
+
+        # Strided arrays, e.g. table columns, are views of a mapping of the
+        # whole file, of which only the pages accessed are read
+        return np.ndarray(shape, dtype=dtype,
+                          buffer=np.memmap(path, dtype=np.uint8, mode=mode),
+                          offset=offset, strides=strides)
+
+    def _materialize(self):
+        logging.debug("Memory-mapping spectrum arrays from %s.", ", ".join(
+            sorted({"'{}'".format(location.path)
+                    for location in self._layout.values()})))
+
+        flux = u.Quantity(self._map('flux'), self._units['flux'], copy=False)
+        uncertainty = None
+
+        if self._wcs is not None:
+            axis = {'wcs': self._wcs}
+        else:
+            axis = {'spectral_axis': u.Quantity(
+                self._map('spectral_axis'), self._units['spectral_axis'],
+                copy=False)}
+
+        if self._uncertainty_type is not None:
+            uncertainty = self._uncertainty_type(
+                self._map('uncertainty'), unit=self._units.get('uncertainty'),
+                copy=False)
+
+        return Spectrum1D(flux=flux, uncertainty=uncertainty,
+                          mask=self._map('mask'), meta=self._meta,
+                          velocity_convention=self._velocity_convention,
+                          rest_value=self._rest_value,
+                          radial_velocity=self._radial_velocity, **axis)
+
+    @classmethod
+    def _unregister(cls, key, ref=None):
+        """
+        Remove an entry from the registry of materialised spectra. If a weak
+        reference is given, the entry is only removed if it still holds that
+        reference, since the id of a collected spectrum may be reused.
+        """
+        with cls._lock:
+            entry = cls._resident.get(key)
+
+            if entry is not None and (ref is None or entry[0] is ref):
+                del cls._resident[key]
+                cls._resident_bytes -= entry[1]
+
+    def _register(self):
+        """
+        Add this spectrum as the most recently used one to the registry of
+        materialised spectra, releasing the least recently used spectra until
+        the resident size limit is no longer exceeded.
+        """
+        resident = LazySpectrum._resident
+        key = id(self)
+
+        # Spectra collected while materialised are removed from the registry
+        # by the weak reference callback
+        ref = weakref.ref(
+            self, lambda ref, key=key: LazySpectrum._unregister(key, ref))
+
+        resident[key] = (ref, self.nbytes)
+        LazySpectrum._resident_bytes += self.nbytes
+
+        while LazySpectrum._resident_bytes > self.max_resident_bytes:
+            oldest, (ref, _) = next(iter(resident.items()))
+            spectrum = ref()
+
+            # Only this spectrum is left once it is the least recently used
+            if spectrum is self:
+                break
+
+            if spectrum is None:
+                LazySpectrum._unregister(oldest, ref)
+            else:
+                # Either releases the spectrum or, if it was modified, keeps
+                # it; in both cases it leaves the registry
+                spectrum.release()
+
+    @property
+    def spectrum(self):
+        """
+        The :class:`~specutils.Spectrum1D` object backed by the memory-mapped
+        arrays, materialised on first access.
+        """
+        with LazySpectrum._lock:
+            spectrum = self._spectrum
+
+            if spectrum is None:
+                spectrum = self._spectrum = self._materialize()
+                self._register()
+            elif id(self) in LazySpectrum._resident:
+                LazySpectrum._resident.move_to_end(id(self))
+
+        return spectrum
+
+    def _arrays(self, spectrum):
+        """
+        The arrays currently held by the materialised spectrum, by name.
+        """
+        arrays = {'flux': spectrum.data, 'mask': spectrum.mask}
+
+        if 'spectral_axis' in self._layout:
+            arrays['spectral_axis'] = spectrum.spectral_axis.value
+
+        if spectrum.uncertainty is not None:
+            arrays['uncertainty'] = spectrum.uncertainty.array
+
+        return arrays
+
+    @property
+    def is_modified(self):
+        """
+        Whether the materialised spectrum holds values that differ from the
+        backing files, i.e. changes made in place to arrays mapped
+        copy-on-write, or arrays that were replaced. Such changes would be
+        lost by releasing the spectrum, so it is kept materialised.
+        """
+        with LazySpectrum._lock:
+            spectrum = self._spectrum
+
+            if spectrum is None:
+                return False
+
+            arrays = self._arrays(spectrum)
+
+            for name in self._layout:
+                array = arrays.get(name)
+                original = self._map(name, mode='r')
+
+                if array is None or array.shape != original.shape:
+                    return True
+
+                if not np.array_equal(array, original,
+                                      equal_nan=array.dtype.kind in 'fc'):
+                    return True
+
+            return False
+
+    def release(self):
+        """
+        Drop the materialised spectrum and its memory-mapped arrays. They
+        will be mapped again the next time the spectrum is accessed.
+
+        Spectra holding changes that are not in their backing files (see
+        `is_modified`) are not released, and are no longer subject to the
+        resident size limit.
+
+        Returns
+        -------
+        bool
+            Whether the spectrum was released.
+        """
+        with LazySpectrum._lock:
+            LazySpectrum._unregister(id(self))
+
+            if self.is_modified:
+                return False
+
+            self._spectrum = None
+
+            return True
@@ -0,0 +1,243 @@
+import numpy as np
+
+__all__ = ['line_flux', 'centroid', 'equivalent_width', 'fwhm']
+
+# Array-native versions of the line analysis functions of
+# `specutils.analysis`, measuring any number of regions of a spectrum at
+# once. The regions are given as (lo, hi) sample index bounds, where the
+# upper bound is excluded as in a slice, e.g. as found by
+# `~specviz.plugins.statistics.statistics_index.StatisticsIndex.region_slice`.
+# Each measure follows the definition of its specutils counterpart applied
+# to the samples of a region, and is `nan` for regions holding no samples.
+# The line flux, and the equivalent width derived from it, keep the
+# definition of specutils before 1.0, which weights each sample by the
+# interval leading up to it rather than by the width of its bin.
+
+
+def _bounds(bounds, size):
+    """
+    Split ``bounds`` into arrays of lower and upper bounds, clipped to the
+    samples of a spectrum.
+    """
+    bounds = np.asarray(bounds, dtype=np.intp).reshape(-1, 2)
+
+    lo = np.clip(bounds[:, 0], 0, size)
+    hi = np.clip(bounds[:, 1], lo, size)
+
+    return lo, hi
+
+
+def _gather(lo, hi):
+    """
+    The indices of the samples of all regions, concatenated, along with the
+    offset of each region within them.
+    """
+    counts = hi - lo
+    offsets = np.zeros(counts.size, dtype=np.intp)
+    np.cumsum(counts[:-1], out=offsets[1:])
+
+    indices = np.arange(counts.sum()) + np.repeat(lo - offsets, counts)
+
+    return indices, offsets, counts
+
+
+def _reduce(ufunc, values, offsets, counts, empty=np.nan):
+    """
+    Reduce the gathered ``values`` of each region with ``ufunc``, giving
+    ``empty`` for regions holding no samples.
+    """
+    result = np.full(counts.size, empty, dtype=values.dtype)
+    filled = counts > 0
+
+    if filled.any():
+        result[filled] = ufunc.reduceat(values, offsets[filled])
+
+    return result
+
+
+def line_flux(spectral_axis, flux, bounds):
+    """
+    Compute the line flux of each region of a spectrum, as
+    :func:`specutils.analysis.line_flux` does.
+
+    Parameters
+    ----------
+    spectral_axis : array-like
+        The spectral axis values.
+    flux : array-like
+        The flux values of each sample.
+    bounds : array-like
+        The (lo, hi) sample index bounds of each region.
+
+    Returns
+    -------
+    `~numpy.ndarray`
+        The sum of the flux of each sample of a region times the width of
+        the interval leading up to it from the previous sample, in the units
+        of the flux times the units of the spectral axis.
+    """
+    spectral_axis = np.asarray(spectral_axis, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+    lo, hi = _bounds(bounds, flux.size)
+
+    # The first sample of a region has no interval leading up to it within
+    # the region, and is left out of the sum
+    weighted = np.zeros(flux.size)
+    weighted[1:] = flux[1:] * np.diff(spectral_axis)
+
+    indices, offsets, counts = _gather(np.minimum(lo + 1, hi), hi)
+    result = _reduce(np.add, weighted[indices], offsets, counts, empty=0.)
+    result[hi == lo] = np.nan
+
+    return result
+
+
+def centroid(spectral_axis, flux, bounds):
+    """
+    Compute the centroid of each region of a spectrum, as
+    :func:`specutils.analysis.centroid` does.
+
+    Parameters
+    ----------
+    spectral_axis : array-like
+        The spectral axis values.
+    flux : array-like
+        The flux values of each sample.
+    bounds : array-like
+        The (lo, hi) sample index bounds of each region.
+
+    Returns
+    -------
+    `~numpy.ndarray`
+        The flux weighted mean of the spectral axis over each region.
+    """
+    spectral_axis = np.asarray(spectral_axis, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+    lo, hi = _bounds(bounds, flux.size)
+
+    indices, offsets, counts = _gather(lo, hi)
+    values = flux[indices]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (_reduce(np.add, values * spectral_axis[indices], offsets, counts) /
+                _reduce(np.add, values, offsets, counts))
+
+
+def equivalent_width(spectral_axis, flux, bounds, continuum=1):
+    """
+    Compute the equivalent width of each region of a spectrum, as
+    :func:`specutils.analysis.equivalent_width` does.
+
+    Parameters
+    ----------
+    spectral_axis : array-like
+        The spectral axis values.
+    flux : array-like
+        The flux values of each sample, which should be normalized to the
+        continuum.
+    bounds : array-like
+        The (lo, hi) sample index bounds of each region.
+    continuum : float or array-like, optional
+        The continuum level, for all regions or for each of them.
+
+    Returns
+    -------
+    `~numpy.ndarray`
+        The equivalent width of each region, in the units of the spectral
+        axis.
+    """
+    spectral_axis = np.asarray(spectral_axis, dtype=float)
+    lo, hi = _bounds(bounds, spectral_axis.size)
+
+    filled = hi > lo
+    width = np.full(lo.size, np.nan)
+    width[filled] = spectral_axis[hi[filled] - 1] - spectral_axis[lo[filled]]
+
+    return width - line_flux(spectral_axis, flux, bounds) / continuum
+
+
+def fwhm(spectral_axis, flux, bounds):
+    """
+    Compute the full width at half maximum of each region of a spectrum, as
+    :func:`specutils.analysis.fwhm` does.
+
+    The half maximum is located on either side of the maximum of a region by
+    linear interpolation between the last sample above it and the first
+    sample below it, or at the end of the region if the flux does not drop
+    below it.
+
+    Parameters
+    ----------
+    spectral_axis : array-like
+        The spectral axis values.
+    flux : array-like
+        The flux values of each sample, which should be continuum
+        subtracted.
+    bounds : array-like
+        The (lo, hi) sample index bounds of each region.
+
+    Returns
+    -------
+    `~numpy.ndarray`
+        The full width at half maximum of each region, in the units of the
+        spectral axis.
+    """
+    spectral_axis = np.asarray(spectral_axis, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+    lo, hi = _bounds(bounds, flux.size)
+
+    result = np.full(lo.size, np.nan)
+    filled = hi > lo
+
+    if not filled.any():
+        return result
+
+    lo, hi = lo[filled], hi[filled]
+    indices, offsets, counts = _gather(lo, hi)
+    region = np.repeat(np.arange(lo.size), counts)
+    values = flux[indices]
+
+    # The first maximum of each region, where a nan value counts as the
+    # maximum as it does for `numpy.argmax`
+    nans = np.isnan(values)
+    peaks = np.where(nans, np.inf, values)
+    is_peak = peaks == np.maximum.reduceat(peaks, offsets)[region]
+    argmax = np.minimum.reduceat(np.where(is_peak, indices, flux.size),
+                                 offsets)
+
+    halfval = flux[argmax] / 2
+    below = values < halfval[region]
+
+    # The last sample below the half maximum before the peak, and the first
+    # one after it
+    before = np.maximum.reduceat(
+        np.where(below & (indices < argmax[region]), indices, -1), offsets)
+    after = np.minimum.reduceat(
+        np.where(below & (indices > argmax[region]), indices, flux.size),
+        offsets)
+
+    def interpolate(i0, i1):
+        left_flux = flux[i0]
+        left_spectral = spectral_axis[i0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return ((halfval - left_flux)
+                    * (spectral_axis[i1] - left_spectral)
+                    / (flux[i1] - left_flux)
+                    + left_spectral)
+
+    has_before = before >= 0
+    has_after = after < flux.size
+
+    left = np.where(has_before,
+                    interpolate(np.where(has_before, before, lo),
+                                np.where(has_before, before + 1, lo)),
+                    spectral_axis[lo])
+    right = np.where(has_after,
+                     interpolate(np.where(has_after, after - 1, lo),
+                                 np.where(has_after, after, lo)),
+                     spectral_axis[hi - 1])
+
+    result[filled] = right - left
+
+    return result
@@ -12,12 +12,82 @@ __all__ = ['DataListModel', 'PlotProxyModel']
 class DataListModel(QStandardItemModel):
     """
     Base model for all data loaded into specviz.
+
+    The model maintains an index from the identifier of each
+    :class:`~specviz.core.items.DataItem` to the item and its row, which is
+    kept in sync with the rows of the model so that identifier lookups do
+    not need to scan the model.
     """
     data_added = Signal(DataItem)
+    data_batch_added = Signal(list)
 
     def __init__(self, *args, **kwargs):
         super(DataListModel, self).__init__(*args, **kwargs)
 
+        self._items_by_id = {}
+        self._rows_by_id = {}
+
+        # Keep the identifier index in sync with changes to the model rows,
+        # regardless of whether they come through this class's API or
+        # directly through the Qt methods (e.g. ``appendRow``).
+        self.rowsInserted.connect(self._on_rows_inserted)
+        self.rowsAboutToBeRemoved.connect(self._on_rows_about_to_be_removed)
+        self.rowsRemoved.connect(self._on_rows_removed)
+        self.rowsMoved.connect(self._rebuild_index)
+        self.layoutChanged.connect(self._rebuild_index)
+        self.modelReset.connect(self._rebuild_index)
+
+    def _update_rows(self, first):
+        """
+        Re-number the rows of the index starting at the row ``first``.
+        """
+        for row in range(first, self.rowCount()):
+            item = self.item(row)
+
+            if item is not None and item.identifier in self._items_by_id:
+                self._rows_by_id[item.identifier] = row
+
+    def _rebuild_index(self, *args):
+        """
+        Rebuild the identifier index from the current rows of the model.
+        """
+        self._items_by_id.clear()
+        self._rows_by_id.clear()
+
+        self._on_rows_inserted(None, 0, self.rowCount() - 1)
+
+    def _on_rows_inserted(self, parent, first, last):
+        # Only top-level rows hold data items
+        if parent is not None and parent.isValid():
+            return
+
+        for row in range(first, last + 1):
+            item = self.item(row)
+
+            if isinstance(item, DataItem):
+                self._items_by_id[item.identifier] = item
+
+        # Rows following the insertion point have shifted
+        self._update_rows(first)
+
+    def _on_rows_about_to_be_removed(self, parent, first, last):
+        if parent.isValid():
+            return
+
+        for row in range(first, last + 1):
+            item = self.item(row)
+
+            if isinstance(item, DataItem):
+                self._items_by_id.pop(item.identifier, None)
+                self._rows_by_id.pop(item.identifier, None)
+
+    def _on_rows_removed(self, parent, first, last):
+        if parent.isValid():
+            return
+
+        # Rows following the removed rows have shifted
+        self._update_rows(first)
+
     @property
     def items(self):
         """
@@ -45,6 +115,38 @@ class DataListModel(QStandardItemModel):
 
         return data_item
 
+    def add_data_batch(self, specs_by_name):
+        """
+        Generate and add a :class:`~specviz.core.items.DataItem` object for
+        each of the given spectra to the internal Qt data model in a single
+        row insertion.
+
+        Unlike `add_data`, the ``data_added`` signal is not emitted for each
+        item. Instead, ``data_batch_added`` is emitted once with the list of
+        all added data items.
+
+        Parameters
+        ----------
+        specs_by_name : dict
+            Mapping of display strings to :class:`~specutils.Spectrum1D` or
+            :class:`~specviz.core.lazy.LazySpectrum` objects.
+
+        Returns
+        -------
+        list
+            The list of added :class:`~specviz.core.items.DataItem` objects.
+        """
+        data_items = [DataItem(name, identifier=uuid.uuid4(), data=spec)
+                      for name, spec in specs_by_name.items()]
+
+        if len(data_items) > 0:
+            self.invisibleRootItem().appendRows(data_items)
+
+            # Emit a single signal for the whole batch of added data items
+            self.data_batch_added.emit(data_items)
+
+        return data_items
+
     def remove_data(self, identifier):
         """
         Removes data given the data item's UUID.
@@ -54,10 +156,10 @@ class DataListModel(QStandardItemModel):
         identifier : :class:`~uuid.UUID`
             Assigned id of the :class:`~specviz.core.items.DataItem` object.
         """
-        item = self.item_from_id(identifier)
+        row = self.row_from_id(identifier)
 
-        if item is not None:
-            self.removeRow(item.index().row())
+        if row is not None:
+            self.removeRow(row)
 
     def item_from_id(self, identifier):
         """
@@ -71,9 +173,27 @@ class DataListModel(QStandardItemModel):
         Returns
         -------
         `~specviz.core.items.DataItem`
-            The corresponding data item.
+            The corresponding data item, or `None` if no item with the given
+            identifier exists in the model.
+        """
+        return self._items_by_id.get(identifier)
+
+    def row_from_id(self, identifier):
         """
-        return next((x for x in self.items if x.identifier == identifier))
+        Return the row of the data item corresponding to a unique identifier.
+
+        Parameters
+        ----------
+        identifier : :class:`~uuid.UUID`
+            Assigned id of the :class:`~specviz.core.items.DataItem` object.
+
+        Returns
+        -------
+        int
+            The row of the corresponding data item in the model, or `None` if
+            no item with the given identifier exists in the model.
+        """
+        return self._rows_by_id.get(identifier)
 
     def data(self, index, role=Qt.DisplayRole):
         """
@@ -88,7 +208,7 @@ class DataListModel(QStandardItemModel):
         if role == Qt.DisplayRole:
             return item.data(item.NameRole)
         elif role == item.DataRole:
-            return item.data(item.DataRole)
+            return item.spectrum
         elif role == Qt.UserRole:
             return item
 
@@ -120,6 +240,9 @@ class DataListModel(QStandardItemModel):
         for item in self.items:
             self.removeRow(item.index().row())
 
+        self._items_by_id.clear()
+        self._rows_by_id.clear()
+
         self.endResetModel()
 
 
@@ -193,10 +316,14 @@ class PlotProxyModel(QSortFilterProxyModel):
         Returns
         -------
         item : :class:`~specviz.core.items.PlotDataItem`
-            The `~specviz.core.items.PlotDataItem` corresponding to the UUID.
+            The `~specviz.core.items.PlotDataItem` corresponding to the UUID,
+            or `None` if the source model holds no data item with that UUID.
         """
         data_item = self.sourceModel().item_from_id(identifier)
 
+        if data_item is None:
+            return
+
         if data_item.identifier not in self._items:
             self._items[data_item.identifier] = PlotDataItem(data_item)
 
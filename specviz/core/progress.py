@@ -0,0 +1,149 @@
+import time
+
+__all__ = ['ProcessAborted', 'ProgressTracker']
+
+
+class ProcessAborted(Exception):
+    """
+    Raised by a :class:`ProgressTracker` when the operation it tracks has
+    been aborted.
+    """
+
+
+class ProgressTracker:
+    """
+    Tracks the progress of a long-running operation, typically performed in
+    a :class:`~qtpy.QtCore.QThread`, and reports it to a callback.
+
+    The tracker is called by the operation whenever it has made progress.
+    Since the callback usually emits a signal to another thread, it is only
+    invoked once at least ``min_interval`` seconds have passed and the
+    progress has increased by at least ``min_delta`` since it was last
+    invoked, as well as on completion. Calling the tracker is therefore cheap
+    enough to do for every processed item.
+
+    Parameters
+    ----------
+    total_value : float
+        The value of the progress on completion, e.g. the number of items to
+        process.
+    update : callable, optional
+        Called with the tracker when the progress is reported.
+    min_interval : float, optional
+        The minimum time in seconds between two reports.
+    min_delta : float, optional
+        The minimum increase of the completed fraction between two reports.
+    clock : callable, optional
+        Returns the current time in seconds.
+    """
+    def __init__(self, total_value, update=None, min_interval=0.1,
+                 min_delta=0.01, clock=time.monotonic):
+        self._current_value = 0.0
+        self._total_value = total_value
+        self._abort_flag = False
+        self._update = update
+        self._min_interval = min_interval
+        self._min_delta = min_delta
+        self._clock = clock
+        self._start_time = clock()
+        self._last_time = None
+        self._last_percent = 0.0
+
+    def __call__(self, value=None):
+        """
+        Set the progress of the operation.
+
+        Parameters
+        ----------
+        value : float, optional
+            The new progress value. If not given, the progress is increased
+            by one.
+
+        Raises
+        ------
+        ProcessAborted
+            If the operation has been aborted.
+        """
+        self.check_aborted()
+
+        self._current_value = (value if value is not None
+                               else self._current_value + 1)
+
+        if self._update is None:
+            return
+
+        now = self._clock()
+        percent = self.percent_value
+
+        if (percent >= 1 or self._last_time is None or
+                (now - self._last_time >= self._min_interval and
+                 percent - self._last_percent >= self._min_delta)):
+            self._last_time = now
+            self._last_percent = percent
+            self._update(self)
+
+    @property
+    def current_value(self):
+        """The current progress value."""
+        return self._current_value
+
+    @property
+    def total_value(self):
+        """The progress value on completion."""
+        return self._total_value
+
+    @property
+    def percent_value(self):
+        """Return the completion amount as a fraction between 0 and 1."""
+        if self._total_value == 0:
+            return 1.0
+
+        return self._current_value / self._total_value
+
+    @property
+    def elapsed(self):
+        """The time in seconds since the tracker was created."""
+        return self._clock() - self._start_time
+
+    @property
+    def throughput(self):
+        """The average progress per second, e.g. spaxels per second."""
+        elapsed = self.elapsed
+
+        if elapsed <= 0:
+            return 0.0
+
+        return self._current_value / elapsed
+
+    @property
+    def eta(self):
+        """
+        The estimated time in seconds until completion, or `None` if no
+        progress has been made yet.
+        """
+        throughput = self.throughput
+
+        if throughput <= 0:
+            return
+
+        return max(self._total_value - self._current_value, 0) / throughput
+
+    @property
+    def aborted(self):
+        """Whether the operation has been aborted."""
+        return self._abort_flag
+
+    def check_aborted(self):
+        """
+        Raise :class:`ProcessAborted` if the operation has been aborted,
+        without updating the progress.
+        """
+        if self._abort_flag:
+            raise ProcessAborted("Process aborted.")
+
+    def abort(self):
+        """
+        Set the abort flag which will raise an error causing the operation
+        to return immediately.
+        """
+        self._abort_flag = True
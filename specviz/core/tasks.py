@@ -0,0 +1,190 @@
+import logging
+
+from qtpy.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from .progress import ProcessAborted, ProgressTracker
+
+__all__ = ['TaskRunner']
+
+
+class TaskRunner(QObject):
+    """
+    Runs jobs in a pool of worker threads so that the GUI doesn't freeze
+    while they are performed, and hands their results to callbacks in the
+    GUI thread as soon as they are ready.
+
+    Jobs can be cancelled: jobs that haven't started yet are dropped, and
+    the results of jobs that are already running are discarded, so that
+    only the results of the latest jobs are ever handed to their callbacks.
+    Cancellation aborts the :class:`~specviz.core.progress.ProgressTracker`
+    shared by the current jobs, which they check between the items they
+    produce.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        The maximum number of worker threads. Defaults to the number of
+        processor cores.
+
+    Signals
+    -------
+    failed : Signal
+        Emitted with an error message when a job raised an exception.
+    busy : Signal
+        Emitted with `True` when jobs are submitted while no other job is
+        pending, and with `False` once all jobs have finished or have been
+        cancelled.
+    """
+    failed = Signal(str)
+    busy = Signal(bool)
+
+    # emitted from the worker threads with the tracker of a job, along
+    # with a callback and its argument, or with an error message.
+    _result = Signal(object, object, object)
+    _done = Signal(object, object)
+    _error = Signal(object, str)
+
+    def __init__(self, max_workers=None, parent=None):
+        super(TaskRunner, self).__init__(parent)
+
+        self._pool = QThreadPool(self)
+
+        if max_workers is not None:
+            self._pool.setMaxThreadCount(max_workers)
+
+        # cancelling aborts the tracker shared by the current jobs and
+        # starts a new one, so that the results of older jobs can be told
+        # apart and discarded.
+        self._tracker = ProgressTracker(0)
+        self._pending = 0
+
+        self._result.connect(self._on_result)
+        self._done.connect(self._on_done)
+        self._error.connect(self._on_error)
+
+    @property
+    def pending(self):
+        """The number of jobs that haven't finished yet."""
+        return self._pending
+
+    def submit(self, job, callback=None, finished=None, iterate=False):
+        """
+        Run a job in a worker thread.
+
+        Parameters
+        ----------
+        job : callable
+            Called without arguments in a worker thread. Any
+            :class:`~qtpy.QtCore.QObject` returned by the job must have
+            been moved to the GUI thread.
+        callback : callable, optional
+            Called in the GUI thread with the result of the job.
+        finished : callable, optional
+            Called without arguments in the GUI thread once the job has
+            finished without error.
+        iterate : bool, optional
+            If `True`, the job returns an iterable whose items are produced
+            in the worker thread, and ``callback`` is called with each item
+            as soon as it has been produced. The job stops producing items
+            once it has been cancelled.
+        """
+        self._pending += 1
+
+        if self._pending == 1:
+            self.busy.emit(True)
+
+        self._pool.start(_Task(self, self._tracker, job, callback,
+                               finished, iterate))
+
+    def cancel(self):
+        """
+        Cancel all pending jobs.
+        """
+        self._pool.clear()
+        self._tracker.abort()
+        self._tracker = ProgressTracker(0)
+
+        if self._pending > 0:
+            self._pending = 0
+            self.busy.emit(False)
+
+    def wait(self, msecs=-1):
+        """
+        Wait for the running jobs to finish, e.g. before exiting.
+
+        Parameters
+        ----------
+        msecs : int, optional
+            The maximum time to wait for, in milliseconds. Waits for as
+            long as needed if negative.
+
+        Returns
+        -------
+        bool
+            Whether all jobs have finished.
+        """
+        return self._pool.waitForDone(msecs)
+
+    @staticmethod
+    def _is_current(tracker):
+        return not tracker.aborted
+
+    def _finish(self):
+        self._pending -= 1
+
+        if self._pending == 0:
+            self.busy.emit(False)
+
+    def _on_result(self, tracker, callback, result):
+        if self._is_current(tracker) and callback is not None:
+            callback(result)
+
+    def _on_done(self, tracker, finished):
+        if not self._is_current(tracker):
+            return
+
+        self._finish()
+
+        if finished is not None:
+            finished()
+
+    def _on_error(self, tracker, message):
+        if not self._is_current(tracker):
+            return
+
+        self._finish()
+        self.failed.emit(message)
+
+
+class _Task(QRunnable):
+    def __init__(self, runner, tracker, job, callback, finished, iterate):
+        super(_Task, self).__init__()
+
+        self._runner = runner
+        self._tracker = tracker
+        self._job = job
+        self._callback = callback
+        self._finished = finished
+        self._iterate = iterate
+
+    def run(self):
+        try:
+            # the job may have been cancelled while queued.
+            self._tracker.check_aborted()
+
+            if self._iterate:
+                for item in self._job():
+                    # stop as soon as the job has been cancelled.
+                    self._tracker.check_aborted()
+                    self._runner._result.emit(self._tracker, self._callback,
+                                              item)
+            else:
+                self._runner._result.emit(self._tracker, self._callback,
+                                          self._job())
+        except ProcessAborted:
+            return
+        except Exception as err:
+            logging.debug("Job failed.", exc_info=True)
+            self._runner._error.emit(self._tracker, str(err))
+        else:
+            self._runner._done.emit(self._tracker, self._finished)
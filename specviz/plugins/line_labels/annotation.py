@@ -1,188 +1,264 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
-from pyqtgraph import functions, TextItem
+import numpy as np
+from pyqtgraph import functions, GraphicsObject
 
 from qtpy.QtCore import QPointF, QRectF
-from qtpy.QtGui import QPolygonF, QPen, QColor
+from qtpy.QtGui import QColor, QFont, QPen, QStaticText, QTransform
 
-orientations = {
-    'horizontal': {'anchor': (0.5, 1), 'angle': 0},
-    'vertical': {'anchor': (0, 0.5), 'angle': 90}
-}
+from ...core.cache import LRUCache
 
-__all__ = ['LineIDMarkerProxy', 'LineIDMarker']
+# length in pixels of the marker line drawn below each label.
+MARKER_LENGTH = 20
 
+# default label color, same as pyqtgraph's TextItem.
+DEFAULT_COLOR = (200, 200, 200)
 
-class LineIDMarkerProxy(object):
+__all__ = ['LineIDMarkerLayer']
+
+
+class LineIDMarkerLayer(GraphicsObject):
     """
-    A proxy class that is used in lieu of a real, full-blown Line1DMarker.
-
-    The LineIDMarker constructor calls pyqtgraph's TextItem constructor.
-    Profiling analysis showed that it's an expensive operation to perform.
-    However, it has to be called many times during the course of a zoom
-    operation. This proxy, by avoiding to call the Line1DMarker base
-    class' constructor, speeds up the entire process.
-
-    The idea is that this proxy is used to perform all the de-cluttering
-    and explicit clipping operations that take place before an actual
-    marker can be added to the plot. By postponing the instantiation of
-    full-blown Line1DMarker objects for the very end, only the ones
-    actually showing up on screen are instantiated. This saves an enormous
-    amount of time not only on the constructor phase, but also on the
-    addItem and removeItem calls, which seem to generate in turn an
-    inordinate amount of calls to connect() and disconnect().
-
-    Parameters:
-    ----------
-    x0,y0: float
-        Coordinates for the marker
-    marker: LineIDMarkerProxy
-        A marker proxy from which to build this marker
-    text: str
-        The marker text
-    tip: str
-        The marker tool tip
-    color: tuple (int, int, int)
-        The marker color in RGB values
-    orientation: str
-        The marker orientation on screen
+    A single graphics item that draws all line ID markers on the plot.
+
+    The markers are defined by column arrays: the X coordinate of each
+    marker in data coordinates, its height as a fraction of the current
+    view height, its text, and its color. All visible markers are drawn
+    in one `paint` call, in device coordinates. The text layout of each
+    label is cached, and since the Y coordinate is computed from the view
+    range at paint time, markers stay pinned in screen Y when the plot is
+    zoomed or panned without rebuilding any scene items.
+
+    The layer doesn't report any data bounds, so it never takes part in
+    auto-ranging the plot.
     """
-    def __init__(self, x0, y0, proxy=None, text=None, tip="", color=(0, 0, 0),
-                 orientation='horizontal'):
+    def __init__(self, *args, **kwargs):
+        super(LineIDMarkerLayer, self).__init__(*args, **kwargs)
+
+        self._x = np.empty(0)
+        self._heights = np.empty(0)
+        self._texts = np.empty(0, dtype=str)
+        self._pens = []
+        self._pen_cache = {}
+        self._tooltip = None
+        self._rows = np.empty(0, dtype=int)
+
+        self._font = QFont()
+        self._glyphs = LRUCache(maxsize=4096)
+
+        # tool tips are only built when their marker is hovered.
+        self._tooltips = LRUCache(maxsize=64)
+
+        # device coordinates of the markers drawn by the last paint
+        # call, used to find the marker under the mouse pointer.
+        self._drawn_rows = np.empty(0, dtype=int)
+        self._drawn_x = np.empty(0)
+        self._drawn_y = np.empty(0)
+        self._drawn_sizes = np.empty((0, 2))
+        self._device_transform = None
+
+        self.setAcceptHoverEvents(True)
+
+    def set_markers(self, x, heights, texts, colors, tooltip=None):
+        """
+        Set the markers in this layer. All markers are initially visible.
+
+        Parameters
+        ----------
+        x : array-like
+            The X coordinate of each marker, in data coordinates.
+        heights : array-like
+            The height of each marker, as a fraction of the view height.
+        texts : list of str
+            The text of each marker.
+        colors : list
+            The color of each marker, in any form accepted by
+            :class:`~qtpy.QtGui.QColor` or an RGB tuple.
+        tooltip : callable, optional
+            Called with the index of a marker to build its tool tip, the
+            first time the marker is hovered.
+        """
+        self._x = np.array(x, dtype=float)
+        self._heights = np.array(heights, dtype=float)
+        self._texts = np.asarray(texts)
+        self._tooltip = tooltip
+        self._tooltips.clear()
+        self._pens = [self._pen(color) for color in colors]
 
-        self.x0 = x0
-        self.y0 = y0
+        self._rows = np.arange(len(self._x))
+        self.update()
 
-        if proxy:
-            # complete initialization by taking
-            # parameters from another instance.
-            self._text = proxy._text
-            self._tooltip = proxy._tooltip
-            self._color = proxy._color
-            self._orientation = proxy._orientation
+    def update_markers(self, rows, x=None, heights=None, colors=None):
+        """
+        Update some of the markers in place, e.g. when the redshift or the
+        style of one of the plotted line lists has changed.
+
+        Parameters
+        ----------
+        rows : array-like of int
+            The indices of the markers to update.
+        x : array-like, optional
+            The new X coordinate of each updated marker.
+        heights : array-like, optional
+            The new height of each updated marker.
+        colors : list, optional
+            The new color of each updated marker.
+        """
+        rows = np.asarray(rows, dtype=int)
 
-        else:
-            # initialize from passed values.
-            self._text = text
-            self._tooltip = tip
-            self._color = color
-            self._orientation = orientation
+        if x is not None:
+            self._x[rows] = x
+        if heights is not None:
+            self._heights[rows] = heights
+        if colors is not None:
+            for row, color in zip(rows, colors):
+                self._pens[row] = self._pen(color)
 
-    def __str__(self):
-        return str(self._text)
+        # tool tips may show the updated values.
+        self._tooltips.clear()
 
+        self.update()
 
-class LineIDMarker(TextItem):
-    """
-    Class that handles the drawing of a modified TextItem that's
-    augmented with a linear vertical marker. These items are used
-    to generate spectral line ID markers on the plot surface.
+    def set_visible_rows(self, rows):
+        """
+        Set which markers are drawn, e.g. after de-cluttering.
 
-    Note the convoluted handling of the 'color' parameter. This is
-    due to a bug in pyqtgraph's function 'functions.mkColor', which
-    bombs when presented with an argument of type Qt.GlobalColor.
+        Parameters
+        ----------
+        rows : array-like of int
+            The indices of the markers to draw.
+        """
+        self._rows = np.asarray(rows, dtype=int)
+        self.update()
 
-    Line1DMarker instances can only be built from instances of the
-    matching Line1DMarkerProxy class, or from instances of itself.
+    def clear(self):
+        """
+        Remove all markers from this layer.
+        """
+        self.set_markers([], [], [], [])
 
-    Parameters:
-    ----------
-    marker: LineIDMarkerProxy
-        A marker proxy from which to build this marker
-    """
-    def __init__(self, marker=None):
+    def _pen(self, color):
+        # markers share one pen per distinct color.
+        color = _to_qcolor(color)
 
-        self.x0 = marker.x0
-        self.y0 = marker.y0
+        if color.rgba() not in self._pen_cache:
+            self._pen_cache[color.rgba()] = QPen(color)
 
-        self._text = marker._text
-        self._orientation = marker._orientation
-        self._color = marker._color
+        return self._pen_cache[color.rgba()]
 
-        self._anchor = orientations[self._orientation]['anchor']
-        self._angle = orientations[self._orientation]['angle']
+    def _glyph(self, text):
+        def layout():
+            glyph = QStaticText(text)
+            glyph.prepare(QTransform(), self._font)
+            return glyph
 
-        super(LineIDMarker, self).__init__(text=self._text, color=self._color,
-                                           anchor=self._anchor,
-                                           angle=self._angle)
+        return self._glyphs.get_or_compute(text, layout)
 
-        self._tooltip = marker._tooltip
-        self.setToolTip(marker._tooltip)
+    def dataBounds(self, axis, frac=1.0, orthoRange=None):
+        """
+        Excludes the layer from auto-ranging.
+        """
+        return None
 
-        self.setFlag(self.ItemIsMovable)
+    def boundingRect(self):
+        """
+        Markers can be drawn anywhere in the view.
+        """
+        rect = self.viewRect()
 
-    def __str__(self):
-        return str(self._text)
+        return rect if rect is not None else QRectF()
 
-    # Repositioning the line labels on the fly, as the data is zoomed or
-    # panned, does not work. The behavior that is described in the PyQt
-    # documentation is not observed. It appears that the
-    # setFlags(ItemSendsGeometryChanges) does not work. I am using pyqt
-    # version 4.8, so support for this flag should be there. The
-    # ItemIgnoresTransformations flag doesn't work either. When set, it messes
-    # up with the entire plot. This could be due to interference with
-    # pyqtgraph, or a threading issue. We give up on this approach and let the
-    # caller handle the zoom requests and the repainting.
+    def viewTransformChanged(self):
+        """
+        Called when the view range has changed, which moves the markers
+        on screen.
+        """
+        super(LineIDMarkerLayer, self).viewTransformChanged()
+        self.prepareGeometryChange()
 
     def paint(self, p, *args):
         """
-        Overrides the default implementation so as
-        to draw a vertical marker below the text.
-        """
-        # draw the text first.
-        #
-        # Note that this actually doesn't work. Commenting out this call to
-        # the base class doesn't prevent the text to be painted on screen
-        # regardless. Tests with the base class itself prove that the base
-        # class paint() is not responsible for painting the text. Even when
-        # the base class' code in its paint() method is replaced by a sole
-        # 'pass' statement, the text still shows up on the plot. Thus there is
-        # something else in either pyqtgraph or pyqt that paints the text even
-        # though the entire painting mechanism in the classes is disabled.
-        super(LineIDMarker, self).paint(p, args)
-
-        # Add marker. Geometry depends on the
-        # text being vertical or horizontal.
-        points = []
-
-        # get the text-only bounding rectangle.
-        bounding_rect = super(LineIDMarker, self).boundingRect()
-
-        if self._orientation == 'vertical':
-            x = bounding_rect.x()
-            y = bounding_rect.y() + bounding_rect.height() / 2.
-
-            points.append(QPointF(x, y))
-            points.append(QPointF(x - 20, y))
-        else:
-            x = bounding_rect.x() + bounding_rect.width() / 2.
-            y = bounding_rect.y() + bounding_rect.height() * 2.
+        Draws all visible markers that lie within the view.
+        """
+        view_box = self.getViewBox()
+        if view_box is None or len(self._rows) == 0:
+            return
 
-            points.append(QPointF(x, y))
-            points.append(QPointF(x, y - 20))
+        (xmin, xmax), (ymin, ymax) = view_box.viewRange()
 
-        polygon = QPolygonF(points)
+        x = self._x[self._rows]
+        inside = (x >= xmin) & (x <= xmax)
+        rows = self._rows[inside]
+        x = x[inside]
+        y = ymin + (ymax - ymin) * self._heights[rows]
 
-        pen = QPen(QColor(functions.mkColor(self._color)))
-        p.setPen(pen)
-        p.drawPolygon(polygon)
+        # map all positions to device coordinates at once.
+        tr = p.transform()
+        device_x = tr.m11() * x + tr.m21() * y + tr.m31()
+        device_y = tr.m12() * x + tr.m22() * y + tr.m32()
 
-    def boundingRect(self):
-        """
-        Accounts for the fact that the modified text item has an extra
-        appendage (the marker) that makes its bounding rectangle be a bit
-        higher than the text-only rectangle. This is called whenever erasing
-        or redrawing a line label.
+        sizes = np.empty((len(rows), 2))
+
+        p.save()
+        p.setFont(self._font)
+
+        for i, (row, dx, dy) in enumerate(zip(rows, device_x, device_y)):
+            glyph = self._glyph(str(self._texts[row]))
+            size = glyph.size()
+            sizes[i] = size.width(), size.height()
+
+            p.resetTransform()
+            p.setPen(self._pens[row])
+            p.drawLine(QPointF(dx, dy), QPointF(dx, dy + MARKER_LENGTH))
+
+            # text reads upwards from the marker line.
+            p.setTransform(QTransform(0, -1, 1, 0, dx, dy))
+            p.drawStaticText(QPointF(0, -size.height() / 2.), glyph)
 
-        :return: QRectF
-            The bounding rectangle
+        p.restore()
+
+        self._device_transform = tr
+        self._drawn_rows = rows
+        self._drawn_x = device_x
+        self._drawn_y = device_y
+        self._drawn_sizes = sizes
+
+    def _row_at(self, pos):
+        """
+        Returns the index of the marker drawn at a position in item
+        coordinates, or None.
         """
-        base_rect = super(LineIDMarker, self).boundingRect()
+        if self._device_transform is None or len(self._drawn_rows) == 0:
+            return
+
+        point = self._device_transform.map(pos)
+
+        # labels extend upwards from the marker position, and
+        # the marker line extends downwards.
+        dx = np.abs(self._drawn_x - point.x())
+        dy = self._drawn_y - point.y()
+        candidates = np.flatnonzero((dx <= self._drawn_sizes[:, 1] / 2.) &
+                                    (dy >= -MARKER_LENGTH) &
+                                    (dy <= self._drawn_sizes[:, 0]))
 
-        if self._orientation == 'vertical':
-            return QRectF(base_rect.x() - 20, base_rect.y(),
-                          base_rect.width(), base_rect.height())
+        if len(candidates) == 0:
+            return
+
+        return self._drawn_rows[candidates[np.argmin(dx[candidates])]]
+
+    def hoverMoveEvent(self, event):
+        row = self._row_at(event.pos())
+        if row is None or self._tooltip is None:
+            self.setToolTip("")
         else:
-            return QRectF(base_rect.x(), base_rect.y() - 20,
-                          base_rect.width(), base_rect.height())
+            self.setToolTip(self._tooltips.get_or_compute(
+                row, lambda: self._tooltip(row)))
+
+
+def _to_qcolor(color):
+    if color is None:
+        return QColor(*DEFAULT_COLOR)
+    if isinstance(color, (tuple, list)):
+        return functions.mkColor(color)
+    return QColor(color)
@@ -1,16 +1,35 @@
+from functools import partial
+
 import numpy as np
 
-from qtpy.QtCore import QEvent, Qt, QThread, Signal, QMutex, QTime
+from qtpy.QtCore import QElapsedTimer, Qt, QTimer
 from qtpy.QtWidgets import QMessageBox
 
 from astropy import units as u
 
-from .annotation import LineIDMarker, LineIDMarkerProxy
+from ...core.decimation import DeclutterIndex
+from .annotation import LineIDMarkerLayer
 from .linelist import LineList, WAVELENGTH_COLUMN, \
     REDSHIFTED_WAVELENGTH_COLUMN, \
-    MARKER_COLUMN, ID_COLUMN, COLOR_COLUMN, HEIGHT_COLUMN
+    ID_COLUMN, COLOR_COLUMN, HEIGHT_COLUMN
+
+__all__ = ['LineLabelsPlotter']
+
+# Time in milliseconds the view range has to stay unchanged before the
+# line labels are de-cluttered again.
+ZOOM_SETTLE_TIME = 50
+
+# Maximum time in milliseconds the line labels can lag behind a view
+# range that keeps changing, e.g. while panning continuously.
+ZOOM_MAX_LATENCY = 250
 
-__all__ = ['LineLabelsPlotter', 'ZoomMarkersThread', 'ZoomEventBuffer']
+# Time in milliseconds the redshift of a plotted line list has to stay
+# unchanged before its markers are moved.
+REDSHIFT_DELAY = 100
+
+# Time in milliseconds the redshift and style of the plotted line lists
+# have to stay unchanged before the plotted lines pane is rebuilt.
+PLOTTED_LINES_DELAY = 300
 
 
 class LineLabelsPlotter(object):
@@ -22,9 +41,16 @@ class LineLabelsPlotter(object):
     ----------
     linelist_window : :class:`~specviz.plugins.line_labels.linelists_window.LineListsWindow`
         The line list window calling this with data to be plotted.
+    zoom_settle_time : int, optional
+        Time in milliseconds the plot range has to stay unchanged before the
+        line labels are updated.
+    zoom_max_latency : int, optional
+        Maximum time in milliseconds in between a plot range change and the
+        update of the line labels, even if the range keeps changing.
     """
 
-    def __init__(self, linelist_window, *args, **kwargs):
+    def __init__(self, linelist_window, *args, zoom_settle_time=ZOOM_SETTLE_TIME,
+                 zoom_max_latency=ZOOM_MAX_LATENCY, **kwargs):
         super(LineLabelsPlotter, self).__init__(*args, **kwargs)
 
         self._linelist_window = linelist_window
@@ -41,26 +67,64 @@ class LineLabelsPlotter(object):
         # use it to re-plot the line labels.
         self._units_changed = False
 
-        # create a new, empty list that will store and help track down
-        # which markers are actually being displayed at any time.
-        self._markers_on_screen = []
+        # all markers are drawn by a single layer item, which is
+        # added to the plot while line labels are displayed.
+        self._marker_layer = LineIDMarkerLayer()
+        self._marker_layer_on_screen = False
+        self._declutter_index = DeclutterIndex([])
+
+        # Zooming the markers is debounced: every range change (re)starts
+        # a single-shot timer, and the markers are only de-cluttered once
+        # it fires. A burst of range changes, as generated by a mouse
+        # wheel or a drag, is thus coalesced into a single update once
+        # the view range settles, or at most zoom_max_latency after the
+        # first change of the burst.
+        self._zoom_settle_time = zoom_settle_time
+        self._zoom_max_latency = zoom_max_latency
+        self._zoom_timer = QTimer()
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.timeout.connect(self._handle_zoom)
+        self._zoom_clock = QElapsedTimer()
+
+        # The markers follow changes to the color and height of the
+        # plotted line lists right away. Redshift changes move markers
+        # around and require the de-clutter index to be updated, so they
+        # are applied once the redshift stops changing, as typing a value
+        # changes it with every keystroke. The plotted lines pane is
+        # expensive to rebuild, so that waits until editing stops.
+        self._pending_redshifts = set()
+        self._redshift_timer = QTimer()
+        self._redshift_timer.setSingleShot(True)
+        self._redshift_timer.setInterval(REDSHIFT_DELAY)
+        self._redshift_timer.timeout.connect(self._handle_redshift_change)
+
+        self._plotted_lines_timer = QTimer()
+        self._plotted_lines_timer.setSingleShot(True)
+        self._plotted_lines_timer.setInterval(PLOTTED_LINES_DELAY)
+        self._plotted_lines_timer.timeout.connect(self._refresh_plotted_lines)
+
+        # signal connections to the panes of the plotted line lists.
+        self._plotted_panes = []
+        self._pane_connections = []
 
         # connect signals
         self._linelist_window.dismiss_linelists_window.connect(self._dismiss_linelists_window)
         self._linelist_window.erase_linelabels.connect(self._erase_linelabels)
-        self._linelist_window.hub.plot_widget.mouse_enterexit.connect(self._handle_mouse_events)
         self._linelist_window.hub.plot_widget.sigRangeChanged.connect(self._handle_range_change)
-        self._linelist_window.hub.plot_widget.sigRangeChanged.connect(
-            lambda: self._handle_mouse_events(QEvent.Enter))
 
     # --------  Slots.
 
-    # Buffering of zoom events.
+    # Debouncing of zoom events.
     def _process_zoom_signal(self):
-        if hasattr(self, '_zoom_markers_thread') and self._zoom_markers_thread:
+        if not self._marker_layer_on_screen:
+            return
 
-            # for now, any object can be used as a zoom message.
-            self._zoom_event_buffer._put(1)
+        if self._zoom_timer.isActive():
+            remaining = self._zoom_max_latency - self._zoom_clock.elapsed()
+            self._zoom_timer.start(max(0, min(self._zoom_settle_time, remaining)))
+        else:
+            self._zoom_clock.start()
+            self._zoom_timer.start(self._zoom_settle_time)
 
     # These two slots below handle the logic associated with the
     # data_unit_changed and sigRangeChanged signals.
@@ -87,6 +151,9 @@ class LineLabelsPlotter(object):
 
             units = self._linelist_window.hub.plot_item.spectral_axis_unit
 
+            # apply redshift changes that were still waiting.
+            self._apply_pending_redshifts()
+
             self._merged_linelist[WAVELENGTH_COLUMN].convert_unit_to(units, equivalencies=u.spectral())
             self._merged_linelist[REDSHIFTED_WAVELENGTH_COLUMN].convert_unit_to(units, equivalencies=u.spectral())
 
@@ -107,10 +174,9 @@ class LineLabelsPlotter(object):
 
         if self._linelist_window:
             self._remove_linelabels_from_plot()
+            self._disconnect_panes()
             self._linelist_window.erase_plotted_lines()
 
-            self._destroy_zoom_markers_thread()
-
     # Main method for drawing line labels on the plot surface.
     def _plot_linelists(self, table_views, panes, units, caller, **kwargs):
 
@@ -146,33 +212,12 @@ class LineLabelsPlotter(object):
 
             # must map between view and underlying model
             # because of row sorting.
-            selected_rows = table_view.selectionModel().selectedRows()
-            model_selected_rows = []
-            for sr in selected_rows:
-                model_row = table_view.model().mapToSource(sr)
-                model_selected_rows.append(model_row)
+            selection = table_view.selectionModel().selection()
+            model_selected_rows = table_view.model().source_row_mask(selection)
 
             new_list = line_list.extract_rows(model_selected_rows)
 
-            # redshift correction for plotting the specific lines
-            # defined in this list. Defined by the text content
-            # and combo box setting.
-            if pane.button_pane.redshift_textbox.hasAcceptableInput():
-                redshift = float(pane.button_pane.redshift_textbox.text())
-                z_units = pane.button_pane.combo_box_z_units.currentText()
-                new_list.set_redshift(redshift, z_units)
-
-            # color for plotting the specific lines defined in
-            # this list, is defined by the itemData property.
-            index = pane.button_pane.combo_box_color.currentIndex()
-            color = pane.button_pane.combo_box_color.itemData(index, role=Qt.UserRole)
-            new_list.set_color(color)
-
-            # height for plotting the specific lines defined in
-            # this list. Defined by the line edit text.
-            if pane.button_pane.height_textbox.hasAcceptableInput():
-                height = float(pane.button_pane.height_textbox.text())
-                new_list.setHeight(height)
+            self._apply_pane_settings(pane, new_list)
 
             linelists_with_selections.append(new_list)
 
@@ -185,22 +230,9 @@ class LineLabelsPlotter(object):
         # Finally, plot labels.
         self._go_plot_markers(merged_linelist)
 
-        # Zooming the markers is a tricky business. On top of saving some plot
-        # time by having the plot being de-cluttered at every zoom step, we
-        # must control the rate at which the time-consuming zoom operation is
-        # run, to prevent the app to become unresponsive. We use a threaded
-        # mechanism to store zoom request events in a buffer, and then manage
-        # its size, and the speed at which its contents get consumed.
-        #
-        # Notice that we can't use the dispatch mechanism to manage the zoom
-        # thread and its signal-slot dependencies. Something in the dispatch
-        # code messes up with the timing relationships in the GUI and secondary
-        # threads, causing the “Timers cannot be started from another thread”
-        # warning, and eventual app crash. We have to manage signals with explicit
-        # code within the thread and in here.
-        self._zoom_event_buffer = ZoomEventBuffer()
-        self._zoom_markers_thread = ZoomMarkersThread(self, len(merged_linelist))
-        self._zoom_markers_thread.do_zoom.connect(self._handle_zoom)
+        # Changes to the redshift and style of the plotted lists are
+        # applied in place to the merged list from now on.
+        self._connect_panes(panes)
 
         # Populate the plotted lines pane in the line list window.
         if hasattr(self, '_linelist_window') and self._linelist_window:
@@ -210,362 +242,239 @@ class LineLabelsPlotter(object):
         # use in subsequent operations.
         self._merged_linelist = merged_linelist
 
-    # Turns time-consuming processing in the zoom thread on/off when
-    # mouse enter/leaves the plot. This enables other parts of the
-    # app to retain their full computational speed when the mouse
-    # pointer is outside the plot window.
-    def _handle_mouse_events(self, event_type):
-        if hasattr(self, '_zoom_markers_thread') and self._zoom_markers_thread:
-            is_processing = self._zoom_markers_thread.is_processing
-
-            # Detects when mouse entered the plot area but the thread is not processing yet.
-            if event_type == QEvent.Enter and not is_processing:
-                self._zoom_markers_thread._start_processing()
-                return
-
-            # Detects the complementary condition: mouse exited plot and thread still processing.
-            if event_type == QEvent.Leave and is_processing:
-                self._zoom_markers_thread._stop_processing()
-
-#--------  Private methods.
-
-    def _go_plot_markers(self, merged_linelist):
-        # Code below is plotting all markers at a fixed height in
-        # the screen coordinate system. Still TBD how to do this in
-        # the generic case. Maybe derive heights from curve data
-        # instead? Make the markers follow the curve ups and downs?
-        #
-        # Ideally we would like to have the marker's X coordinate
-        # pinned down to the plot surface in data value, and the Y
-        # coordinate pinned down in screen value. This would make
-        # the markers to stay at the same height in the window even
-        # when the plot is zoomed. The elegant nice way to do this
-        # would be via the marker objects themselves to reposition
-        # themselves on screen. This did not work though. There seems
-        # to be a clash (maybe thread-related) in between the setPos
-        # method and the auto-range facility in pyqtgraph.
-        #
-        # We managed to get the pinning in Y by brute force: remove
-        # the markers and re-draw them in the new zoomed coordinates.
-        # Note that it's not enough to remove a marker, reset its position,
-        # and add it back to the plot. It's necessary to rebuild a new
-        # marker instance. This probably has to do with the affine
-        # transform objects that are stored inside each TextItem instance.
-        # These transforms do not behave as expected when we run everything
-        # with auto range turned on. Switching auto range on and off when
-        # necessary does not work either.
-        #
-        # Profiling experiments showed that almost all the cost is spent inside
-        # the pyqtgraph TextItem constructor. The total cost of this re-build
-        # approach amounts to about 15-20% of the CPU time spent in zooming.
-        # This is now being handled by a proxy instantiation mechanism. Profiling
-        # experiments with the proxy mechanism in place show that the time taken
-        # by the TextItem constructor drops to 4% of total CPU time.
-        #
-        # The pinning of the Y coordinate is handled by the handle_zoom method
-        # that in turn relies in the storage of marker instances row-wise in the
-        # line list table.
-
-        # plot_widget = self._plot_widget.plotItem
-        plot_widget = self._plot_widget
-
-        height = self._compute_height(merged_linelist, plot_widget)
-
-        # column names are defined in the YAML files
-        # or by constants elsewhere.
-        wave_column = merged_linelist.columns[REDSHIFTED_WAVELENGTH_COLUMN]
-        id_column = merged_linelist.columns[ID_COLUMN]
-        color_column = merged_linelist[COLOR_COLUMN]
-
-        # To enable marker removal from plot, markers are stored
-        # row-wise so as to match row selections in table views.
-        markers = merged_linelist[MARKER_COLUMN]
-
-        for row_index in range(len(wave_column)):
-
-            # tool tip contains all info in table.
-            tool_tip = ""
-            for col_index in range(len(merged_linelist.columns)):
-                col_name = merged_linelist.colnames[col_index]
-                if not col_name in [COLOR_COLUMN]:
-                    value = merged_linelist.columns[col_index][row_index]
-                    tool_tip += col_name + '=' + str(value) + ', '
-
-            # For now, use proxy markers to speed up processing.
-            marker = LineIDMarkerProxy(wave_column[row_index],
-                                       height[row_index],
-                                       text=id_column[row_index],
-                                       tip=tool_tip,
-                                       color=color_column[row_index],
-                                       orientation='vertical')
-            markers[row_index] = marker
-
-        # after all markers are created, check their positions
-        # and disable some to de-clutter the plot.
-        new_markers = self._declutter(markers)
-
-        # place markers on screen
-        for marker_proxy in new_markers:
-            if marker_proxy:
-                # build the real, full-fledged marker from proxy.
-                real_marker = LineIDMarker(marker_proxy)
-                real_marker.setPos(marker_proxy.x0, marker_proxy.y0)
-
-                self._plot_widget.addItem(real_marker)
-                self._markers_on_screen.append(real_marker)
-
-        self._plot_widget.update()
-
-    # Slot called by the zoom control thread.
-    def _handle_zoom(self):
-        # this method may be called by zoom signals that can be emitted
-        # when a merged line list is not available yet.
-        if hasattr(self, '_merged_linelist'):
-
-            # Experiments with timing
-            # self.Cron = QTime(0,0,0,0)
-            # self.Cron.start()
-
-            # update height column in line list based on
-            # the new, zoomed coordinates.
-            height_array = self._compute_height(self._merged_linelist, self._plot_widget)
-
-            # remove markers that are displaying right now
-            for index in range(len(self._markers_on_screen)):
-                marker = self._markers_on_screen[index]
-                self._plot_widget.removeItem(marker)
-            self._markers_on_screen = []
-
-            # update markers based on what is stored in the
-            # marker_list table column.
-            marker_list = self._merged_linelist[MARKER_COLUMN]
-            for index in range(len(marker_list)):
-                marker = marker_list[index]
-
-                # New marker is built with same parameters as older marker that was
-                # just removed, but for the new Y position.
-                #
-                # Note that it's not enough to remove a marker, reset its position,
-                # and add it back to the plot. It's necessary to rebuild a new marker
-                # instance. This probably has to do with the affine transform objects
-                # that are stored inside each TextItem instance. These transforms do not
-                # behave as expected when we run everything with auto range turned on.
-                # Switching auto range on and off when necessary does not work either.
-                #
-                # Profiling experiments showed that almost all the cost is spent inside
-                # the pyqtgraph TextItem constructor. The total cost of this re-build
-                # approach amounts to about 15-20% of the CPU time spent in zooming.
-                # This is now being handled by a proxy instantiation mechanism. Profiling
-                # experiments with the proxy mechanism in place show that the time taken
-                # by the TextItem constructor drops to 4% of total CPU time.
-
-                new_marker = LineIDMarkerProxy(marker.x0, height_array[index], proxy=marker)
-
-                # Replace old marker with new.
-                marker_list[index] = new_marker
-
-            # after all markers are created, check their relative positions
-            # on screen and disable some to de-clutter the plot.
-            decluttered_list = self._declutter(marker_list)
-
-            # Finally, add the de-cluttered new markers to the plot.
-            for marker_proxy in decluttered_list:
-                if marker_proxy:
-                    # build real, full-fledged marker from proxy.
-                    real_marker = LineIDMarker(marker_proxy)
-                    real_marker.setPos(real_marker.x0, real_marker.y0)
-
-                    self._plot_widget.addItem(real_marker)
-                    self._markers_on_screen.append(real_marker)
-
-            self._plot_widget.update()
-
-            # took = self.Cron.elapsed()
-            # print("took: {0} msec" .format(str(took)))
+    # Slot called when the color or height of one of the
+    # plotted line lists is changed in its pane.
+    def _handle_style_change(self, index):
+        if not self._marker_layer_on_screen:
+            return
 
-            self._zoom_markers_thread.zoom_end.emit()
+        pane = self._plotted_panes[index]
+        self._apply_pane_style(pane, self._merged_linelist.sources[index])
 
-    # compute height to display each marker
-    def _compute_height(self, merged_linelist, plot_widget):
-        data_range = plot_widget.viewRange()
-        ymin = data_range[1][0]
-        ymax = data_range[1][1]
+        # only the lines of the changed list are updated, and
+        # they stay in place.
+        merged_linelist = self._merged_linelist
+        rows = merged_linelist.update_source(index, redshift=False)
 
-        return (ymax - ymin) * merged_linelist.columns[HEIGHT_COLUMN] + ymin
+        self._marker_layer.update_markers(
+            rows, heights=np.asarray(merged_linelist[HEIGHT_COLUMN])[rows],
+            colors=merged_linelist[COLOR_COLUMN][rows])
 
-    # Returns a new list with proxy marker instances to be plotted.
-    # This list is a (shallow) copy of the input list, where object
-    # references are set to None whenever their distance in X+Y pixels
-    # to the next neighbor is smaller than a given threshold.
-    #
-    # Using both X and Y as a distance criterion ensures that markers
-    # displayed at different heights are not removed from the plot,
-    # even when their X coordinate places them too close to each other.
-    #
-    # NOTE: However, using the sum of X and Y distances causes a lot more
-    # markers to be displayed when separate data sets, both with large number
-    # of lines, are displayed at different heights on screen. In a way, it
-    # defeats the purpose of de-cluttering. And makes the code run slower:
-    # right now, the CPU bottleneck is in the np.array() constructors that
-    # build the X and Y arrays. Temporarily, we remove the Y array entirely.
-    # In case this needs more work, users will give us feedback eventually.
-    #
-    # With these optimizations in place, about 7% of the CPU time spent
-    # in zooming is due to the _declutter method. Almost all of it is in
-    # line 341 (list comprehension + np.array() constructor).
-
-    def _declutter(self, marker_list):
-        if len(marker_list) > 10:
-            threshold = 3
-
-            data_range = self._plot_widget.viewRange()
-            x_pixels = self._plot_widget.sceneBoundingRect().width()
-            # y_pixels = self._plot_widget.sceneBoundingRect().height()  ###
-            xmin = data_range[0][0]
-            xmax = data_range[0][1]
-            # ymin = data_range[1][0]  ###
-            # ymax = data_range[1][1]  ###
-
-            # compute X and Y distances in between markers, in screen pixels
-            x = np.array([marker.x0 for marker in marker_list])
-            xdist = np.abs(np.diff(x))
-            xdist *= np.abs(x_pixels / (xmax - xmin))
-            # y = np.array([marker.y0 for marker in marker_list])  ###
-            # ydist = np.diff(y)                                   ###
-            # ydist *= y_pixels / (ymax - ymin)                    ###
-
-            # replace cluttered markers with None
-            # new_array = np.where((xdist + ydist) < threshold, None, np.array(marker_list[1:]))     ####
-            new_array = np.where(xdist < threshold, None, np.array(marker_list[1:]))
-
-            # replace markers currently outside the wave range with None
-            new_array_2 = np.where(x[1:] < xmin, None, new_array)
-            new_array_3 = np.where(x[1:] > xmax, None, new_array_2)
-            new_list = new_array_3.tolist()
-
-            # make sure at least a few markers show
-            if new_list.count(None) >= len(new_list) - 3:
-                mid = int(len(new_list) / 2)
-                mid_1 = int(max(0, mid - 8))
-                mid_2 = int(min(mid + 8, len(new_list)-1))
-                new_list[mid] = marker_list[mid]
-                new_list[mid_1] = marker_list[mid_1]
-                new_list[mid_2] = marker_list[mid_2]
-
-            return new_list
-        else:
-            return marker_list
+        self._plotted_lines_timer.start()
 
-    def _remove_linelabels_from_plot(self):
-        if hasattr(self, '_merged_linelist'):
-            for index in range(len(self._markers_on_screen)):
-                self._plot_widget.removeItem(self._markers_on_screen[index])
-            self._plot_widget.update()
-            self._markers_on_screen = []
+    # Slot called when the redshift of one of the plotted
+    # line lists is changed in its pane.
+    def _handle_redshift_edit(self, index):
+        if not self._marker_layer_on_screen:
+            return
 
-    def _destroy_zoom_markers_thread(self):
-        if hasattr(self, '_zoom_markers_thread') and self._zoom_markers_thread:
-            self._zoom_markers_thread._stop_processing()
-            self._zoom_markers_thread = None
+        self._pending_redshifts.add(index)
+        self._redshift_timer.start()
+        self._plotted_lines_timer.start()
 
+    # Slot called by the redshift timer once the redshifts have settled.
+    def _handle_redshift_change(self):
+        if not self._marker_layer_on_screen:
+            return
 
-class ZoomMarkersThread(QThread):
-    """
-    This class sets the pace to which zoom requests can be handled. It uses
-    a mutex-lockable buffer to prevent piling up of too many zoom requests
-    coming from cursor action on screen.
+        rows = self._apply_pending_redshifts()
 
-    Parameters
-    ----------
-    caller : :class:`~specviz.plugins.line_labels.line_labels_plotter.LineLabelsPlotter`
-        The plotter instance that runs this thread..
-    npoints : int
-        The number of objects on screen to be zoomed (not used in this implementation).
+        if rows.size == 0:
+            return
 
-    Attributes
-    ----------
-    do_zoom : Signal
-        Signals that a zoom operation can be performed by the event loop.
-    zoom_end : Signal
-        Emitted by the event loop thread to signal that it is ready to
-        receive another zoom request.
-    """
+        # only the markers of the changed lists are moved.
+        marker_x = np.asarray(
+            self._merged_linelist[REDSHIFTED_WAVELENGTH_COLUMN].data[rows],
+            dtype=float)
 
-    do_zoom = Signal()
-    zoom_end = Signal()
+        self._marker_layer.update_markers(rows, x=marker_x)
+        self._declutter_index.update(rows, marker_x)
+        self._marker_layer.set_visible_rows(self._declutter())
 
-    def __init__(self, caller, npoints):
-        super(ZoomMarkersThread, self).__init__()
-        self.buffer = caller._zoom_event_buffer
-        self.npoints = npoints
-        self.is_processing = False
-        self.is_zooming = False
+    def _refresh_plotted_lines(self):
+        if self._marker_layer_on_screen and self._linelist_window:
+            self._linelist_window.display_plotted_lines(self._merged_linelist)
 
-        self.zoom_end.connect(self._zoom_finished)
+#--------  Private methods.
 
-    def run(self):
-        """
-        Overrides the base class.
-        """
+    # Sets the redshift, color and height of a line list from
+    # the controls in its pane.
+    def _apply_pane_settings(self, pane, linelist):
+        self._apply_pane_redshift(pane, linelist)
+        self._apply_pane_style(pane, linelist)
+
+    def _apply_pane_redshift(self, pane, linelist):
+        # redshift correction for plotting the specific lines
+        # defined in this list. Defined by the text content
+        # and combo box setting.
+        if pane.button_pane.redshift_textbox.hasAcceptableInput():
+            redshift = float(pane.button_pane.redshift_textbox.text())
+            z_units = pane.button_pane.combo_box_z_units.currentText()
+            linelist.set_redshift(redshift, z_units)
+
+    def _apply_pane_style(self, pane, linelist):
+        # color for plotting the specific lines defined in
+        # this list, is defined by the itemData property.
+        index = pane.button_pane.combo_box_color.currentIndex()
+        color = pane.button_pane.combo_box_color.itemData(index, role=Qt.UserRole)
+        linelist.set_color(color)
+
+        # height for plotting the specific lines defined in
+        # this list. Defined by the line edit text.
+        if pane.button_pane.height_textbox.hasAcceptableInput():
+            height = float(pane.button_pane.height_textbox.text())
+            linelist.setHeight(height)
+
+    def _connect_panes(self, panes):
+        self._disconnect_panes()
+        self._plotted_panes = list(panes)
+
+        for index, pane in enumerate(self._plotted_panes):
+            redshift_slot = lambda *args, index=index: \
+                self._handle_redshift_edit(index)
+            style_slot = lambda *args, index=index: \
+                self._handle_style_change(index)
+            button_pane = pane.button_pane
+
+            for signal, slot in (
+                    (button_pane.redshift_textbox.textChanged, redshift_slot),
+                    (button_pane.combo_box_z_units.currentIndexChanged,
+                     redshift_slot),
+                    (button_pane.combo_box_color.currentIndexChanged,
+                     style_slot),
+                    (button_pane.height_textbox.textChanged, style_slot)):
+                signal.connect(slot)
+                self._pane_connections.append((signal, slot))
+
+    def _disconnect_panes(self):
+        self._redshift_timer.stop()
+        self._pending_redshifts.clear()
+
+        for signal, slot in self._pane_connections:
+            try:
+                signal.disconnect(slot)
+            except (TypeError, RuntimeError):
+                # the pane was closed in the meantime.
+                pass
+
+        self._pane_connections = []
+        self._plotted_panes = []
+
+    # Builds the tool tip of the marker in the given row of the
+    # merged line list. Called by the marker layer when the marker
+    # is hovered. The tool tip contains all info in the table.
+    def _build_tool_tip(self, merged_linelist, row_index):
+        tool_tip = ""
+        for col_name in merged_linelist.colnames:
+            if not col_name in [COLOR_COLUMN]:
+                value = merged_linelist[col_name][row_index]
+                tool_tip += col_name + '=' + str(value) + ', '
+
+        return tool_tip
+
+    # Applies the redshifts edited in the panes to the merged line
+    # list, and returns the rows of the lines that were updated.
+    def _apply_pending_redshifts(self):
+        self._redshift_timer.stop()
+
+        rows = []
+        for index in sorted(self._pending_redshifts):
+            pane = self._plotted_panes[index]
+            self._apply_pane_redshift(pane, self._merged_linelist.sources[index])
+            rows.append(self._merged_linelist.update_source(index))
+
+        self._pending_redshifts.clear()
+
+        return np.concatenate(rows) if rows else np.empty(0, dtype=int)
 
-        while(self.is_processing):
+    def _go_plot_markers(self, merged_linelist):
+        # All markers are drawn by a single layer item, from the
+        # columns of the merged line list. The marker's X coordinate
+        # is pinned down to the plot surface in data value, and the
+        # Y coordinate is pinned down in screen value: the layer
+        # computes the Y position of each marker from its height
+        # fraction and the current view range every time it's
+        # painted. Zooming thus only needs to de-clutter the markers
+        # again, without rebuilding any scene items.
 
-            value = self.buffer._get()
-            if value:
-                self.do_zoom.emit()
+        # column names are defined in the YAML files
+        # or by constants elsewhere.
+        wave_column = merged_linelist[REDSHIFTED_WAVELENGTH_COLUMN]
+        id_column = merged_linelist[ID_COLUMN]
+        color_column = merged_linelist[COLOR_COLUMN]
+        height_column = merged_linelist[HEIGHT_COLUMN]
 
-                self.is_zooming = True
+        marker_x = np.asarray(wave_column, dtype=float)
 
-                # wait for zoom to finish.
-                while(self.is_zooming):
-                    QThread.msleep(10)
+        # the de-clutter index only depends on the marker positions, and
+        # is built once for all zoom levels.
+        self._declutter_index = DeclutterIndex(marker_x)
 
-            # one more, to prevent hiccups.
-            QThread.msleep(10)
+        # tool tips are built on demand, when a marker is hovered.
+        self._marker_layer.set_markers(marker_x,
+                                       np.asarray(height_column),
+                                       id_column, color_column,
+                                       tooltip=partial(self._build_tool_tip,
+                                                       merged_linelist))
 
-    def _zoom_finished(self):
-        self.is_zooming = False
+        # check marker positions and hide some
+        # to de-clutter the plot.
+        self._marker_layer.set_visible_rows(
+            self._declutter())
 
-    def _start_processing(self):
-        self.is_processing = True
-        self.start()
+        if not self._marker_layer_on_screen:
+            self._plot_widget.addItem(self._marker_layer)
+            self._marker_layer_on_screen = True
 
-    def _stop_processing(self):
-        self.is_processing = False
-        self.buffer._clear()
+        self._plot_widget.update()
 
+    # Slot called by the zoom timer once the plot range has settled.
+    def _handle_zoom(self):
+        # the timer may fire after the markers were removed.
+        if self._marker_layer_on_screen:
+
+            # the marker layer re-positions the markers by itself,
+            # only the de-cluttering depends on the zoom level.
+            self._marker_layer.set_visible_rows(
+                self._declutter())
+
+    # Returns the indices of the markers to be plotted. The de-clutter
+    # index keeps markers at least a given number of X pixels apart at
+    # the current zoom level, and only the markers within the wave range
+    # are sliced out of it.
+    #
+    # Using both X and Y as a distance criterion would ensure that
+    # markers displayed at different heights are not removed from the
+    # plot, even when their X coordinate places them too close to each
+    # other. However, it causes a lot more markers to be displayed when
+    # separate data sets, both with large number of lines, are displayed
+    # at different heights on screen. In a way, it defeats the purpose
+    # of de-cluttering. Users will give us feedback eventually.
 
-class ZoomEventBuffer(object):
-    """
-    A mutex-lockable buffer that stores zoom request events.
+    def _declutter(self):
+        index = self._declutter_index
 
-    """
-    def __init__(self):
-        self.buffer = []
-        self.mutex = QMutex()
+        if len(index) <= 10:
+            return index.select(-np.inf, np.inf, 0)
 
-    def _clear(self):
-        self.mutex.lock()
-        self.buffer = []
-        self.mutex.unlock()
+        threshold = 3
 
-    def _put(self, value):
-        self.mutex.lock()
+        data_range = self._plot_widget.viewRange()
+        x_pixels = self._plot_widget.sceneBoundingRect().width()
+        xmin = data_range[0][0]
+        xmax = data_range[0][1]
 
-        # Don't let the buffer fill up too much.
-        # Keep just the most recent zoom events.
-        while len(self.buffer) > 5:
-            self.buffer.pop()
+        # minimum separation in data units.
+        separation = threshold * abs(xmax - xmin) / max(x_pixels, 1)
 
-        self.buffer.insert(0, value)
+        return index.select(xmin, xmax, separation)
 
-        self.mutex.unlock()
+    def _remove_linelabels_from_plot(self):
+        self._zoom_timer.stop()
+        self._plotted_lines_timer.stop()
 
-    def _get(self):
-        self.mutex.lock()
-        if len(self.buffer) > 0:
-            value = self.buffer.pop()
-        else:
-            value = None
-        self.mutex.unlock()
-        return value
+        if self._marker_layer_on_screen:
+            self._plot_widget.removeItem(self._marker_layer)
+            self._marker_layer_on_screen = False
+            self._marker_layer.clear()
+            self._plot_widget.update()
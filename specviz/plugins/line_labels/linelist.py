@@ -7,6 +7,11 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 import os
 import glob
+import hashlib
+import json
+import logging
+import shutil
+import tempfile
 import yaml
 from os import path
 
@@ -14,7 +19,7 @@ import numpy as np
 
 from astropy import units as u
 from astropy.io import ascii
-from astropy.table import Table, vstack
+from astropy.table import Column, MaskedColumn, Table, vstack
 from astropy import constants
 from astropy.units.core import UnitConversionError
 
@@ -46,6 +51,18 @@ HEIGHT_COLUMN = 'height'
 MARKER_COLUMN = 'marker'
 DEFAULT_HEIGHT = 0.75
 
+# units to which the wavelengths of each list are converted for
+# range queries.
+CANONICAL_UNITS = u.AA
+
+# on-disk cache of the parsed bundled line lists. The version
+# must be increased whenever the cache layout or the parsing
+# of the line list files changes.
+CACHE_VERSION = 1
+CACHE_DIRECTORY = path.join(path.expanduser('~'), '.specviz', 'cache',
+                            'linelists')
+CACHE_METADATA = 'linelist.json'
+
 # columns to remove when exporting the plotted lines
 columns_to_remove = [REDSHIFTED_WAVELENGTH_COLUMN, COLOR_COLUMN,
                      HEIGHT_COLUMN, MARKER_COLUMN]
@@ -80,7 +97,7 @@ def get_from_file(linelist_path, filename):
     elif filename.endswith('.ecsv'):
         table = Table.read(filename, format='ascii.ecsv')
 
-        linelist = LineList(table, name=os.path.split(filename)[1])
+        linelist = LineList(table, name=os.path.split(filename)[1]).sorted()
         _linelists_cache.append(linelist)
 
         return linelist
@@ -89,10 +106,19 @@ def get_from_file(linelist_path, filename):
         return None
 
 
-def populate_linelists_cache():
+def populate_linelists_cache(cache_directory=None):
     """
     Function that should be called at the appropriate time when starting the
     app, so the lists are cached for speedier access later on.
+
+    Parsed lists are stored in a binary on-disk cache, keyed by
+    the hashes of their files, so that later starts only have
+    to memory-map their columns.
+
+    Parameters
+    ----------
+    cache_directory: str
+        Directory of the on-disk cache. Defaults to CACHE_DIRECTORY.
     """
     # we could benefit from a threaded approach here. But I couldn't
     # see the benefits, since the reading of even the largest line
@@ -104,10 +130,178 @@ def populate_linelists_cache():
     yaml_paths = glob.glob(linelist_path + '*.yaml')
 
     for yaml_filename in yaml_paths:
-        linelist = get_from_file(linelist_path, yaml_filename)
+        linelist = _get_from_disk_cache(linelist_path, yaml_filename,
+                                        cache_directory or CACHE_DIRECTORY)
         _linelists_cache.append(linelist)
 
 
+def _get_from_disk_cache(linelist_path, yaml_filename, cache_directory):
+    """
+    Gets a sorted line list from the on-disk cache, reading it
+    from file and storing it in the cache if it is not there.
+
+    Parameters
+    ----------
+    linelist_path: str
+        File path to the line list file
+    yaml_filename: str
+        File name of the YAML descriptor
+    cache_directory: str
+        Directory of the on-disk cache.
+
+    Returns
+    ------
+    LineList
+        The linelist
+    """
+    # cache entries are keyed by the hash of the descriptor,
+    # and hold the hash of the list file they were built from,
+    # so that warm starts don't even have to parse the YAML.
+    with open(yaml_filename, 'rb') as f:
+        digest = hashlib.sha1(str(CACHE_VERSION).encode() + f.read())
+
+    prefix = path.splitext(path.basename(yaml_filename))[0]
+    entry = path.join(cache_directory,
+                      '{}-{}'.format(prefix, digest.hexdigest()))
+
+    if path.isdir(entry):
+        try:
+            return _read_cache_entry(entry, linelist_path)
+        except (OSError, ValueError, KeyError) as err:
+            logging.debug("Unable to read cached line list '%s': %s",
+                          entry, err)
+
+    yaml_object = yaml.load(open(yaml_filename, 'r'))
+    linelist_fullname = linelist_path + os.path.sep + \
+                        yaml_object['filename']
+
+    linelist = LineList.read_list(linelist_fullname, yaml_object).sorted()
+
+    try:
+        _write_cache_entry(linelist, entry, yaml_object['filename'],
+                           _hash_file(linelist_fullname))
+    except (OSError, TypeError) as err:
+        logging.debug("Unable to cache line list '%s': %s", entry, err)
+    else:
+        # remove entries of previous versions of the same list.
+        for stale in glob.glob(path.join(cache_directory, prefix + '-*')):
+            if stale != entry:
+                shutil.rmtree(stale, ignore_errors=True)
+
+    return linelist
+
+
+def _hash_file(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _write_cache_entry(linelist, entry, source, source_hash):
+    """
+    Stores a line list in the on-disk cache. Each column is
+    stored in a separate .npy file, so that it can be memory
+    mapped, along with a JSON file holding the metadata.
+
+    Parameters
+    ----------
+    linelist: LineList
+        The line list
+    entry: str
+        Directory of the cache entry
+    source: str
+        File name of the line list file
+    source_hash: str
+        Hash of the contents of the line list file
+    """
+    os.makedirs(path.dirname(entry), exist_ok=True)
+
+    # write into a temporary directory first, so that readers
+    # never see a partially written entry.
+    tmp = tempfile.mkdtemp(dir=path.dirname(entry))
+
+    try:
+        columns = []
+        for k, colname in enumerate(linelist.colnames):
+            column = linelist[colname]
+            np.save(path.join(tmp, '{}.npy'.format(k)),
+                    np.asarray(column.data))
+
+            masked = isinstance(column, MaskedColumn)
+            if masked:
+                np.save(path.join(tmp, '{}.mask.npy'.format(k)),
+                        np.asarray(column.mask))
+
+            unit = column.unit.to_string() if column.unit is not None else None
+            columns.append({'name': colname, 'unit': unit, 'masked': masked})
+
+        metadata = {'version': CACHE_VERSION,
+                    'source': source,
+                    'source_hash': source_hash,
+                    'name': linelist.name,
+                    'tooltips': linelist.tooltips,
+                    'meta': dict(linelist.meta),
+                    'columns': columns}
+
+        with open(path.join(tmp, CACHE_METADATA), 'w') as f:
+            json.dump(metadata, f)
+
+        os.rename(tmp, entry)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def _read_cache_entry(entry, linelist_path):
+    """
+    Reads a line list from the on-disk cache, memory-mapping
+    its columns.
+
+    Parameters
+    ----------
+    entry: str
+        Directory of the cache entry
+    linelist_path: str
+        File path to the line list file
+
+    Returns
+    ------
+    LineList
+        The line list
+
+    Raises
+    ------
+    ValueError
+        If the entry is outdated.
+    """
+    with open(path.join(entry, CACHE_METADATA), 'r') as f:
+        metadata = json.load(f)
+
+    if metadata['version'] != CACHE_VERSION:
+        raise ValueError("Cache version {} is not supported".format(
+            metadata['version']))
+
+    source = linelist_path + os.path.sep + metadata['source']
+    if _hash_file(source) != metadata['source_hash']:
+        raise ValueError("Line list file '{}' has changed".format(source))
+
+    columns = []
+    for k, column in enumerate(metadata['columns']):
+        data = np.load(path.join(entry, '{}.npy'.format(k)), mmap_mode='r')
+
+        if column['masked']:
+            mask = np.load(path.join(entry, '{}.mask.npy'.format(k)))
+            columns.append(MaskedColumn(data, name=column['name'],
+                                        unit=column['unit'], mask=mask))
+        else:
+            columns.append(Column(data, name=column['name'],
+                                  unit=column['unit'], copy=False))
+
+    table = Table(columns, meta=metadata['meta'], copy=False)
+
+    return LineList(table, tooltips=metadata['tooltips'],
+                    name=metadata['name'], copy=False)
+
+
 def get_from_cache(index):
     """
     Returns a cached line list.
@@ -180,6 +374,15 @@ def descriptions():
     return result
 
 
+def _redshift_factor(redshift, z_units):
+    # factor that converts rest wavelengths to observed
+    # wavelengths, with the redshift given either as z
+    # or as a velocity in km/s.
+    if z_units == 'km/s':
+        return 1. + redshift / constants.c.value * 1000.
+    return 1. + redshift
+
+
 # Inheriting from QTable somehow makes this class incompatible
 # with the registry machinery in astropy.
 
@@ -195,10 +398,14 @@ class LineList(Table):
         The name of the list.
     masked: bool
         If true, a masked table is used.
+    copy: bool
+        If false, the columns of the list share their data
+        with the columns of the table.
     """
 
-    def __init__(self, table=None, tooltips=None, name=None, masked=None):
-        Table.__init__(self, data=table, masked=masked)
+    def __init__(self, table=None, tooltips=None, name=None, masked=None,
+                 copy=True):
+        Table.__init__(self, data=table, masked=masked, copy=copy)
 
         self.name = name
 
@@ -208,7 +415,11 @@ class LineList(Table):
         # LineList instance is regarded as immutable. Which it
         # should be anyways.
 
-        self._table = table
+        # When astropy builds a new instance, e.g. when slicing,
+        # the columns are added after initialization. The data
+        # of such an instance is then its own raw table.
+
+        self._table = table if table is not None else self
 
         # each list has associated color, height, and redshift attributes
         self.color = None
@@ -216,16 +427,39 @@ class LineList(Table):
         self.redshift = 0.
         self. z_units = 'z'
 
-        if len(table[WAVELENGTH_COLUMN].data):
-            self.wmin = table[WAVELENGTH_COLUMN].data.min()
-            self.wmax = table[WAVELENGTH_COLUMN].data.max()
-        else:
-            self.wmin = self.wmax = None
-
         # A line list (but not the underlying table) can have
         # tool tips associated to each column.
         self.tooltips = tooltips
 
+        # wavelengths in canonical units, sorted, and the
+        # sorting order of the rows. Built on the first range
+        # query.
+        self._wavelength_index = None
+
+        # a merged list tracks the lists it was built from.
+        self._sources = []
+        self._source_rows = []
+
+    @property
+    def wmin(self):
+        """
+        The minimum wavelength in the list, or None if
+        the list is empty.
+        """
+        if len(self) == 0:
+            return None
+        return self[WAVELENGTH_COLUMN].data.min()
+
+    @property
+    def wmax(self):
+        """
+        The maximum wavelength in the list, or None if
+        the list is empty.
+        """
+        if len(self) == 0:
+            return None
+        return self[WAVELENGTH_COLUMN].data.max()
+
     @property
     def table(self):
         """
@@ -305,6 +539,12 @@ class LineList(Table):
         Executes a 'vstack' of all input lists, and
         then sorts the result by the wavelength column.
 
+        The merged list keeps a reference to the input
+        lists and to the rows that hold the lines of each
+        one of them, so that changes to their color, height,
+        or redshift can be applied in place with
+        `update_source`.
+
         Parameters
         ----------
         lists: [LineList, ...]
@@ -325,9 +565,16 @@ class LineList(Table):
             # not on LineList instances. So we refer directly
             # to the raw Table instances.
 
-            internal_table = linelist._table
-            internal_table[WAVELENGTH_COLUMN].convert_unit_to(target_units,
-                                                equivalencies=u.spectral())
+            # The raw table may share its data with a cached line
+            # list, so columns are replaced rather than modified in
+            # place.
+
+            internal_table = Table(linelist._table, copy=False)
+            wavelengths = internal_table[WAVELENGTH_COLUMN].quantity.to(
+                target_units, equivalencies=u.spectral())
+            internal_table.replace_column(WAVELENGTH_COLUMN,
+                                          Column(wavelengths.value,
+                                                 unit=wavelengths.unit))
 
             # add columns to hold color and height attributes
             color_array = np.full(len(internal_table[WAVELENGTH_COLUMN]),
@@ -338,9 +585,7 @@ class LineList(Table):
             internal_table[HEIGHT_COLUMN] = height_array
 
             # add column to hold redshifted wavelength
-            f = 1. + linelist.redshift
-            if linelist.z_units == 'km/s':
-                f = 1. + linelist.redshift / constants.c.value * 1000.
+            f = _redshift_factor(linelist.redshift, linelist.z_units)
             z_wavelength = internal_table[WAVELENGTH_COLUMN] * f
             internal_table[REDSHIFTED_WAVELENGTH_COLUMN] = z_wavelength
 
@@ -353,9 +598,120 @@ class LineList(Table):
 
         merged_table = vstack(tables)
 
-        merged_table.sort(WAVELENGTH_COLUMN)
+        # the lines of each input list are stacked in one span,
+        # which the sort scatters. Keep track of where they go.
+        order = merged_table.argsort(WAVELENGTH_COLUMN, kind='stable')
+        merged_table = merged_table[order]
+
+        positions = np.empty(len(order), dtype=int)
+        positions[order] = np.arange(len(order))
+        bounds = np.cumsum([0] + [len(table) for table in tables])
+
+        result = cls(merged_table, "Merged")
+        result._sources = list(lists)
+        result._source_rows = [positions[start:stop] for start, stop
+                               in zip(bounds[:-1], bounds[1:])]
+
+        return result
+
+    @property
+    def sources(self):
+        """
+        The line lists this list was merged from, if any.
+        """
+        return self._sources
+
+    def source_rows(self, index):
+        """
+        The rows that hold the lines of one of the
+        line lists this list was merged from.
+
+        Parameters
+        ----------
+        index: int
+            Position of the line list in `sources`
+
+        Returns
+        -------
+        array of int
+            Row numbers in this list
+        """
+        return self._source_rows[index]
+
+    def update_source(self, index, redshift=True):
+        """
+        Updates in place the color, height, and redshifted
+        wavelength of the lines of one of the line lists
+        this list was merged from, after the attributes of
+        that line list have changed.
+
+        Parameters
+        ----------
+        index: int
+            Position of the line list in `sources`
+        redshift: bool
+            If False, only the color and height are updated.
+
+        Returns
+        -------
+        array of int
+            Row numbers of the updated lines
+        """
+        linelist = self._sources[index]
+        rows = self._source_rows[index]
 
-        return cls(merged_table, "Merged")
+        self[COLOR_COLUMN][rows] = linelist.color
+        self[HEIGHT_COLUMN][rows] = linelist.height
+
+        if redshift:
+            f = _redshift_factor(linelist.redshift, linelist.z_units)
+            self[REDSHIFTED_WAVELENGTH_COLUMN][rows] = \
+                self[WAVELENGTH_COLUMN].data[rows] * f
+
+        return rows
+
+    def sorted(self):
+        """
+        Builds a LineList instance out of self, with
+        the lines sorted by wavelength, so that range
+        queries with `extract_range` return views into
+        its columns instead of copies.
+
+        Returns
+        -------
+        LineList
+            line list with sorted lines, or self if the
+            lines are already sorted.
+        """
+        try:
+            _, order = self._get_wavelength_index()
+        except UnitConversionError:
+            return self
+
+        if order is None:
+            return self
+
+        return self._take_lines(order)
+
+    def _get_wavelength_index(self):
+        """
+        Returns the wavelengths of the lines converted to
+        the canonical units and sorted, together with the
+        order of the rows that sorts them, or None if the
+        rows are already sorted.
+        """
+        if self._wavelength_index is None:
+            wavelengths = self[WAVELENGTH_COLUMN].quantity.to_value(
+                CANONICAL_UNITS, equivalencies=u.spectral())
+            wavelengths = np.asarray(wavelengths, dtype=float)
+
+            if np.all(wavelengths[1:] >= wavelengths[:-1]):
+                self._wavelength_index = (wavelengths, None)
+            else:
+                order = np.argsort(wavelengths, kind='mergesort')
+                self._wavelength_index = (wavelengths[order], order)
+
+        return self._wavelength_index
 
     def extract_range(self, wrange):
         """
@@ -363,11 +719,11 @@ class LineList(Table):
         the subset of lines that fall within the
         wavelength range defined by 'wmin' and 'wmax'.
 
-        REMOVED FOR NOW: The actual range is somewhat
-        wider, to allow for radial velocity and redshift
-        effects. The actual handling of this must wait
-        until we get more detailed specs for the redshift
-        functionality.
+        The range is located with a binary search on
+        the wavelengths in canonical units. If the lines
+        are sorted, which is the case for all cached
+        lists, the columns of the result are views into
+        the columns of self.
 
         Parameters
         ----------
@@ -379,38 +735,32 @@ class LineList(Table):
         -------
         LineList
             line list with subset of lines
-        """
-        wavelengths = self[WAVELENGTH_COLUMN].quantity
-
-        wmin = wrange[0]
-        wmax = wrange[1]
-
-        # convert wavelenghts in line list to whatever
-        # units the wavelength range is expressed in.
-        new_wavelengths = wavelengths.to(wmin.unit,
-                                         equivalencies=u.spectral())
-
-        # add some leeway at the short and long end points.
-        # For now, we extend both ends by 10%. This might
-        # be enough at the short end, but it remains to be
-        # seen how this plays out when we add redshift
-        # functionality to the app.
-        #
-        # REMOVING THIS FOR NOW.
-        # wmin = wmin.value - wmin.value * 0.1
-        # wmax = wmax.value + wmax.value * 0.1
-        wmin = wmin.value
-        wmax = wmax.value
 
-        # 'indices' points to rows with wavelength values
-        # that lie outside the wavelength range.
-        indices_to_remove = np.where((new_wavelengths.value < wmin) |
-                                     (new_wavelengths.value > wmax))
-
-        result = self._remove_lines(indices_to_remove)
-
-        # new instance inherits the name from parent.
-        result.name = self.name
+        Raises
+        ------
+        UnitConversionError
+            If either the list or the range units are
+            not spectral units.
+        """
+        wavelengths, order = self._get_wavelength_index()
+
+        # the conversion may reverse the order of the end
+        # points, e.g. when the range is given in frequency.
+        wmin, wmax = sorted(w.to_value(CANONICAL_UNITS,
+                                       equivalencies=u.spectral())
+                            for w in wrange)
+
+        start = np.searchsorted(wavelengths, wmin, side='left')
+        stop = np.searchsorted(wavelengths, wmax, side='right')
+
+        if order is None:
+            # slicing gives views into the columns
+            result = self[start:stop]
+            result.name = self.name
+            result.tooltips = self.tooltips
+            result._wavelength_index = (wavelengths[start:stop], None)
+        else:
+            result = self._take_lines(order[start:stop])
 
         return result
 
@@ -419,50 +769,48 @@ class LineList(Table):
         Builds a LineList instance out of self, with
         the subset of lines pointed by 'indices'
 
+        The lines are taken with a single fancy index
+        on the columns, in the order of the rows in self.
+
         Parameters
         ----------
-        indices: [QModelIndex, ...]
-            List of QModelIndex instances to extract from.
+        indices: array
+            Array of row numbers, or boolean mask over the
+            rows, e.g. as built from a table view selection by
+            `~specviz.plugins.line_labels.linelists_window.SortModel.source_row_mask`.
 
         Returns
         -------
         LineList
             line list with subset of lines
         """
-        row_indices = []
-        for index in indices:
-            row_indices.append(index.row())
+        indices = np.asarray(indices)
 
-        line_indices = []
-        for index in range(len(self.columns[0])):
-            line_indices.append(index)
-
-        indices_to_remove = list(
-            filter(lambda x: x not in row_indices, line_indices)
-        )
+        if indices.dtype == bool:
+            rows = np.flatnonzero(indices)
+        else:
+            rows = np.unique(indices)
 
-        return self._remove_lines(indices_to_remove)
+        return self._take_lines(rows)
 
-    def _remove_lines(self, indices_to_remove):
+    def _take_lines(self, indices):
         """
-        Makes a copy of self and removes
-        unwanted lines from the copy.
+        Builds a new LineList instance out of self with
+        the lines pointed by 'indices', in that order.
 
         Parameters
         ----------
-        indices_to_remove: [int, ...]
-            List of row numbers to remove
+        indices: array of int
+            Row numbers of the lines to take
 
         Returns
         -------
         LineList:
-            A new copy of the `LineList` with the rows removed.
+            A new `LineList` with the selected lines.
         """
-        table = Table(self)
-
-        table.remove_rows(indices_to_remove)
-
-        result = LineList(table, tooltips=self.tooltips, name=self.name)
+        result = self[np.asarray(indices, dtype=int)]
+        result.name = self.name
+        result.tooltips = self.tooltips
 
         return result
 
@@ -505,3 +853,4 @@ class LineList(Table):
 
         """
         self.height = height
+
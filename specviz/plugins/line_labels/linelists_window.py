@@ -3,13 +3,17 @@ Define all the line list-based windows and dialogs
 """
 import os
 import sys
+from functools import partial
+
+import numpy as np
 
 from qtpy.QtWidgets import (QWidget, QTabWidget, QVBoxLayout, QTabBar,
                             QTableView, QMainWindow, QAbstractItemView, QStackedLayout,
                             QLayout, QGridLayout, QBoxLayout, QTextBrowser, QComboBox,
                             QDialog, QErrorMessage, QSizePolicy)
 from qtpy.QtGui import QColor, QStandardItem, QDoubleValidator, QFont, QIcon
-from qtpy.QtCore import (Qt, Signal, QAbstractTableModel, QVariant, QSortFilterProxyModel)
+from qtpy.QtCore import (Qt, Signal, QAbstractTableModel, QVariant, QAbstractProxyModel,
+                         QModelIndex, QCoreApplication)
 from qtpy import compat
 from qtpy.uic import loadUi
 
@@ -21,6 +25,7 @@ from astropy.units.core import UnitConversionError
 from astropy.io import ascii
 
 from ...core.plugin import plugin
+from ...core.tasks import TaskRunner
 
 from . import linelist
 from .linelist import WAVELENGTH_COLUMN, ERROR_COLUMN, DEFAULT_HEIGHT
@@ -58,6 +63,22 @@ units_formats = {
     "eV": "%.3f"
 }
 
+# Returns a boolean mask over the rows of a model, with the rows
+# covered by a selection set. Selections of whole rows are made of a
+# few ranges, e.g. a single one when selecting all rows or a range of
+# rows, so this doesn't build any per-row object.
+def _selection_mask(selection, nrows):
+    tops = np.fromiter((r.top() for r in selection), dtype=int)
+    bottoms = np.fromiter((r.bottom() for r in selection), dtype=int)
+
+    # ranges may overlap, so count how many cover each row.
+    edges = np.zeros(nrows + 1, dtype=int)
+    np.add.at(edges, tops, 1)
+    np.add.at(edges, bottoms + 1, -1)
+
+    return np.cumsum(edges[:-1]) > 0
+
+
 # Function that creates one single tabbed pane with one single view of a line list.
 
 def _create_line_list_pane(linelist, table_model, caller):
@@ -211,6 +232,12 @@ class LineListsWindow(QWidget):
 
         self.line_labels_plotter = LineLabelsPlotter(self)
 
+        # Line list files are read, and the table models of the line lists
+        # are built, in worker threads. Panes show up as they are ready.
+        self._loader = TaskRunner(parent=self)
+        self._loader.busy.connect(self.actionCancel.setEnabled)
+        self._loader.failed.connect(self._on_loading_failed)
+
         # Connect controls to appropriate signals.
 
         self.draw_button.clicked.connect(
@@ -225,6 +252,7 @@ class LineListsWindow(QWidget):
 
         self.actionOpen.triggered.connect(lambda:self._open_linelist_file(file_name=None))
         self.actionExport.triggered.connect(lambda:self._export_to_file(file_name=None))
+        self.actionCancel.triggered.connect(self._loader.cancel)
         self.line_list_selector.currentIndexChanged.connect(self._lineList_selection_change)
         self.tab_widget.tabCloseRequested.connect(self._on_tab_close)
 
@@ -235,6 +263,8 @@ class LineListsWindow(QWidget):
         The Dismiss button just clears the plug-in
         window from whatever line lists it's holding.
         """
+        self._loader.cancel()
+
         v = self.tab_widget.count()
         for index in range(v-1,-1,-1):
             self.tab_widget.removeTab(index)
@@ -372,12 +402,25 @@ class LineListsWindow(QWidget):
 
         return label
 
-    def _build_view(self, line_list, index, waverange=(None, None)):
+    def _build_view(self, line_list, index, waverange=(None, None), callback=None):
+        # the range extraction and the table model, which formats every
+        # cell of the line list, are built in a worker thread. The pane
+        # is added once they are ready.
+        extract = bool(self.wave_range[0] and self.wave_range[1])
+        gui_thread = QCoreApplication.instance().thread()
 
-        if self.wave_range[0] and self.wave_range[1]:
-            line_list = line_list.extract_range(waverange)
+        def build_model():
+            result = line_list.extract_range(waverange) if extract else line_list
 
-        table_model = LineListTableModel(line_list)
+            table_model = LineListTableModel(result)
+            table_model.moveToThread(gui_thread)
+
+            return result, table_model
+
+        self._loader.submit(build_model,
+                            lambda result: self._add_view(*result, index, callback))
+
+    def _add_view(self, line_list, table_model, index, callback=None):
 
         if table_model.rowCount() > 0:
             # here we add the first pane (the one with the entire
@@ -396,27 +439,42 @@ class LineListsWindow(QWidget):
             table_view.selectionModel().selectionChanged.connect(self._count_selections)
 
             # now we add this "line set tabbed pane" to the main tabbed
-            # pane, with name taken from the list model.
-            self.tab_widget.insertTab(index, lineset_tabbed_pane, table_model.get_name())
-            self.tab_widget.setCurrentIndex(index)
-
-            # store for use down stream.
-            # self.table_views.append(table_view)
-            # self.set_tabbed_panes.append(set_tabbed_pane)
-            # self.tab_count.append(0)
-            # self.panes.append(pane)
-
-            return line_list
+            # pane, with name taken from the list model. Panes may be
+            # ready in any order, so the pane is placed in the slot of
+            # its requested index among the panes added so far.
+            lineset_tabbed_pane.list_index = index
+            position = self._view_position(index)
+            self.tab_widget.insertTab(position, lineset_tabbed_pane, table_model.get_name())
+            self.tab_widget.setCurrentIndex(position)
+
+            if callback is not None:
+                callback(line_list)
+
+    def _view_position(self, index):
+        # the position in front of the first line list pane requested
+        # at the same or a later index, or of the first other tab, such
+        # as the plotted lines tab.
+        for position in range(self.tab_widget.count()):
+            list_index = getattr(self.tab_widget.widget(position), 'list_index', None)
+            if list_index is None or list_index >= index:
+                return position
+        return self.tab_widget.count()
+
+    def _on_loading_failed(self, message):
+        error_dialog = QErrorMessage()
+        error_dialog.showMessage('Line list could not be loaded: ' + message)
+        error_dialog.exec_()
 
     def _build_views(self, plot_window):
         window_linelists = plot_window.linelists
         for linelist, index in zip(window_linelists, range(len(window_linelists))):
             self._build_view(linelist, index)
 
-        # add extra tab to hold the plotted lines view.
-        widget_count = self.tab_widget.count()
-        if widget_count > 0:
+        # add extra tab to hold the plotted lines view. The line
+        # list panes are inserted in front of it once they are ready.
+        if len(window_linelists) > 0:
             self.tab_widget.addTab(QWidget(), PLOTTED)
+            widget_count = self.tab_widget.count()
             self.tab_widget.tabBar().setTabButton(widget_count - 1, QTabBar.LeftSide, None)
 
     def _get_panes(self):
@@ -453,9 +511,10 @@ class LineListsWindow(QWidget):
     # and displays result in GUI.
     def _count_selections(self):
         panes = self._get_panes()
-        sizes = [len(pane.table_view.selectionModel().selectedRows()) for pane in panes]
-        import functools
-        count = functools.reduce(lambda x, y: x + y, sizes)
+        count = sum(np.count_nonzero(
+            _selection_mask(pane.table_view.selectionModel().selection(),
+                            pane.table_view.model().rowCount()))
+                    for pane in panes)
 
         # display total selected rows, with eventual warning.
         self.lines_selected_label.setText(str(count))
@@ -476,19 +535,26 @@ class LineListsWindow(QWidget):
             # For now, lets assume both the line list itself, and its
             # associated YAML descriptor file, live in the same directory.
             # Not an issue for self-contained ecsv files.
+            # Files are parsed in worker threads. Each line list is
+            # displayed as soon as it has been read.
             if file_name is not None and len(file_name) > 0:
-                name = file_name[0]
-                line_list = linelist.get_from_file(os.path.dirname(name), name)
+                for name in file_name:
+                    self._loader.submit(partial(linelist.get_from_file,
+                                                os.path.dirname(name), name),
+                                        self._linelist_file_read)
 
-                if line_list:
-                    self._get_waverange_from_dialog(line_list)
-                    if self.wave_range[0] and self.wave_range[1]:
-                        line_list = self._build_view(line_list, 0, waverange=self.wave_range)
+    def _linelist_file_read(self, line_list):
+        if line_list:
+            self._get_waverange_from_dialog(line_list)
+            if self.wave_range[0] and self.wave_range[1]:
+                self._build_view(line_list, 0, waverange=self.wave_range,
+                                 callback=self._add_plot_window_linelist)
 
-                        if not hasattr(self.plot_window, 'linelists'):
-                            self.plot_window.linelists = []
+    def _add_plot_window_linelist(self, line_list):
+        if not hasattr(self.plot_window, 'linelists'):
+            self.plot_window.linelists = []
 
-                        self.plot_window.linelists.append(line_list)
+        self.plot_window.linelists.append(line_list)
 
     def _export_to_file(self, file_name=None):
         if file_name is None:
@@ -640,12 +706,11 @@ class LineListPane(QWidget):
     def _create_set(self):
         # build list with only the selected rows. These must be model
         # rows, not view rows!
-        selected_view_rows = self.table_view.selectionModel().selectedRows()
-        selected_model_rows = [self._sort_proxy.mapToSource(x) for x in selected_view_rows]
+        selection = self.table_view.selectionModel().selection()
+        selected_model_rows = self._sort_proxy.source_row_mask(selection)
 
-        if len(selected_model_rows) > 0:
-            r = [x for x in selected_model_rows]
-            local_list = self.linelist.extract_rows(r)
+        if np.any(selected_model_rows):
+            local_list = self.linelist.extract_rows(selected_model_rows)
 
             # name is used to match lists with table views
             local_list.name = self.linelist.name
@@ -665,8 +730,8 @@ class LineListPane(QWidget):
         self._sets_tabbed_pane.removeTab(index)
 
     def _handle_button_activation(self):
-        nselected = len(self.table_view.selectionModel().selectedRows())
-        self.button_pane.create_set_button.setEnabled(nselected > 0)
+        has_selection = self.table_view.selectionModel().hasSelection()
+        self.button_pane.create_set_button.setEnabled(has_selection)
 
 
 class PlottedLinesPane(QWidget):
@@ -738,6 +803,9 @@ class LineListTableModel(QAbstractTableModel):
     """
     The line list table model.
 
+    The model reads its cells straight from the columns of the line list,
+    and only formats the cells that are displayed.
+
     Parameters
     ----------
     linelist : :class:`~specviz.plugins.line_labels.linelist.LineList`
@@ -751,65 +819,18 @@ class LineListTableModel(QAbstractTableModel):
 
         self._linelist = linelist
 
-        #TODO move entire table contents to an array of QVector
-        # instances that will store the columns. This should
-        # speed up the sorting (as far as some indications in
-        # the net suggest:
-        # http://www.qtforum.org/article/30638/qsortfilterproxymodel-qtreeview-sort-performance.html).
-        # Bummer... this is C++ only; PyQt never went to the trouble
-        # of converting QVector to python.
-        #
-        # get rid entirely of astropy table and store its contents in
-        # a 2-D list of lists. By using python lists instead of an
-        # astropy table, and storing the QVariant instances instead
-        # of the raw content, we can speed up sorting by a factor > 10X.
+        # the columns are numpy arrays (astropy columns), so a cell
+        # is a cheap index into them. Cells are formatted lazily, by
+        # data(), for the rows that are actually displayed.
+        self._columns = list(linelist.columns.values())
 
         # we have to do this here because some lists may
         # have no lines at all.
-        self._nrows = 0
-        self._ncols = 0
-
-        self._row_cells = []
-
-        for row in self._linelist:
-            cells = []
-            for rindex in range(len(row)):
-                cell = row[rindex]
-
-                # handling of a color object can be tricky. Color names
-                # returned by QColor.colorNames() are inconsistent with
-                # color names in Qt.GlobalColor. We just go to the basics
-                # and compare color equality (or closeness) using a distance
-                # criterion in r,g,b coordinates.
-                # Although costly, this would be a CPU burden only when
-                # sorting columns with color information. For now, only
-                # the Plotted Lines line list has such information, and
-                # the number of actually plotted lines tends to be small
-                # anyway.
-                if isinstance(cell, QColor):
-                    r = cell.red()
-                    g = cell.green()
-                    b = cell.blue()
-                    min_dist = 100000
-                    result = cell
-                    for color_name, orig_color in ID_COLORS.items():
-                        orig_rgb = QColor(orig_color)
-                        dist = abs(orig_rgb.red() - r) + abs(orig_rgb.green() - g) + abs(orig_rgb.blue() - b)
-                        if dist < min_dist:
-                            min_dist = dist
-                            result = orig_color
-
-                    key = [k for k,value in ID_COLORS.items() if value == result][0]
-
-                    cells.append(QVariant(key))
-
-                else:
-                    cells.append(QVariant(str(cell)))
+        self._nrows = len(linelist)
+        self._ncols = len(self._columns) if self._nrows > 0 else 0
 
-            self._row_cells.append(cells)
-
-            self._nrows = len(self._row_cells)
-            self._ncols = len(self._row_cells[0])
+        # names of color cells, by RGB value.
+        self._color_names = {}
 
     def rowCount(self, parent=None, *args, **kwargs):
         """
@@ -833,17 +854,72 @@ class LineListTableModel(QAbstractTableModel):
         if role != Qt.DisplayRole:
             return QVariant()
 
-        # This is the main bottleneck for sorting. Profiling experiments
-        # show that the main culprit is the .columns[][] accessor in the
-        # astropy table. The index.column() and index.row() calls cause
-        # negligible CPU load.
-        #
-        # return self._linelist.columns[index.column()][index.row()]
-        #
-        # going from an astropy table to a list of rows, the bottleneck
-        # narrows down to the astropy code that gets a cell value from a
-        # Row instance.
-        return self._row_cells[index.row()][index.column()]
+        return QVariant(self._format(self._columns[index.column()][index.row()]))
+
+    def _format(self, cell):
+        if isinstance(cell, QColor):
+            return self._color_name(cell)
+
+        return str(cell)
+
+    def _color_name(self, color):
+        # handling of a color object can be tricky. Color names
+        # returned by QColor.colorNames() are inconsistent with
+        # color names in Qt.GlobalColor. We just go to the basics
+        # and compare color equality (or closeness) using a distance
+        # criterion in r,g,b coordinates. The few distinct colors
+        # in a list are only matched once.
+        rgb = (color.red(), color.green(), color.blue())
+
+        if rgb not in self._color_names:
+            distances = {}
+            for color_name, orig_color in ID_COLORS.items():
+                orig_rgb = QColor(orig_color)
+                distances[color_name] = (abs(orig_rgb.red() - rgb[0]) +
+                                         abs(orig_rgb.green() - rgb[1]) +
+                                         abs(orig_rgb.blue() - rgb[2]))
+
+            self._color_names[rgb] = min(distances, key=distances.get)
+
+        return self._color_names[rgb]
+
+    def sort_keys(self, column):
+        """
+        Builds an array that sorts the rows of the model
+        by the values in a column.
+
+        Numeric columns sort by value, and other columns sort
+        by their display strings, numerically if they all hold
+        numbers, or lexicographically otherwise.
+
+        Parameters
+        ----------
+        column : int
+            The column index.
+
+        Returns
+        -------
+        `~numpy.ndarray`
+            The sort keys, one per row.
+        """
+        values = self._columns[column]
+
+        if values.dtype.kind in 'biuf':
+            if isinstance(values, np.ma.MaskedArray):
+                return values.astype(float).filled(np.nan)
+            return np.asarray(values)
+
+        if values.dtype.kind == 'O':
+            keys = np.array([self._format(cell) for cell in values])
+        elif isinstance(values, np.ma.MaskedArray):
+            keys = np.asarray(values.filled(''), dtype=str)
+        else:
+            keys = np.asarray(values, dtype=str)
+
+        try:
+            return keys.astype(float)
+        except ValueError:
+            return keys
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         """
@@ -877,10 +953,15 @@ class LineListTableModel(QAbstractTableModel):
         return self._linelist.name
 
 
-class SortModel(QSortFilterProxyModel):
+class SortModel(QAbstractProxyModel):
     """
     A sorting model for line list columns.
 
+    The model holds the order of the rows of the source
+    model as a permutation array. Sorting by a column is
+    a single argsort of the sort keys of the column, as
+    provided by :meth:`LineListTableModel.sort_keys`.
+
     Parameters
     ----------
     name : str
@@ -893,24 +974,166 @@ class SortModel(QSortFilterProxyModel):
 
         self._name = name
 
-    def lessThan(self, left, right):
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+
+        # source row of each row in this model, and the
+        # reverse mapping. None while the rows aren't sorted.
+        self._source_rows = None
+        self._proxy_rows = None
+
+        # line list table models don't change once built, so
+        # their size is looked up once. Selections call these
+        # methods for every selected row when sorting.
+        self._nrows = 0
+        self._ncols = 0
+
+    def setSourceModel(self, model):
         """
         Overrides the base class
         """
-        left_data = left.data()
-        right_data = right.data()
+        self.beginResetModel()
+        super(SortModel, self).setSourceModel(model)
+        self._nrows = model.rowCount() if model is not None else 0
+        self._ncols = model.columnCount() if model is not None else 0
+        self._sort_column = -1
+        self._source_rows = None
+        self._proxy_rows = None
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Overrides the base class
+        """
+        return 0 if parent.isValid() else self._nrows
 
-        # it's enough to find type using just one of the parameters,
-        # since they both necessarily come from the same table column.
-        try:
-            l = float(left_data)
-            r = float(right_data)
-            return l < r
-        except:
-            # Lexicographic string comparison. The parameters passed
-            # to this method from a sortable table model are stored
-            # in QtCore.QModelIndex instances.
-            return str(left_data) < str(right_data)
+    def columnCount(self, parent=QModelIndex()):
+        """
+        Overrides the base class
+        """
+        return 0 if parent.isValid() else self._ncols
+
+    def index(self, row, column, parent=QModelIndex()):
+        """
+        Overrides the base class
+        """
+        if parent.isValid() or not (0 <= row < self._nrows and
+                                    0 <= column < self._ncols):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def flags(self, index):
+        """
+        Overrides the base class
+        """
+        # all cells of a line list table share the same flags.
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def parent(self, index=None):
+        """
+        Overrides the base class
+        """
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        """
+        Overrides the base class
+        """
+        if not proxy_index.isValid():
+            return QModelIndex()
+
+        row = proxy_index.row()
+        if self._source_rows is not None:
+            row = int(self._source_rows[row])
+
+        return self.sourceModel().index(row, proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        """
+        Overrides the base class
+        """
+        if not source_index.isValid():
+            return QModelIndex()
+
+        row = source_index.row()
+        if self._proxy_rows is not None:
+            row = int(self._proxy_rows[row])
+
+        return self.index(row, source_index.column())
+
+    def sortColumn(self):
+        """
+        The column the rows are sorted by, or -1 if
+        they are in their original order.
+        """
+        return self._sort_column
+
+    def sortOrder(self):
+        """
+        The order the rows are sorted in.
+        """
+        return self._sort_order
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Overrides the base class
+        """
+        self.layoutAboutToBeChanged.emit()
+
+        # views and selections refer to rows through persistent
+        # indices, which must follow their rows.
+        persistent = self.persistentIndexList()
+        source_indices = [self.mapToSource(index) for index in persistent]
+
+        if column < 0 or column >= self._ncols:
+            self._source_rows = None
+            self._proxy_rows = None
+        else:
+            keys = self.sourceModel().sort_keys(column)
+            source_rows = np.argsort(keys, kind='stable')
+            if order == Qt.DescendingOrder:
+                source_rows = source_rows[::-1]
+
+            self._source_rows = source_rows
+            self._proxy_rows = np.empty_like(source_rows)
+            self._proxy_rows[source_rows] = np.arange(len(source_rows))
+
+        self._sort_column = column
+        self._sort_order = order
+
+        self.changePersistentIndexList(
+            persistent, [self.mapFromSource(index) for index in source_indices])
+
+        self.layoutChanged.emit()
+
+    def source_row_mask(self, selection):
+        """
+        Maps a selection of rows in this model to the rows
+        of the source model.
+
+        Parameters
+        ----------
+        selection : :class:`~qtpy.QtCore.QItemSelection`
+            The selection, e.g. from the selection model of
+            the table view.
+
+        Returns
+        -------
+        `~numpy.ndarray`
+            Boolean mask over the rows of the source model.
+        """
+        mask = _selection_mask(selection, self._nrows)
+
+        # the order of the rows only changes once sorted.
+        if self._source_rows is None:
+            return mask
+
+        source_mask = np.zeros(len(mask), dtype=bool)
+        source_mask[self._source_rows[mask]] = True
+
+        return source_mask
 
     def get_name(self):
         """
@@ -0,0 +1,160 @@
+import numpy as np
+from astropy import units as u
+from astropy.table import Table
+
+from .. import linelist
+from ..linelist import (COLOR_COLUMN, HEIGHT_COLUMN, ID_COLUMN,
+                        REDSHIFTED_WAVELENGTH_COLUMN, WAVELENGTH_COLUMN,
+                        LineList)
+
+
+def _build_list():
+    table = Table([[6563., 4861., 4340., 5007., 3727., 6584.],
+                   ['Ha', 'Hb', 'Hg', '[OIII]', '[OII]', '[NII]']],
+                  names=[WAVELENGTH_COLUMN, ID_COLUMN])
+    table[WAVELENGTH_COLUMN].unit = u.AA
+
+    return LineList(table, name="Test")
+
+
+def test_sorted():
+    linelist = _build_list().sorted()
+
+    assert linelist.name == "Test"
+    assert np.all(np.diff(linelist[WAVELENGTH_COLUMN]) >= 0)
+
+    # Sorting an already sorted list is a no-op
+    assert linelist.sorted() is linelist
+
+
+def test_extract_range_returns_views():
+    linelist = _build_list().sorted()
+
+    result = linelist.extract_range((4000 * u.AA, 6000 * u.AA))
+
+    assert isinstance(result, LineList)
+    assert result.name == "Test"
+    assert list(result[ID_COLUMN]) == ['Hg', 'Hb', '[OIII]']
+    assert np.shares_memory(result[WAVELENGTH_COLUMN].data,
+                            linelist[WAVELENGTH_COLUMN].data)
+
+
+def test_extract_range_matches_mask():
+    linelist = _build_list()
+
+    # A range in frequency units reverses the order of the end points
+    wrange = ((6000 * u.AA).to(u.Hz, equivalencies=u.spectral()),
+              (4000 * u.AA).to(u.Hz, equivalencies=u.spectral()))
+
+    for source in (linelist, linelist.sorted()):
+        result = source.extract_range(wrange)
+
+        frequencies = source[WAVELENGTH_COLUMN].quantity.to(
+            u.Hz, equivalencies=u.spectral())
+        expected = source[(frequencies >= wrange[0]) &
+                          (frequencies <= wrange[1])]
+
+        assert sorted(result[ID_COLUMN]) == sorted(expected[ID_COLUMN])
+
+
+def test_extract_rows():
+    linelist = _build_list()
+
+    mask = np.zeros(len(linelist), dtype=bool)
+    mask[[1, 3, 4]] = True
+
+    for indices in (mask, np.array([4, 1, 3, 1]), [3, 1, 4]):
+        result = linelist.extract_rows(indices)
+
+        assert isinstance(result, LineList)
+        assert result.name == "Test"
+        # Lines keep the order of the rows in the list
+        assert list(result[ID_COLUMN]) == ['Hb', '[OIII]', '[OII]']
+
+    assert len(linelist.extract_rows(np.zeros(len(linelist), dtype=bool))) == 0
+
+
+def test_merge_does_not_modify_extracted_lists():
+    linelist = _build_list().sorted()
+    extracted = linelist.extract_range((4000 * u.AA, 6000 * u.AA))
+
+    merged = LineList.merge([extracted], u.micron)
+
+    assert merged[WAVELENGTH_COLUMN].unit == u.micron
+    assert linelist[WAVELENGTH_COLUMN].unit == u.AA
+    assert linelist[WAVELENGTH_COLUMN][0] == 3727.
+
+
+def test_merge_update_source():
+    first = _build_list()
+    second = _build_list().extract_range((4000 * u.AA, 5000 * u.AA))
+    second.set_redshift(0.5, 'z')
+
+    merged = LineList.merge([first, second], u.AA)
+
+    assert merged.sources == [first, second]
+    assert np.all(np.diff(merged[WAVELENGTH_COLUMN]) >= 0)
+
+    for index, source in enumerate(merged.sources):
+        rows = merged.source_rows(index)
+        assert sorted(merged[ID_COLUMN][rows]) == sorted(source[ID_COLUMN])
+
+    second.set_redshift(1., 'z')
+    second.set_color('red')
+    second.setHeight(0.25)
+
+    rows = merged.update_source(1)
+    others = merged.source_rows(0)
+
+    np.testing.assert_allclose(merged[REDSHIFTED_WAVELENGTH_COLUMN][rows],
+                               2 * merged[WAVELENGTH_COLUMN][rows])
+    assert list(merged[COLOR_COLUMN][rows]) == ['red'] * len(rows)
+    assert np.all(merged[HEIGHT_COLUMN][rows] == 0.25)
+
+    # Lines from the other list are left untouched
+    np.testing.assert_array_equal(merged[REDSHIFTED_WAVELENGTH_COLUMN][others],
+                                  merged[WAVELENGTH_COLUMN][others])
+    assert np.all(merged[HEIGHT_COLUMN][others] == first.height)
+
+    # Style changes alone leave the lines where they are
+    second.set_redshift(2., 'z')
+    second.setHeight(0.5)
+
+    merged.update_source(1, redshift=False)
+
+    np.testing.assert_allclose(merged[REDSHIFTED_WAVELENGTH_COLUMN][rows],
+                               2 * merged[WAVELENGTH_COLUMN][rows])
+    assert np.all(merged[HEIGHT_COLUMN][rows] == 0.5)
+
+
+def test_disk_cache(tmpdir):
+    cache_directory = str(tmpdir)
+
+    linelist._linelists_cache.clear()
+    linelist.populate_linelists_cache(cache_directory)
+    parsed = list(linelist._linelists_cache)
+
+    # The second time around the lists are read from the cache
+    linelist._linelists_cache.clear()
+    linelist.populate_linelists_cache(cache_directory)
+    cached = list(linelist._linelists_cache)
+
+    linelist._linelists_cache.clear()
+
+    assert len(tmpdir.listdir()) == len(parsed) > 0
+
+    for original, copy in zip(parsed, cached):
+        assert copy.name == original.name
+        assert copy.tooltips == original.tooltips
+        assert copy.colnames == original.colnames
+
+        for colname in original.colnames:
+            assert copy[colname].unit == original[colname].unit
+            assert np.all(copy[colname] == original[colname])
+
+        # The columns are memory-mapped from the cache
+        base = copy[WAVELENGTH_COLUMN].data
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+
+        assert base is not None
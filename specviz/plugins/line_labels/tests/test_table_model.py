@@ -0,0 +1,68 @@
+import numpy as np
+from astropy import units as u
+from astropy.table import MaskedColumn, Table
+from qtpy.QtCore import QItemSelection, QItemSelectionModel, Qt
+
+from ..linelist import ID_COLUMN, WAVELENGTH_COLUMN, LineList
+from ..linelists_window import LineListTableModel, SortModel
+
+
+def _build_model(qtbot):
+    table = Table([[6563., 4861., 4340., 5007.],
+                   ['Ha', 'Hb', 'Hg', '[OIII]'],
+                   MaskedColumn([1., 3., 2., 0.], mask=[False, False, False, True])],
+                  names=[WAVELENGTH_COLUMN, ID_COLUMN, 'Strength'])
+    table[WAVELENGTH_COLUMN].unit = u.AA
+
+    model = LineListTableModel(LineList(table, name="Test"))
+    proxy = SortModel(model.get_name())
+    proxy.setSourceModel(model)
+
+    return model, proxy
+
+
+def _column(proxy, column):
+    return [proxy.index(row, column).data() for row in range(proxy.rowCount())]
+
+
+def test_table_model_data(qtbot):
+    model, proxy = _build_model(qtbot)
+
+    assert model.rowCount() == 4
+    assert model.columnCount() == 3
+    assert _column(proxy, 1) == ['Ha', 'Hb', 'Hg', '[OIII]']
+    assert _column(proxy, 2) == ['1.0', '3.0', '2.0', '--']
+
+
+def test_sort_model(qtbot):
+    model, proxy = _build_model(qtbot)
+
+    proxy.sort(0, Qt.AscendingOrder)
+    assert _column(proxy, 1) == ['Hg', 'Hb', '[OIII]', 'Ha']
+
+    proxy.sort(1, Qt.DescendingOrder)
+    assert _column(proxy, 1) == ['[OIII]', 'Hg', 'Hb', 'Ha']
+
+    # Masked values sort last
+    proxy.sort(2, Qt.AscendingOrder)
+    assert _column(proxy, 2) == ['1.0', '2.0', '3.0', '--']
+
+    proxy.sort(-1)
+    assert _column(proxy, 1) == ['Ha', 'Hb', 'Hg', '[OIII]']
+
+
+def test_sort_model_selection(qtbot):
+    model, proxy = _build_model(qtbot)
+    selection_model = QItemSelectionModel(proxy)
+
+    proxy.sort(0, Qt.AscendingOrder)
+    selection_model.select(QItemSelection(proxy.index(0, 0), proxy.index(1, 2)),
+                           QItemSelectionModel.Select)
+
+    mask = proxy.source_row_mask(selection_model.selection())
+    np.testing.assert_array_equal(mask, [False, True, True, False])
+
+    # The selection follows its rows when sorting again
+    proxy.sort(0, Qt.DescendingOrder)
+    mask = proxy.source_row_mask(selection_model.selection())
+    np.testing.assert_array_equal(mask, [False, True, True, False])
@@ -27,21 +27,26 @@ class ModelDataItem(DataItem):
         """
         Evaluates the current model editor model equation, generates and
         returns new flux values, and updates the stored spectrum information.
+
+        The stored values are modified in place, so the data version is
+        incremented whenever they change.
         """
         if self.model_editor_model is None:
             return super().flux
 
+        spectrum = self.spectrum
         result = self.model_editor_model.evaluate()
 
         if result is not None:
-            flux = result(self.spectral_axis.value) * self.data(
-                self.DataRole).flux.unit
-            self.data(self.DataRole)._data = flux.value
+            values = result(self.spectral_axis.value)
         else:
-            self.data(self.DataRole)._data = np.zeros_like(
-                self.data(self.DataRole)._data)
+            values = np.zeros_like(spectrum._data)
+
+        if not np.array_equal(values, spectrum._data, equal_nan=True):
+            spectrum._data = values
+            self._data_version += 1
 
-        return self.data(self.DataRole).flux
+        return spectrum.flux
 
     @property
     def spectrum(self):
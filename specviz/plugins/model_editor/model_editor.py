@@ -345,8 +345,17 @@ class ModelEditor(QWidget):
         if model_plot_data_item is not None and \
                 isinstance(model_plot_data_item.data_item, ModelDataItem):
             self._update_model_data_item()
+
+            data_item = model_plot_data_item.data_item
+            data_version = data_item.data_version
+
             model_plot_data_item.set_data()
 
+            # Evaluating the model updates the data in place, so let
+            # consumers of the data, e.g. the statistics, know about it
+            if data_item.data_version != data_version:
+                data_item.emitDataChanged()
+
     def _on_model_item_changed(self, item):
         if item.parent():
             # If the item has a parent, then we know that the parameter
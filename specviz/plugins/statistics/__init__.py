@@ -1 +1,2 @@
 from .statistics_widget import StatisticsWidget
+from .batch_dialog import BatchStatisticsDialog
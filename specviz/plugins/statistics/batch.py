@@ -0,0 +1,250 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from astropy import units as u
+from astropy.table import MaskedColumn, Table
+
+from ...core import line_analysis
+from ...core.lazy import LazySpectrum
+from .statistics_index import StatisticsIndex
+from .statistics_widget import compute_snr, locate_region, region_bounds
+
+__all__ = ['STATISTICS', 'batch_statistics']
+
+# The statistics computed for each spectrum and region, in the order of the
+# table columns, with the units of each statistic in terms of the flux unit
+# and the spectral axis unit of the spectrum
+STATISTICS = (('mean', 'flux'),
+              ('median', 'flux'),
+              ('stddev', 'flux'),
+              ('centroid', 'spectral'),
+              ('snr', None),
+              ('fwhm', 'spectral'),
+              ('ew', 'spectral'),
+              ('total', 'flux spectral'),
+              ('maxval', 'flux'),
+              ('minval', 'flux'))
+
+
+def _region_bounds(regions, spectral_unit, bounds):
+    """
+    The bounds of each region in a spectral axis unit, or the error raised
+    when converting them, converted once per unit and kept in ``bounds``.
+    """
+    if spectral_unit not in bounds:
+        converted = []
+
+        for region in regions:
+            try:
+                converted.append(region_bounds(region, spectral_unit)
+                                 if region is not None else None)
+            except ValueError as e:
+                converted.append(e)
+
+        # Threads converting the bounds at the same time store equal values
+        bounds[spectral_unit] = converted
+
+    return bounds[spectral_unit]
+
+
+def _spectrum_statistics(spectrum, units, regions, bounds):
+    """
+    Compute the statistics of a spectrum over each region, returning a row
+    of table values per region. A lazy spectrum is materialised for the
+    duration of the computation.
+    """
+    if isinstance(spectrum, LazySpectrum):
+        lazy = spectrum
+        materialized = lazy.is_materialized
+
+        try:
+            return _spectrum_statistics(lazy.spectrum, units, regions, bounds)
+        finally:
+            if not materialized:
+                lazy.release()
+
+    if units is not None:
+        data_unit, spectral_axis_unit = units
+        spectrum = spectrum.new_flux_unit(u.Unit(data_unit))
+        spectrum = spectrum.with_spectral_unit(u.Unit(spectral_axis_unit))
+
+    flux_unit = spectrum.flux.unit
+    spectral_unit = spectrum.spectral_axis.unit
+
+    rows = []
+    located = []  # The rows and sample ranges of the located regions
+    index = StatisticsIndex(spectrum.spectral_axis.value, spectrum.flux.value)
+
+    for region_bounds in _region_bounds(regions, spectral_unit, bounds):
+        row = {'flux_unit': flux_unit.to_string(),
+               'spectral_unit': spectral_unit.to_string(),
+               'status': ""}
+        rows.append(row)
+
+        try:
+            if isinstance(region_bounds, Exception):
+                raise region_bounds
+
+            if region_bounds is None:
+                samples = slice(0, len(index))
+                row['lower'], row['upper'] = index.spectral_bounds
+            else:
+                samples = locate_region(index, *region_bounds)
+                row['lower'], row['upper'] = region_bounds
+        except ValueError as e:
+            row['status'] = str(e)
+        else:
+            located.append((row, samples))
+
+    sample_bounds = [(samples.start, samples.stop)
+                     for _, samples in located]
+
+    # The line analysis measures of all regions in a single pass
+    for key, kernel in (('centroid', line_analysis.centroid),
+                        ('fwhm', line_analysis.fwhm),
+                        ('ew', line_analysis.equivalent_width),
+                        ('total', line_analysis.line_flux)):
+        values = kernel(index.spectral_axis, index.flux, sample_bounds)
+
+        for (row, _), value in zip(located, values):
+            row[key] = value
+
+    for row, samples in located:
+        values = index.statistics(samples.start, samples.stop)
+
+        for key in ('mean', 'median', 'stddev', 'maxval', 'minval'):
+            row[key] = values[key]
+
+        value = compute_snr(spectrum, samples.start, samples.stop)
+
+        if not isinstance(value, str):
+            row['snr'] = value.value if isinstance(value, u.Quantity) else value
+
+    return rows
+
+
+def batch_statistics(spectra, regions=None, names=None, units=None,
+                     workers=None, tracker=None):
+    """
+    Compute the statistics of every spectrum over every region.
+
+    The spectra are processed in parallel by a pool of worker threads. Each
+    spectrum is converted to the requested units and indexed once for all
+    of the regions, and the bounds of each region are converted once for all
+    of the spectra sharing a spectral axis unit. Lazy spectra are only
+    materialised by the worker threads while they are processed.
+
+    Parameters
+    ----------
+    spectra : list of `~specutils.spectra.spectrum1d.Spectrum1D` or `~specviz.core.lazy.LazySpectrum`
+        The spectra.
+    regions : list of `~specutils.utils.SpectralRegion`, optional
+        The regions. The statistics are computed over the entire spectra if
+        no regions are given.
+    names : list of str, optional
+        The names of the spectra, e.g. the names of their data items.
+    units : tuple, optional
+        The (data unit, spectral axis unit) to which all spectra are
+        converted, e.g. the units of a plot. The spectra keep their own units
+        if not given.
+    workers : int, optional
+        The maximum number of worker threads.
+    tracker : callable, optional
+        Called with the number of processed spectra whenever a spectrum has
+        been processed, and periodically while waiting for the worker
+        threads. If the tracker raises an exception, e.g. because the
+        operation has been aborted, the spectra that have not been processed
+        yet are cancelled and the exception propagated right away, without
+        waiting for the spectra being processed.
+
+    Returns
+    -------
+    `~astropy.table.Table`
+        A row per spectrum and region, holding the name of the spectrum, the
+        index of the region, the bounds of the region and the statistics in
+        the units given by the ``flux_unit`` and ``spectral_unit`` columns,
+        and a ``status`` message if no statistics could be computed. Values
+        that could not be computed are masked. The table can be exported
+        with its ``write`` method, e.g. to CSV or ECSV files.
+    """
+    spectra = list(spectra)
+    regions = list(regions) if regions else [None]
+    names = (list(names) if names is not None
+             else ["Spectrum {}".format(i) for i in range(len(spectra))])
+
+    # The region bounds in each spectral axis unit, converted by the
+    # first spectrum with that unit
+    bounds = {}
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(_spectrum_statistics, spectrum, units,
+                               regions, bounds)
+               for spectrum in spectra]
+
+    try:
+        pending = set(futures)
+
+        while pending:
+            # The tracker is also called while waiting, so that an abort
+            # is noticed while large spectra are being processed
+            done, pending = wait(pending, timeout=0.1,
+                                 return_when=FIRST_COMPLETED)
+
+            if tracker is not None:
+                tracker(len(futures) - len(pending))
+    finally:
+        # When aborted, the spectra that haven't been processed yet are
+        # cancelled, and those being processed are not waited for
+        try:
+            executor.shutdown(wait=False, cancel_futures=True)
+        except TypeError:
+            # Python < 3.9 does not support cancelling queued work
+            for future in futures:
+                future.cancel()
+
+            executor.shutdown(wait=False)
+
+    rows = []
+
+    for name, future in zip(names, futures):
+        try:
+            spectrum_rows = future.result()
+        except Exception as e:
+            spectrum_rows = [{'status': str(e)} for _ in regions]
+
+        for region_index, row in enumerate(spectrum_rows):
+            row['data'] = name
+            row['region'] = region_index if regions[region_index] is not None else None
+            rows.append(row)
+
+    return _build_table(rows)
+
+
+def _build_table(rows):
+    """
+    Build a table from rows of values, masking missing values.
+    """
+    names = (['data', 'region', 'lower', 'upper'] +
+             [key for key, _ in STATISTICS] +
+             ['flux_unit', 'spectral_unit', 'status'])
+    strings = ('data', 'flux_unit', 'spectral_unit', 'status')
+
+    columns = []
+
+    for name in names:
+        values = [row.get(name) for row in rows]
+        mask = [value is None for value in values]
+
+        if name in strings:
+            data = np.array(["" if value is None else value
+                             for value in values], dtype=str)
+        elif name == 'region':
+            data = np.array([-1 if value is None else value
+                             for value in values], dtype=int)
+        else:
+            data = np.array([np.nan if value is None else value
+                             for value in values], dtype=float)
+
+        columns.append(MaskedColumn(data, name=name, mask=mask))
+
+    return Table(columns)
@@ -0,0 +1,323 @@
+import logging
+import os
+
+import numpy as np
+from astropy import units as u
+from qtpy.QtCore import QAbstractTableModel, QObject, Qt, QThread, Signal
+from qtpy.QtGui import QIcon
+from qtpy.QtWidgets import QDialog, QFileDialog, QMessageBox
+from qtpy.uic import loadUi
+from specutils.spectra.spectrum1d import Spectrum1D
+
+from ...core.lazy import LazySpectrum
+from ...core.plugin import plugin
+from ...core.progress import ProcessAborted, ProgressTracker
+from ...utils.helper_functions import format_float_text
+from .batch import batch_statistics
+from .statistics_widget import StatisticsWidget
+
+__all__ = ['BatchStatisticsDialog', 'BatchStatisticsModel']
+
+# The formats the statistics table can be exported to, keyed by the filter
+# of the file dialog
+EXPORT_FORMATS = {"CSV (*.csv)": 'ascii.csv',
+                  "ECSV (*.ecsv)": 'ascii.ecsv'}
+
+
+@plugin("Batch Statistics")
+class BatchStatisticsDialog(QDialog):
+    """
+    Dialog computing the statistics of every data item over every region of
+    the current plot, displayed as a table that can be exported to a file.
+    The statistics are computed in a worker thread, which processes the data
+    items in parallel.
+    """
+    def __init__(self, parent=None, *args, **kwargs):
+        super().__init__(parent=parent, *args, **kwargs)
+
+        self.table = None  # `~astropy.table.Table` of the last computation
+
+        self._batch_thread = None
+        self._batch_worker = None
+
+        # Aborted threads still finishing in the background, along with
+        # their workers, which must be kept until the threads have finished
+        self._stopping_threads = {}
+
+        loadUi(os.path.abspath(
+            os.path.join(os.path.dirname(__file__),
+                         ".", "batch_statistics.ui")), self)
+
+        self.compute_button.clicked.connect(self.compute)
+        self.export_button.clicked.connect(self.export)
+        self.close_button.clicked.connect(self.close)
+
+    @plugin.tool_bar("Batch Statistics", icon=QIcon(":/icons/012-file.svg"))
+    def on_action_triggered(self):
+        """
+        Shows the dialog and computes the statistics of the current data
+        items and regions.
+        """
+        self.show()
+        self.compute()
+
+    def _regions(self):
+        """
+        The regions of the current plot as
+        `~specutils.utils.SpectralRegion` objects.
+        """
+        if self.hub.plot_window is None:
+            return []
+
+        plot_widget = self.hub.plot_widget
+        unit = u.Unit(plot_widget.spectral_axis_unit or "")
+        regions = []
+
+        for roi in plot_widget.list_all_regions():
+            region = StatisticsWidget.pos_to_spectral_region(
+                u.Quantity(roi.getRegion(), unit))
+
+            if region is not None:
+                regions.append(region)
+
+        return regions
+
+    def compute(self):
+        """
+        Starts computing the statistics of all data items over all regions of
+        the current plot.
+        """
+        self.abort()
+
+        # Lazily backed spectra are handed over as is, and only materialised
+        # by the worker threads while their statistics are computed
+        spectra = []
+        names = []
+
+        for item in self.hub.data_items:
+            spectrum = item.lazy_spectrum or item.spectrum
+
+            if isinstance(spectrum, (Spectrum1D, LazySpectrum)):
+                spectra.append(spectrum)
+                names.append(item.name)
+
+        regions = self._regions()
+
+        self.status_label.setText(
+            "Computing statistics of {} data items over {} regions.".format(
+                len(spectra), len(regions) or "their entire"))
+        self.progress_bar.setValue(0)
+        self.export_button.setEnabled(False)
+
+        self._batch_thread = QThread()
+
+        self._batch_worker = BatchStatisticsWorker(spectra, regions, names)
+        self._batch_worker.moveToThread(self._batch_thread)
+        self._batch_worker.status.connect(self.on_status_updated)
+        self._batch_worker.result.connect(self.on_finished)
+        self._batch_worker.failed.connect(self.on_failed)
+
+        self._batch_thread.started.connect(self._batch_worker.run)
+
+        # The thread and worker are deleted once the thread has finished,
+        # which may be after they have been replaced by a new computation
+        self._batch_thread.finished.connect(self._on_thread_finished)
+        self._batch_thread.finished.connect(self._batch_worker.deleteLater)
+        self._batch_thread.finished.connect(self._batch_thread.deleteLater)
+
+        self._batch_thread.start()
+
+    def abort(self):
+        """
+        Aborts the current computation, if any. This returns right away,
+        and the worker thread finishes in the background.
+        """
+        if self._batch_worker is not None:
+            self._batch_worker.abort()
+            self._batch_thread.quit()
+            self._stopping_threads[self._batch_thread] = self._batch_worker
+
+        self._batch_worker = None
+        self._batch_thread = None
+
+    def _on_thread_finished(self):
+        self._stopping_threads.pop(self.sender(), None)
+
+    def _is_current(self):
+        """
+        Whether the sender of a signal is the worker of the current
+        computation, rather than that of an aborted one.
+        """
+        return self.sender() is not None and \
+            self.sender() is self._batch_worker
+
+    def on_status_updated(self, value):
+        """
+        Called with the completed fraction of the computation.
+        """
+        if not self._is_current():
+            return
+
+        self.progress_bar.setValue(int(value * 100))
+
+    def on_finished(self, table):
+        """
+        Called when the worker thread has computed the statistics table.
+
+        Parameters
+        ----------
+        table : `~astropy.table.Table`
+            The statistics of each data item and region.
+        """
+        if not self._is_current():
+            return
+
+        self.abort()
+
+        self.table = table
+        self.table_view.setModel(BatchStatisticsModel(table, parent=self))
+        self.table_view.resizeColumnsToContents()
+
+        self.progress_bar.setValue(100)
+        self.status_label.setText("Computed {} rows of statistics.".format(
+            len(table)))
+        self.export_button.setEnabled(len(table) > 0)
+
+    def on_failed(self, message):
+        """
+        Called when the computation of the statistics raised an exception.
+        """
+        if not self._is_current():
+            return
+
+        self.abort()
+        self.progress_bar.reset()
+        self.status_label.setText(message)
+
+    def export(self):
+        """
+        Exports the statistics table to a CSV or ECSV file chosen by the user.
+        """
+        if self.table is None:
+            return
+
+        path, file_filter = QFileDialog.getSaveFileName(
+            self, "Export Statistics", "", ";;".join(EXPORT_FORMATS))
+
+        if not path:
+            return
+
+        try:
+            self.table.write(path, format=EXPORT_FORMATS.get(
+                file_filter, 'ascii.ecsv'), overwrite=True)
+        except Exception as e:
+            QMessageBox.critical(self, "Export Error", str(e))
+
+    def closeEvent(self, event):
+        self.abort()
+        super().closeEvent(event)
+
+
+class BatchStatisticsWorker(QObject):
+    """
+    Worker computing a statistics table in a :class:`~qtpy.QtCore.QThread`.
+
+    Parameters
+    ----------
+    spectra : list of `~specutils.spectra.spectrum1d.Spectrum1D` or `~specviz.core.lazy.LazySpectrum`
+    regions : list of `~specutils.utils.SpectralRegion`
+    names : list of str
+        The names of the spectra.
+
+    Signals
+    -------
+    status : Signal
+        Emitted with the completed fraction of the computation.
+    result : Signal
+        Emitted with the statistics table.
+    failed : Signal
+        Emitted with an error message if the computation failed.
+    """
+    status = Signal(float)
+    result = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, spectra, regions, names, parent=None):
+        super(BatchStatisticsWorker, self).__init__(parent)
+
+        self._spectra = spectra
+        self._regions = regions
+        self._names = names
+        self._tracker = ProgressTracker(max(len(spectra), 1),
+                                        update=self._on_tracker_update)
+
+    def run(self):
+        """Compute the statistics table."""
+        try:
+            table = batch_statistics(self._spectra, self._regions,
+                                     names=self._names, tracker=self._tracker)
+        except ProcessAborted:
+            logging.info("Batch statistics aborted.")
+            return
+        except Exception as e:
+            logging.exception("Batch statistics failed.")
+            self.failed.emit(str(e))
+            return
+
+        self.result.emit(table)
+
+    def abort(self):
+        """
+        Abort the computation. Data items that have not been processed yet
+        are skipped.
+        """
+        self._tracker.abort()
+
+    def _on_tracker_update(self, tracker):
+        self.status.emit(tracker.percent_value)
+
+
+class BatchStatisticsModel(QAbstractTableModel):
+    """
+    Table model displaying the rows of a statistics table.
+
+    Parameters
+    ----------
+    table : `~astropy.table.Table`
+        The table returned by
+        `~specviz.plugins.statistics.batch.batch_statistics`.
+    """
+    def __init__(self, table, parent=None):
+        super(BatchStatisticsModel, self).__init__(parent)
+
+        self._table = table
+        self._columns = list(table.columns.values())
+
+    def rowCount(self, parent=None, *args, **kwargs):
+        return len(self._table)
+
+    def columnCount(self, parent=None, *args, **kwargs):
+        return len(self._columns)
+
+    def headerData(self, section, orientation, role=None):
+        if role != Qt.DisplayRole:
+            return None
+
+        if orientation == Qt.Horizontal:
+            return self._columns[section].name
+
+        return str(section + 1)
+
+    def data(self, index, role=None):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+
+        column = self._columns[index.column()]
+        value = column[index.row()]
+
+        if value is np.ma.masked:
+            return ""
+        if column.dtype.kind == 'f':
+            return format_float_text(value)
+
+        return str(value)
@@ -0,0 +1,248 @@
+import numpy as np
+
+__all__ = ['StatisticsIndex']
+
+
+class StatisticsIndex:
+    """
+    A precomputed index answering statistics over arbitrary sample ranges of
+    a spectrum.
+
+    Cumulative sums of the flux, the squared flux, the flux weighted by the
+    spectral axis and the flux integrated over the spectral axis answer the
+    mean, standard deviation, centroid and total flux of any range in
+    constant time. A sparse table over the minimum and maximum flux of
+    blocks of samples answers the minimum and maximum in constant time.
+    Ranges shorter than ``direct_size`` samples, and ranges holding
+    non-finite values, are computed directly from the flux values instead,
+    which is just as fast for short ranges and gives results identical to
+    :mod:`specutils.analysis`.
+
+    Parameters
+    ----------
+    spectral_axis : array-like
+        The spectral axis values. The axis must be monotonically increasing
+        or decreasing.
+    flux : array-like
+        The flux values of each sample.
+    block_size : int, optional
+        The number of samples in each block of the minimum/maximum sparse
+        table.
+    direct_size : int, optional
+        Ranges of fewer samples than this are computed directly.
+
+    Raises
+    ------
+    ValueError
+        If the spectral axis is not monotonic or does not match the length
+        of the flux.
+    """
+    def __init__(self, spectral_axis, flux, block_size=64, direct_size=4096):
+        spectral_axis = np.asarray(spectral_axis, dtype=float)
+        flux = np.asarray(flux, dtype=float)
+
+        if spectral_axis.shape != flux.shape or flux.ndim != 1:
+            raise ValueError("Spectral axis and flux must be one-dimensional "
+                             "arrays of the same length.")
+
+        diff = np.diff(spectral_axis)
+
+        if np.all(diff >= 0):
+            self._search_axis = spectral_axis
+        elif np.all(diff <= 0):
+            self._search_axis = -spectral_axis
+        else:
+            raise ValueError("Spectral axis must be monotonic to build a "
+                             "statistics index.")
+
+        self._spectral_axis = spectral_axis
+        self._flux = flux
+        self._block_size = max(int(block_size), 1)
+        self._direct_size = max(int(direct_size), 2)
+
+        # The flux is offset by its mean before squaring, which keeps the
+        # variance of a range from cancelling out to nothing in the
+        # difference of two large cumulative sums.
+        finite = np.isfinite(flux)
+        self._offset = flux[finite].mean() if finite.any() else 0.
+
+        shifted = np.where(finite, flux - self._offset, 0.)
+
+        self._sum = self._cumsum(shifted)
+        self._sum_squares = self._cumsum(shifted * shifted)
+        self._sum_weighted = self._cumsum(np.where(finite, flux, 0.) *
+                                          spectral_axis)
+        # The flux of each sample times the width of the interval leading up
+        # to it, as summed by `specutils.analysis.line_flux`.
+        self._sum_integrated = self._cumsum(
+            np.concatenate([[0.], np.where(finite[1:], flux[1:], 0.) * diff]))
+        self._non_finite = self._cumsum(~finite)
+
+        self._mins = self._sparse_table(np.minimum)
+        self._maxs = self._sparse_table(np.maximum)
+
+    def __len__(self):
+        return self._flux.size
+
+    @property
+    def spectral_axis(self):
+        """The spectral axis values."""
+        return self._spectral_axis
+
+    @property
+    def flux(self):
+        """The flux values."""
+        return self._flux
+
+    @property
+    def spectral_bounds(self):
+        """The (minimum, maximum) value of the spectral axis."""
+        if not len(self):
+            return np.nan, np.nan
+
+        first, last = self._spectral_axis[0], self._spectral_axis[-1]
+
+        return min(first, last), max(first, last)
+
+    @staticmethod
+    def _cumsum(values):
+        # A leading zero makes the sum over ``[start, stop)`` a difference.
+        result = np.zeros(values.size + 1)
+        np.cumsum(values, out=result[1:])
+
+        return result
+
+    def _sparse_table(self, ufunc):
+        """
+        Build a sparse table over the blocks of the flux, where level ``k``
+        holds the ``ufunc`` reduction of ``2 ** k`` consecutive blocks.
+        """
+        starts = np.arange(0, self._flux.size, self._block_size)
+
+        if not starts.size:
+            return []
+
+        levels = [ufunc.reduceat(self._flux, starts)]
+        span = 1
+
+        while 2 * span <= starts.size:
+            previous = levels[-1]
+            levels.append(ufunc(previous[:-span], previous[span:]))
+            span *= 2
+
+        return levels
+
+    def _query_table(self, levels, ufunc, start, stop):
+        """
+        Reduce the flux over ``[start, stop)`` with ``ufunc``, using the
+        sparse table for the blocks that lie entirely within the range.
+        """
+        first_block = -(-start // self._block_size)
+        last_block = stop // self._block_size
+
+        if first_block >= last_block:
+            return ufunc.reduce(self._flux[start:stop])
+
+        level = int(np.log2(last_block - first_block))
+        table = levels[level]
+
+        result = ufunc(table[first_block], table[last_block - 2 ** level])
+
+        head = self._flux[start:first_block * self._block_size]
+        tail = self._flux[last_block * self._block_size:stop]
+
+        for values in (head, tail):
+            if values.size:
+                result = ufunc(result, ufunc.reduce(values))
+
+        return result
+
+    def region_slice(self, lower, upper):
+        """
+        Find the samples whose spectral axis value lies within a region.
+
+        Parameters
+        ----------
+        lower, upper : float
+            The bounds of the region, in the units of the spectral axis. Both
+            bounds are included in the region.
+
+        Returns
+        -------
+        slice
+            The range of samples within the region, which is empty if no
+            sample lies within it.
+        """
+        if self._search_axis is not self._spectral_axis:
+            lower, upper = -upper, -lower
+
+        if lower > upper:
+            lower, upper = upper, lower
+
+        start = int(np.searchsorted(self._search_axis, lower, side='left'))
+        stop = int(np.searchsorted(self._search_axis, upper, side='right'))
+
+        return slice(start, max(start, stop))
+
+    def statistics(self, start=0, stop=None):
+        """
+        Compute the statistics of the flux over a range of samples.
+
+        Parameters
+        ----------
+        start, stop : int, optional
+            The range of samples, defaulting to the whole spectrum.
+
+        Returns
+        -------
+        dict
+            The ``mean``, ``median``, ``stddev``, ``minval``, ``maxval``,
+            ``centroid``, ``total`` and ``ew`` (equivalent width with a
+            continuum of one) of the flux over the range, as floats. The
+            median is found by partitioning the range, the only statistic
+            that takes time proportional to its length.
+
+        Raises
+        ------
+        ValueError
+            If the range holds no samples.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        count = stop - start
+
+        if count <= 0:
+            raise ValueError("Statistics require at least one sample.")
+
+        flux = self._flux[start:stop]
+        spectral_axis = self._spectral_axis[start:stop]
+
+        if (count < self._direct_size or
+                self._non_finite[stop] != self._non_finite[start]):
+            stats = {'mean': flux.mean(),
+                     'stddev': flux.std(),
+                     'minval': flux.min(),
+                     'maxval': flux.max(),
+                     'centroid': np.sum(flux * spectral_axis) / np.sum(flux),
+                     'total': np.sum(flux[1:] * np.diff(spectral_axis))}
+        else:
+            total_shifted = self._sum[stop] - self._sum[start]
+            mean_shifted = total_shifted / count
+            variance = ((self._sum_squares[stop] - self._sum_squares[start]) /
+                        count - mean_shifted * mean_shifted)
+            flux_sum = total_shifted + self._offset * count
+
+            stats = {'mean': self._offset + mean_shifted,
+                     'stddev': np.sqrt(max(variance, 0.)),
+                     'minval': self._query_table(self._mins, np.minimum,
+                                                 start, stop),
+                     'maxval': self._query_table(self._maxs, np.maximum,
+                                                 start, stop),
+                     'centroid': ((self._sum_weighted[stop] -
+                                   self._sum_weighted[start]) / flux_sum),
+                     'total': (self._sum_integrated[stop] -
+                               self._sum_integrated[start + 1])}
+
+        stats['median'] = np.median(flux)
+        stats['ew'] = (spectral_axis[-1] - spectral_axis[0]) - stats['total']
+
+        return stats
@@ -1,21 +1,38 @@
 import os
 import logging
-import numpy as np
+from functools import partial
 
 from astropy import units as u
 
 from specutils.spectra.spectrum1d import Spectrum1D
 from specutils.spectra.spectral_region import SpectralRegion
-from specutils.manipulation import extract_region
-from specutils.analysis import snr, equivalent_width, fwhm, centroid, line_flux
+from specutils.analysis import snr
 
+from qtpy.QtCore import QElapsedTimer, QTimer
 from qtpy.QtWidgets import QWidget
 from qtpy.uic import loadUi
 from qtpy.QtGui import QIcon
 
+from ...core import line_analysis
+from ...core.cache import LRUCache
 from ...core.items import PlotDataItem
 from ...utils.helper_functions import format_float_text
 from ...core.plugin import plugin
+from .statistics_index import StatisticsIndex
+from .worker import StatisticsWorker
+
+
+# Time in milliseconds the statistics inputs, such as the data item or the
+# region, have to stay unchanged before the statistics are computed.
+UPDATE_SETTLE_TIME = 30
+
+# Maximum time in milliseconds the statistics can lag behind inputs that
+# keep changing, e.g. while dragging a region.
+UPDATE_MAX_LATENCY = 100
+
+# The number of computed sets of statistics kept to be shown again when
+# revisiting a data item, region or set of units.
+STATS_CACHE_SIZE = 64
 
 
 # The next three functions are place holders while specutils is updated to handle
@@ -80,55 +97,175 @@ def clip_region(spectrum, region):
     return SpectralRegion(lower, upper)
 
 
-def compute_stats(spectrum):
+def region_bounds(region, spectral_unit):
     """
-    Compute basic statistics for a spectral region.
+    Get the bounds of a spectral region in the units of a spectral axis.
+
+    Parameters
+    ----------
+    region : `~specutils.utils.SpectralRegion`
+    spectral_unit : `~astropy.units.Unit`
+        The units of the spectral axis.
+
+    Returns
+    -------
+    lower, upper : float
+        The bounds of the region.
+
+    Raises
+    ------
+    ValueError
+        If the units of the region are not compatible with the units of the
+        spectral axis.
+    """
+    lower, upper = region.bounds
+
+    if not u.Unit(spectral_unit).is_equivalent(lower.unit):
+        raise ValueError("Region units are not compatible with "
+                         "selected data's spectral axis units.")
+
+    return tuple(sorted(bound.to_value(spectral_unit, equivalencies=u.spectral())
+                        for bound in (lower, upper)))
+
+
+def locate_region(index, lower, upper):
+    """
+    Find the samples of a spectrum that lie within a spectral region.
+
+    Parameters
+    ----------
+    index : `StatisticsIndex`
+        The statistics index of the spectrum.
+    lower, upper : float
+        The bounds of the region, as given by `region_bounds`.
+
+    Returns
+    -------
+    slice
+        The range of samples within the region.
+
+    Raises
+    ------
+    ValueError
+        With a message for the user if no statistics can be computed over
+        the region.
+    """
+    axis_min, axis_max = index.spectral_bounds
+
+    if lower > axis_max or upper < axis_min:
+        raise ValueError("Region out of bound.")
+    if max(lower, axis_min) == min(upper, axis_max):
+        raise ValueError("Region over single value.")
+
+    samples = index.region_slice(lower, upper)
+
+    if not samples.stop > samples.start:
+        raise ValueError("Regione range is too small.")
+
+    return samples
+
+
+def iter_stats(spectrum, index=None, region=None):
+    """
+    Compute basic statistics for a spectral region one at a time, starting
+    with those answered by the statistics index.
+
     Parameters
     ----------
     spectrum : `~specutils.spectra.spectrum1d.Spectrum1D`
-    region: `~specutils.utils.SpectralRegion`
+    index : `StatisticsIndex`, optional
+        The statistics index of the spectrum. An index is built if none is
+        given.
+    region : slice, optional
+        The range of samples of the spectrum to compute statistics for.
+        Defaults to the whole spectrum.
+
+    Yields
+    ------
+    key : str
+        The key of the statistic in `StatisticsWidget.stat_widgets`.
+    value : `~astropy.units.Quantity` or str
+        The value of the statistic, or "Error" if it could not be computed.
     """
+    if index is None:
+        index = StatisticsIndex(spectrum.spectral_axis.value,
+                                spectrum.flux.value)
 
-    try:
-        cent = centroid(spectrum, region=None) # we may want to adjust this for continuum subtraction
-    except Exception as e:
-        logging.debug(e)
-        cent = "Error"
+    start, stop, _ = (region or slice(None)).indices(len(index))
+
+    flux_unit = spectrum.flux.unit
+    spectral_unit = spectrum.spectral_axis.unit
 
     try:
-        snr_val = snr(spectrum)
+        values = index.statistics(start, stop)
     except Exception as e:
         logging.debug(e)
-        snr_val = "N/A"
-
+        values = {}
+
+    units = [('mean', flux_unit),
+             ('median', flux_unit),
+             ('stddev', flux_unit),
+             ('maxval', flux_unit),
+             ('minval', flux_unit),
+             ('centroid', spectral_unit),  # we may want to adjust this for continuum subtraction
+             ('ew', spectral_unit),
+             ('total', flux_unit * spectral_unit)]
+
+    for key, unit in units:
+        yield key, values[key] * unit if key in values else "Error"
+
+    # The remaining statistics are not indexed and
+    # are computed on the samples within the region.
     try:
-        fwhm_val = fwhm(spectrum)
+        fwhm_val = line_analysis.fwhm(index.spectral_axis, index.flux,
+                                      [(start, stop)])[0] * spectral_unit
     except Exception as e:
         logging.debug(e)
         fwhm_val = "Error"
 
-    try:
-        ew = equivalent_width(spectrum)
-    except Exception as e:
-        logging.debug(e)
-        ew = "Error"
+    yield 'fwhm', fwhm_val
+
+    yield 'snr', compute_snr(spectrum, start, stop)
+
+
+def compute_snr(spectrum, start, stop):
+    """
+    Compute the signal to noise ratio of a range of samples of a spectrum,
+    or "N/A" if the spectrum has no uncertainty.
+    """
+    if spectrum.uncertainty is None:
+        return "N/A"
+
+    if (start, stop) != (0, len(spectrum.flux)):
+        spectrum = spectrum[start:stop]
 
     try:
-        total = line_flux(spectrum)
+        return snr(spectrum)
     except Exception as e:
         logging.debug(e)
-        total = "Error"
+        return "N/A"
 
-    return {'mean': spectrum.flux.mean(),
-            'median': np.median(spectrum.flux),
-            'stddev': spectrum.flux.std(),
-            'centroid': cent,
-            'snr': snr_val,
-            'fwhm': fwhm_val,
-            'ew': ew,
-            'total': total,
-            'maxval': spectrum.flux.max(),
-            'minval': spectrum.flux.min()}
+
+def compute_stats(spectrum, index=None, region=None):
+    """
+    Compute basic statistics for a spectral region.
+
+    Parameters
+    ----------
+    spectrum : `~specutils.spectra.spectrum1d.Spectrum1D`
+    index : `StatisticsIndex`, optional
+        The statistics index of the spectrum. An index is built if none is
+        given.
+    region : slice, optional
+        The range of samples of the spectrum to compute statistics for.
+        Defaults to the whole spectrum.
+
+    Returns
+    -------
+    dict
+        The statistics, by their key in `StatisticsWidget.stat_widgets`.
+    """
+    return dict(iter_stats(spectrum, index, region))
 
 
 @plugin.plugin_bar("Statistics", icon=QIcon(":/icons/012-file.svg"), priority=1)
@@ -146,19 +283,38 @@ class StatisticsWidget(QWidget):
         self._current_plot_item = None  # Current plot item
         self.stats = None  # dict with stats
 
+        # Statistics are computed in a background thread once the signals
+        # requesting an update have settled. The statistics of the current
+        # computation are collected here as they come in.
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.timeout.connect(self.update_statistics)
+        self._update_clock = QElapsedTimer()
+
+        self._worker = StatisticsWorker(self)
+        self._worker.computed.connect(self._on_stat_computed)
+        self._worker.finished.connect(self._on_stats_finished)
+        self._worker.failed.connect(self._on_stats_failed)
+        self._computed_stats = None
+
+        # Computed statistics keyed by data item, data version, region,
+        # plotted units and statistics type, along with the key of the
+        # statistics being computed.
+        self.stats_cache = LRUCache(maxsize=STATS_CACHE_SIZE)
+        self._computed_key = None
+
         self._init_ui()
 
-        self.hub.workspace.current_item_changed.connect(self.update_statistics)
         # When the current subwindow changes, update the stat widget
-        self.hub.workspace.plot_window_activated.connect(self.update_statistics)
+        self.hub.workspace.plot_window_activated.connect(self._schedule_update)
         # When current item changes, update the stat widget
-        self.hub.workspace.current_item_changed.connect(self.update_statistics)
+        self.hub.workspace.current_item_changed.connect(self._schedule_update)
         # When selection changes, update the stat widget
-        self.hub.workspace.current_selected_changed.connect(self.update_statistics)
+        self.hub.workspace.current_selected_changed.connect(self._schedule_update)
         # When new plot window is added, connect signals
         self.hub.workspace.plot_window_added.connect(self._connect_plot_window)
         # When an item in the workspace model changes, update the stat widget
-        self.hub.model.itemChanged.connect(self.update_statistics)
+        self.hub.model.itemChanged.connect(self._schedule_update)
 
         # Connect any currently open plot windows
         for plot_window in self.hub.plot_windows:
@@ -208,10 +364,28 @@ class StatisticsWidget(QWidget):
         self._on_set_statistics_type()
 
     def _connect_plot_window(self, plot_window):
-        plot_window.plot_widget.plot_added.connect(self.update_statistics)
-        plot_window.plot_widget.plot_removed.connect(self.update_statistics)
-        plot_window.plot_widget.roi_moved.connect(self.update_statistics)
-        plot_window.plot_widget.roi_removed.connect(self.update_statistics)
+        plot_window.plot_widget.plot_added.connect(self._schedule_update)
+        plot_window.plot_widget.plots_added.connect(self._schedule_update)
+        plot_window.plot_widget.plot_removed.connect(self._schedule_update)
+        plot_window.plot_widget.roi_moved.connect(self._schedule_update)
+        plot_window.plot_widget.roi_removed.connect(self._schedule_update)
+
+    @property
+    def pending(self):
+        """Whether the displayed statistics are about to be updated."""
+        return self._update_timer.isActive() or self._worker.pending > 0
+
+    def _schedule_update(self, *args):
+        """
+        Update the statistics once the signals requesting an update have
+        settled, or at the latest after `UPDATE_MAX_LATENCY`.
+        """
+        if self._update_timer.isActive():
+            remaining = UPDATE_MAX_LATENCY - self._update_clock.elapsed()
+            self._update_timer.start(max(0, min(UPDATE_SETTLE_TIME, remaining)))
+        else:
+            self._update_clock.start()
+            self._update_timer.start(UPDATE_SETTLE_TIME)
 
     def set_status(self, message):
         """
@@ -262,10 +436,23 @@ class StatisticsWidget(QWidget):
         if stats is None:
             return
         for key in stats:
-            if key in self.stat_widgets:
-                text = stats[key] if (stats[key] == "N/A" or stats[key] == "Error") \
-                    else format_float_text(stats[key])
-                self.stat_widgets[key].document().setPlainText(text)
+            self._update_stat_widget(key, stats[key])
+
+    def _update_stat_widget(self, key, value):
+        """
+        Fills in a single stat value.
+
+        Parameters
+        ----------
+        key: str
+            Key in `StatisticsWidget.stat_widgets`.
+        value: float or str
+            Value to display
+        """
+        if key in self.stat_widgets:
+            text = value if (value == "N/A" or value == "Error") \
+                else format_float_text(value)
+            self.stat_widgets[key].document().setPlainText(text)
 
     def _clear_stat_widgets(self):
         """
@@ -335,6 +522,9 @@ class StatisticsWidget(QWidget):
         """
         Clears all currently displayed stats information in the widget.
         """
+        self._update_timer.stop()
+        self._worker.cancel()
+        self._computed_stats = None
         self._clear_stat_widgets()
         self.stats = None
 
@@ -343,16 +533,28 @@ class StatisticsWidget(QWidget):
             return
 
         if isinstance(self._current_plot_item, PlotDataItem):
-            self._current_plot_item.spectral_axis_unit_changed.disconnect(self.update_statistics)
-            self._current_plot_item.data_unit_changed.disconnect(self.update_statistics)
+            self._current_plot_item.spectral_axis_unit_changed.disconnect(self._schedule_update)
+            self._current_plot_item.data_unit_changed.disconnect(self._schedule_update)
 
         self._current_plot_item = self.hub.plot_item
 
         if isinstance(self._current_plot_item, PlotDataItem):
-            self._current_plot_item.spectral_axis_unit_changed.connect(self.update_statistics)
-            self._current_plot_item.data_unit_changed.connect(self.update_statistics)
+            self._current_plot_item.spectral_axis_unit_changed.connect(self._schedule_update)
+            self._current_plot_item.data_unit_changed.connect(self._schedule_update)
 
-    def _spectrum_with_plot_units(self, spec):
+    def _plot_units(self):
+        """
+        The (data unit, spectral axis unit) of the current plot item, or
+        `None` if there is no plot item.
+        """
+        if self._current_plot_item is None:
+            return None
+
+        return (self._current_plot_item.data_unit,
+                self._current_plot_item.spectral_axis_unit)
+
+    @staticmethod
+    def _spectrum_with_plot_units(spec, units):
         """
         Make a new spectrum object with the plotted units.
 
@@ -360,21 +562,51 @@ class StatisticsWidget(QWidget):
         -------
         spectrum : `~specutils.spectra.spectrum1d.Spectrum1D`
         """
-        if self._current_plot_item is None:
+        if units is None:
             return spec
 
-        data_unit = self._current_plot_item.data_unit
-        spectral_axis_unit = self._current_plot_item.spectral_axis_unit
+        data_unit, spectral_axis_unit = units
 
         new_spec = spec.new_flux_unit(u.Unit(data_unit))
         new_spec = new_spec.with_spectral_unit(u.Unit(spectral_axis_unit))
         return new_spec
 
+    @classmethod
+    def _compute_statistics(cls, index_cache, spec, data_key, units,
+                            spectral_region):
+        """
+        Compute the statistics of a spectrum over a region one at a time.
+        Runs in the statistics worker thread.
+
+        The spectrum with the plotted units and its statistics index are
+        kept in ``index_cache`` and reused until the data, as identified by
+        ``data_key``, or the plotted units change.
+        """
+        def build_index():
+            new_spec = cls._spectrum_with_plot_units(spec, units)
+
+            return new_spec, StatisticsIndex(new_spec.spectral_axis.value,
+                                             new_spec.flux.value)
+
+        spec, index = index_cache.get_or_compute((data_key, units),
+                                                 build_index)
+
+        region = None
+
+        if spectral_region is not None:
+            region = locate_region(index, *region_bounds(
+                spectral_region, spec.spectral_axis.unit))
+
+        yield from iter_stats(spec, index, region)
+
     def update_statistics(self):
         """
-        Retrieves the current data item in the workspace and calculates the
-        set of statistics on its information.
+        Retrieves the current data item in the workspace and starts
+        calculating the set of statistics on its information. The stat
+        widgets are filled in as the statistics are computed.
         """
+        self._update_timer.stop()
+
         if self.hub.workspace is None or self.hub.plot_item is None:
             return self.clear_statistics()
 
@@ -388,48 +620,88 @@ class StatisticsWidget(QWidget):
         self._current_spectrum = spec
         self._reconnect_item_signals()
 
-        # Check for issues and extract
-        # region from input spectra:
+        # Check for issues before computing
+        # the stats in the worker thread:
         if spec is None:
             self.set_status("No data selected.")
             return self.clear_statistics()
         elif not isinstance(spec, Spectrum1D):
             self.set_status("Spectrum was not found.")
             return self.clear_statistics()
-        else:
-            spec = self._spectrum_with_plot_units(spec)
 
-        if spectral_region is not None:
-            if not check_unit_compatibility(spec, spectral_region):
-                self.set_status("Region units are not compatible with "
-                                "selected data's spectral axis units.")
-                return self.clear_statistics()
-            spectral_region = clip_region(spec, spectral_region)
-            if spectral_region is None:
-                self.set_status("Region out of bound.")
-                return self.clear_statistics()
-            try:
-                idx1, idx2 = spectral_region.bounds
-                if idx1 == idx2:
-                    self.set_status("Region over single value.")
-                    return self.clear_statistics()
-                spec = extract_region(spec, spectral_region)
-                if not len(spec.flux) > 0:
-                    self.set_status("Regione range is too small.")
-                    return self.clear_statistics()
-            except ValueError as e:
-                self.set_status("Region could not be extracted "
-                                "from target data.")
-                return self.clear_statistics()
-        elif self._workspace_has_region():
+        if spectral_region is None and self._workspace_has_region():
             self.set_status("Region has no units")
             return self.clear_statistics()
 
-        # Compute stats and update widget:
-        self.stats = compute_stats(spec)
-        self._update_stat_widgets(self.stats)
+        units = self._plot_units()
+        key = self._stats_key(self.hub.data_item, spectral_region, units)
+        stats = self.stats_cache.get(key)
+
+        self._update_cache_info()
+
+        if stats is not None:
+            self._worker.cancel()
+            self._computed_stats = None
+            self.stats = stats
+            self._update_stat_widgets(stats)
+            self.set_status(self._get_target_name())
+            return
+
+        # The stat widgets keep showing the previous stats
+        # until the first new stat has been computed.
+        self._computed_stats = None
+        self._computed_key = key
+        data_key = (self.hub.data_item.identifier,
+                    self.hub.data_item.data_version)
+
+        self._worker.submit(partial(self._compute_statistics,
+                                    self._worker.index_cache, spec, data_key,
+                                    units, spectral_region))
+
+    def _stats_key(self, data_item, spectral_region, units):
+        """
+        The key of the statistics of a data item over a region in the
+        `StatisticsWidget.stats_cache`.
+        """
+        if spectral_region is not None:
+            lower, upper = spectral_region.bounds
+            region = (lower.value, upper.to_value(lower.unit),
+                      lower.unit.to_string())
+        else:
+            region = None
+
+        return (data_item.identifier, data_item.data_version, region, units,
+                self.comboBox.currentText())
+
+    def _update_cache_info(self):
+        """
+        Shows the hit and miss counts of the statistics cache in the tool tip
+        of the status display.
+        """
+        self.status_display.setToolTip(
+            "Statistics cache: {} hits, {} misses, {} of {} entries".format(
+                self.stats_cache.hits, self.stats_cache.misses,
+                len(self.stats_cache), self.stats_cache.maxsize))
+
+    def _on_stat_computed(self, key, value):
+        if self._computed_stats is None:
+            self._clear_stat_widgets()
+            self._computed_stats = {}
+
+        self._computed_stats[key] = value
+        self._update_stat_widget(key, value)
+
+    def _on_stats_finished(self):
+        self.stats = self._computed_stats
+        self.stats_cache.put(self._computed_key, self.stats)
+        self._computed_stats = None
+        self._update_cache_info()
         self.set_status(self._get_target_name())
 
+    def _on_stats_failed(self, message):
+        self.set_status(message)
+        self.clear_statistics()
+
     def update_signal_handler(self, *args, **kwargs):
         """
         Universal signal handler for update calls.
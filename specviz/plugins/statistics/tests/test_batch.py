@@ -0,0 +1,114 @@
+import time
+
+import astropy.units as u
+import numpy as np
+import pytest
+from astropy.table import Table
+from specutils import SpectralRegion, Spectrum1D
+
+from ....core.lazy import LazySpectrum
+from ....core.progress import ProcessAborted, ProgressTracker
+from ..batch import STATISTICS, batch_statistics
+from ..statistics_widget import compute_stats
+
+
+def _spectra():
+    spectral_axis = np.linspace(4000, 6000, 500) * u.AA
+
+    return [Spectrum1D(flux=np.random.sample(500) * u.Jy,
+                       spectral_axis=spectral_axis) for _ in range(4)]
+
+
+def test_batch_statistics():
+    spectra = _spectra()
+    regions = [SpectralRegion(4100 * u.AA, 4500 * u.AA),
+               SpectralRegion(5000 * u.AA, 5900 * u.AA)]
+
+    table = batch_statistics(spectra, regions, names=list("abcd"), workers=2)
+
+    assert len(table) == len(spectra) * len(regions)
+    assert list(table['data']) == ['a', 'a', 'b', 'b', 'c', 'c', 'd', 'd']
+    assert list(table['region']) == [0, 1] * len(spectra)
+
+    # The rows hold the same statistics as the statistics panel
+    row = table[3]
+    stats = compute_stats(spectra[1][250:475])
+
+    assert row['lower'] == 5000 and row['upper'] == 5900
+    assert row['flux_unit'] == 'Jy' and row['spectral_unit'] == 'Angstrom'
+
+    for key, _ in STATISTICS:
+        if isinstance(stats[key], str):
+            assert row[key] is np.ma.masked
+        else:
+            assert row[key] == pytest.approx(stats[key].value, rel=1e-10)
+
+    # Without regions, the statistics cover the entire spectra
+    table = batch_statistics(spectra)
+
+    assert len(table) == len(spectra)
+    assert table['region'].mask.all()
+    assert table['mean'][0] == spectra[0].flux.value.mean()
+
+
+def test_batch_statistics_lazy(tmpdir):
+    spectra = _spectra()
+    lazy = [LazySpectrum.from_spectrum(spectrum, directory=str(tmpdir))
+            for spectrum in spectra]
+    regions = [SpectralRegion(4100 * u.AA, 4500 * u.AA)]
+
+    table = batch_statistics(lazy, regions, workers=2)
+
+    assert list(table['mean']) == list(batch_statistics(spectra,
+                                                        regions)['mean'])
+
+    # Lazy spectra are released once processed
+    assert not any(spectrum.is_materialized for spectrum in lazy)
+
+
+def test_batch_statistics_errors(tmpdir):
+    spectra = _spectra()[:1] + [Spectrum1D(flux=np.random.sample(100) * u.erg,
+                                           spectral_axis=np.arange(100) * u.Hz)]
+    regions = [SpectralRegion(4100 * u.AA, 4500 * u.AA)]
+
+    table = batch_statistics(spectra, regions)
+
+    assert table['status'][0] == ""
+    assert "not compatible" in table['status'][1]
+    assert table['mean'].mask.tolist() == [False, True]
+
+    path = str(tmpdir.join("statistics.ecsv"))
+    table.write(path)
+    copy = Table.read(path)
+
+    assert copy.colnames == table.colnames
+    assert copy['mean'][0] == table['mean'][0]
+
+
+def test_batch_statistics_abort():
+    tracker = ProgressTracker(4)
+    tracker.abort()
+
+    with pytest.raises(ProcessAborted):
+        batch_statistics(_spectra(), tracker=tracker)
+
+
+def test_batch_statistics_abort_running(monkeypatch):
+    def slow_statistics(*args):
+        time.sleep(2)
+        return []
+
+    monkeypatch.setattr(
+        'specviz.plugins.statistics.batch._spectrum_statistics',
+        slow_statistics)
+
+    tracker = ProgressTracker(4)
+    tracker.abort()
+
+    start = time.time()
+
+    with pytest.raises(ProcessAborted):
+        batch_statistics(_spectra(), tracker=tracker)
+
+    # Spectra still being processed are not waited for
+    assert time.time() - start < 1
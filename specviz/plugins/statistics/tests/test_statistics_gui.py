@@ -1,11 +1,17 @@
 import astropy.units as u
 import numpy as np
 from astropy.modeling.models import Gaussian1D
+from qtpy.QtWidgets import QMessageBox
 from specutils import SpectralRegion, Spectrum1D
 from specutils.analysis import centroid, equivalent_width, fwhm, line_flux
 from specutils.manipulation import extract_region
 
+from specviz.core import line_analysis
+from specviz.core.cache import LRUCache
 from specviz.core.hub import Hub
+from specviz.plugins.statistics.statistics_index import StatisticsIndex
+from specviz.plugins.statistics.statistics_widget import (StatisticsWidget,
+                                                          iter_stats)
 
 
 # todo: we should really add one more test here for stats run on a unit updated plot
@@ -51,13 +57,17 @@ def new_workspace(specviz_gui):
     return specviz_gui.current_workspace
 
 
-def test_statistics_gui_full_spectrum(specviz_gui):
+def test_statistics_gui_full_spectrum(specviz_gui, qtbot):
     # Ensure that the test is run on an unmodified workspace instance
     workspace = new_workspace(specviz_gui)
     hub = Hub(workspace=workspace)
 
+    # Wait for the statistics to be computed
+    stats_widget = specviz_gui.current_workspace._plugin_bars['Statistics']
+    qtbot.waitUntil(lambda: not stats_widget.pending)
+
     # pull out stats dictionary
-    stats_dict = specviz_gui.current_workspace._plugin_bars['Statistics'].stats
+    stats_dict = stats_widget.stats
 
     # Generate truth comparisons
     spectrum = hub.plot_item._data_item.spectrum
@@ -78,7 +88,7 @@ def test_statistics_gui_full_spectrum(specviz_gui):
     workspace.close()
 
 
-def test_statistics_gui_roi_spectrum(specviz_gui):
+def test_statistics_gui_roi_spectrum(specviz_gui, qtbot):
     # Ensure that the test is run on an unmodified workspace instance
     workspace = new_workspace(specviz_gui)
     hub = Hub(workspace=workspace)
@@ -91,8 +101,12 @@ def test_statistics_gui_roi_spectrum(specviz_gui):
     spectrum = extract_region(hub.plot_item._data_item.spectrum,
                               SpectralRegion(*hub.selected_region_bounds))
 
+    # Wait for the statistics to be computed
+    stats_widget = specviz_gui.current_workspace._plugin_bars['Statistics']
+    qtbot.waitUntil(lambda: not stats_widget.pending)
+
     # pull out stats dictionary
-    stats_dict = specviz_gui.current_workspace._plugin_bars['Statistics'].stats
+    stats_dict = stats_widget.stats
 
     # Generate truth comparisons
     truth_dict = {'mean': spectrum.flux.mean(),
@@ -110,3 +124,102 @@ def test_statistics_gui_roi_spectrum(specviz_gui):
     assert stats_dict == truth_dict
 
     workspace.close()
+
+
+def test_statistics_gui_cache(specviz_gui, qtbot):
+    # Ensure that the test is run on an unmodified workspace instance
+    workspace = new_workspace(specviz_gui)
+
+    stats_widget = specviz_gui.current_workspace._plugin_bars['Statistics']
+    qtbot.waitUntil(lambda: not stats_widget.pending)
+
+    stats_dict = stats_widget.stats
+    hits = stats_widget.stats_cache.hits
+
+    # Revisiting the same data shows the cached stats without recomputing
+    stats_widget.update_statistics()
+
+    assert not stats_widget.pending
+    assert stats_widget.stats is stats_dict
+    assert stats_widget.stats_cache.hits == hits + 1
+
+    workspace.close()
+
+
+def test_statistics_gui_model_edit(specviz_gui, qtbot, monkeypatch):
+    monkeypatch.setattr(QMessageBox, "warning", lambda *args: QMessageBox.Ok)
+
+    # Ensure that the test is run on an unmodified workspace instance
+    workspace = new_workspace(specviz_gui)
+    hub = Hub(workspace=workspace)
+
+    model_editor = workspace._plugin_bars['Model Editor']
+    model_editor._on_create_new_model()
+    model_editor._add_fittable_model(Gaussian1D)
+
+    stats_widget = workspace._plugin_bars['Statistics']
+    qtbot.waitUntil(lambda: not stats_widget.pending)
+
+    maxval = stats_widget.stats['maxval']
+
+    # Editing a parameter re-evaluates the model in place
+    model_item = hub.plot_item.data_item.model_editor_model.items[0]
+
+    for row in range(model_item.rowCount()):
+        if model_item.child(row, 0).data() == 'amplitude':
+            amplitude = float(model_item.child(row, 1).text())
+            model_item.child(row, 1).setText(str(amplitude * 2))
+
+    qtbot.waitUntil(lambda: not stats_widget.pending and
+                    stats_widget.stats['maxval'] != maxval)
+
+    assert stats_widget.stats['maxval'] == \
+        hub.plot_item.data_item.spectrum.flux.max()
+
+    workspace.close()
+
+
+def test_statistics_index_cache():
+    spectrum = Spectrum1D(flux=np.arange(10.) * u.Jy,
+                          spectral_axis=np.arange(10) * u.AA)
+    index_cache = LRUCache(maxsize=1)
+
+    def compute(data_key):
+        return dict(StatisticsWidget._compute_statistics(
+            index_cache, spectrum, data_key, None, None))
+
+    stats = compute(("Spectrum", 0))
+
+    # The index is reused for the same data version, even though the
+    # spectrum has been modified in place
+    spectrum._data *= 2
+
+    assert compute(("Spectrum", 0))['maxval'] == stats['maxval']
+    assert compute(("Spectrum", 1))['maxval'] == 2 * stats['maxval']
+
+
+def test_statistics_errors(monkeypatch):
+    spectrum = Spectrum1D(flux=np.arange(10.) * u.Jy,
+                          spectral_axis=np.arange(10) * u.AA)
+
+    def fail(*args, **kwargs):
+        raise ValueError("Failed")
+
+    # A statistic that fails is reported on its own
+    monkeypatch.setattr(line_analysis, 'fwhm', fail)
+
+    stats = dict(iter_stats(spectrum))
+
+    assert stats['fwhm'] == "Error"
+    assert stats['maxval'] == 9 * u.Jy
+
+    # The indexed statistics fail together, the others are still computed
+    monkeypatch.undo()
+    monkeypatch.setattr(StatisticsIndex, 'statistics', fail)
+
+    stats = dict(iter_stats(spectrum))
+
+    assert stats['mean'] == "Error"
+    assert stats['total'] == "Error"
+    assert isinstance(stats['fwhm'], u.Quantity)
+    assert stats['snr'] == "N/A"
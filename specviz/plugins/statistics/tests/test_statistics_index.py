@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from ..statistics_index import StatisticsIndex
+
+
+def _expected(spectral_axis, flux):
+    return {'mean': flux.mean(),
+            'median': np.median(flux),
+            'stddev': flux.std(),
+            'minval': flux.min(),
+            'maxval': flux.max(),
+            'centroid': np.sum(flux * spectral_axis) / np.sum(flux),
+            'total': np.sum(flux[1:] * np.diff(spectral_axis)),
+            'ew': ((spectral_axis[-1] - spectral_axis[0]) -
+                   np.sum(flux[1:] * np.diff(spectral_axis)))}
+
+
+def test_statistics_match_direct_computation():
+    spectral_axis = np.linspace(3000, 9000, 100000)
+    flux = np.random.normal(5, 1, spectral_axis.size)
+    flux[54321] = 100
+
+    index = StatisticsIndex(spectral_axis, flux, direct_size=1000)
+
+    for start, stop in [(0, None), (12345, 99999), (63, 54322), (10, 500)]:
+        stats = index.statistics(start, stop)
+        expected = _expected(spectral_axis[start:stop], flux[start:stop])
+
+        assert stats.keys() == expected.keys()
+
+        for key in expected:
+            assert stats[key] == pytest.approx(expected[key], rel=1e-10)
+
+    # Extrema are looked up exactly
+    assert index.statistics(63, 54322)['maxval'] == 100
+    assert index.statistics(54322)['maxval'] == flux[54322:].max()
+
+
+def test_short_ranges_are_exact():
+    spectral_axis = np.arange(100.)
+    flux = np.random.sample(100)
+
+    index = StatisticsIndex(spectral_axis, flux)
+
+    assert index.statistics(20, 80) == _expected(spectral_axis[20:80],
+                                                 flux[20:80])
+
+
+def test_non_finite_values():
+    spectral_axis = np.arange(10000.)
+    flux = np.ones(10000)
+    flux[5000] = np.nan
+
+    index = StatisticsIndex(spectral_axis, flux, direct_size=10)
+
+    assert np.isnan(index.statistics()['mean'])
+    assert index.statistics(5001)['mean'] == 1
+    assert index.statistics(0, 5000)['stddev'] == 0
+
+
+def test_region_slice():
+    spectral_axis = np.arange(100.)
+    index = StatisticsIndex(spectral_axis, np.ones(100))
+
+    # Both bounds are included
+    assert index.region_slice(10, 20) == slice(10, 21)
+    assert index.region_slice(20, 10) == slice(10, 21)
+    assert index.region_slice(10.5, 10.7) == slice(11, 11)
+    assert index.region_slice(200, 300) == slice(100, 100)
+    assert index.spectral_bounds == (0, 99)
+
+    # The same samples are found on a decreasing axis
+    index = StatisticsIndex(spectral_axis[::-1], np.ones(100))
+
+    assert index.region_slice(10, 20) == slice(79, 90)
+    assert index.spectral_bounds == (0, 99)
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        StatisticsIndex([0, 2, 1], [1, 1, 1])
+
+    with pytest.raises(ValueError):
+        StatisticsIndex([0, 1, 2], [1, 1])
+
+    with pytest.raises(ValueError):
+        StatisticsIndex([0, 1, 2], [1, 1, 1]).statistics(2, 2)
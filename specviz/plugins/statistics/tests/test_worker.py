@@ -0,0 +1,57 @@
+import time
+
+from ..worker import StatisticsWorker
+
+
+def _job(values, delay=0):
+    def job():
+        for key, value in values.items():
+            time.sleep(delay)
+            yield key, value
+
+    return job
+
+
+def test_worker_results(qtbot):
+    worker = StatisticsWorker()
+    results = []
+    worker.computed.connect(lambda key, value: results.append((key, value)))
+
+    with qtbot.waitSignal(worker.finished):
+        worker.submit(_job({'mean': 1, 'median': 2}))
+
+    assert results == [('mean', 1), ('median', 2)]
+    assert not worker.pending
+
+    def failing():
+        yield 'mean', 1
+        raise ValueError("Region out of bound.")
+
+    with qtbot.waitSignal(worker.failed) as blocker:
+        worker.submit(failing)
+
+    assert blocker.args == ["Region out of bound."]
+    assert not worker.pending
+
+
+def test_worker_latest_wins(qtbot):
+    worker = StatisticsWorker()
+    results = []
+    worker.computed.connect(lambda key, value: results.append((key, value)))
+
+    for value in range(3):
+        worker.submit(_job({'mean': value, 'median': value}, delay=0.05))
+
+    with qtbot.waitSignal(worker.finished):
+        pass
+
+    # Only the statistics of the latest computation are reported
+    assert results == [('mean', 2), ('median', 2)]
+
+    worker.submit(_job({'mean': 3, 'median': 3}, delay=0.05))
+    worker.cancel()
+    worker.wait()
+    qtbot.wait(50)
+
+    assert results == [('mean', 2), ('median', 2)]
+    assert not worker.pending
@@ -0,0 +1,58 @@
+from qtpy.QtCore import Signal
+
+from ...core.cache import LRUCache
+from ...core.tasks import TaskRunner
+
+__all__ = ['StatisticsWorker']
+
+
+class StatisticsWorker(TaskRunner):
+    """
+    Computes statistics in a background thread so that the GUI doesn't
+    stall while they are computed over large regions.
+
+    Only the latest computation matters: submitting a new computation
+    cancels the previous one, whose remaining statistics are then neither
+    computed nor reported. Each statistic is reported as soon as it has been
+    computed, so that the statistics display can be filled in progressively.
+
+    Attributes
+    ----------
+    index_cache : `~specviz.core.cache.LRUCache`
+        Cache for state reused between computations, such as the statistics
+        index of the current spectrum. Since the computations run one after
+        the other in a single thread, it is only accessed from that thread.
+
+    Signals
+    -------
+    computed : Signal
+        Emitted with the key and value of each statistic as it is computed.
+    finished : Signal
+        Emitted once all statistics of a computation have been computed.
+    failed : Signal
+        Emitted with an error message when a computation raised an
+        exception.
+    """
+    computed = Signal(str, object)
+    finished = Signal()
+
+    def __init__(self, parent=None):
+        super(StatisticsWorker, self).__init__(max_workers=1, parent=parent)
+
+        self.index_cache = LRUCache(maxsize=1)
+
+    def submit(self, job):
+        """
+        Start a computation, cancelling the current one.
+
+        Parameters
+        ----------
+        job : callable
+            Called without arguments in the worker thread, returning an
+            iterable of (key, value) pairs of statistics.
+        """
+        self.cancel()
+
+        super(StatisticsWorker, self).submit(
+            job, callback=lambda item: self.computed.emit(*item),
+            finished=self.finished.emit, iterate=True)
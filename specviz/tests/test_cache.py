@@ -0,0 +1,34 @@
+from ..core.cache import LRUCache
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(maxsize=2)
+
+    cache.put('a', 1)
+    cache.put('b', 2)
+
+    # Accessing 'a' makes 'b' the least recently used entry
+    assert cache.get('a') == 1
+
+    cache.put('c', 3)
+
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_lru_cache_get_or_compute():
+    cache = LRUCache(maxsize=4)
+    calls = []
+
+    def compute():
+        calls.append(1)
+
+    # Cached `None` values should not trigger a recomputation
+    assert cache.get_or_compute('key', compute) is None
+    assert cache.get_or_compute('key', compute) is None
+
+    assert len(calls) == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
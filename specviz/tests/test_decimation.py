@@ -0,0 +1,136 @@
+import astropy.units as u
+import numpy as np
+import pytest
+from specutils import Spectrum1D
+
+from ..core.decimation import DeclutterIndex, MinMaxPyramid
+from ..core.items import DataItem, PlotDataItem
+
+
+def test_pyramid_preserves_extrema():
+    values = np.random.sample(100000)
+    values[12345] = 10
+    values[54321] = -10
+    edges = np.arange(values.size + 1, dtype=float)
+
+    pyramid = MinMaxPyramid(edges, values)
+
+    assert pyramid.levels > 0
+    assert pyramid.bounds(1) == [-10, 10]
+
+    x, y = pyramid.select(edges[0], edges[-1], pixel_width=500)
+
+    assert len(x) == len(y) + 1
+    assert len(y) <= 4 * 500
+    assert y.max() == 10
+    assert y.min() == -10
+
+
+def test_pyramid_visible_slice():
+    values = np.arange(100000, dtype=float)
+    edges = np.arange(values.size + 1, dtype=float)
+
+    pyramid = MinMaxPyramid(edges, values)
+
+    # A narrow range should be served at full resolution
+    x, y = pyramid.select(1000, 1100, pixel_width=500)
+
+    assert len(x) == len(y) + 1
+    assert x[0] <= 1000 and x[-1] >= 1100
+    np.testing.assert_array_equal(y, values[int(x[0]):int(x[-1])])
+
+
+def test_pyramid_descending_axis():
+    values = np.random.sample(50000)
+    edges = np.linspace(10, 1, values.size + 1)
+
+    pyramid = MinMaxPyramid(edges, values, min_blocks=16)
+    x, y = pyramid.select(2, 3, pixel_width=100)
+
+    assert len(x) == len(y) + 1
+    assert x.max() >= 3 and x.min() <= 2
+
+
+def test_pyramid_non_monotonic():
+    with pytest.raises(ValueError):
+        MinMaxPyramid([0, 2, 1, 3], [1, 2, 3])
+
+
+def test_plot_data_item_lod(specviz_gui):
+    for size in (100, PlotDataItem.LOD_MIN_SAMPLES):
+        spectrum = Spectrum1D(flux=np.random.sample(size) * u.Jy,
+                              spectral_axis=np.arange(size) * u.AA)
+        plot_data_item = PlotDataItem(DataItem("Spectrum", "1", spectrum))
+
+        # Only large spectra are rendered through a pyramid
+        assert (plot_data_item._lod is not None) == \
+            (size >= PlotDataItem.LOD_MIN_SAMPLES)
+
+        x, y = plot_data_item.getData()
+
+        assert len(x) == len(y) + 1
+        assert list(plot_data_item.dataBounds(0)) == [0, size - 1]
+
+
+def test_declutter_index_separation():
+    x = np.random.uniform(0, 1000, 50000)
+
+    index = DeclutterIndex(x)
+
+    assert len(index) == x.size
+    assert index.levels > 1
+
+    for separation in (0.1, 1, 10, 100):
+        rows = index.select(0, 1000, separation)
+
+        assert np.all(np.diff(x[rows]) >= separation)
+        # Survivors are spread out over the whole range
+        assert len(rows) <= 1000 / separation + 1
+
+
+def test_declutter_index_stable_slice():
+    x = np.random.permutation(np.arange(10000, dtype=float))
+
+    index = DeclutterIndex(x)
+
+    rows = index.select(0, 10000, 50)
+    panned = index.select(1000, 2000, 50)
+
+    # Panning only slices the points selected at the same zoom level
+    np.testing.assert_array_equal(
+        panned, rows[(x[rows] >= 1000) & (x[rows] <= 2000)])
+
+
+def test_declutter_index_zoomed_in():
+    x = np.array([0, 1000, 1000.5, np.nan, 2000])
+
+    index = DeclutterIndex(x)
+
+    assert len(index) == 4
+    np.testing.assert_array_equal(index.select(-np.inf, np.inf, 0), [0, 1, 2, 4])
+
+    # A narrow range still shows the point it holds, even though that
+    # point is hidden by its neighbour at coarser separations
+    assert 2 not in index.select(0, 2000, 100)
+    np.testing.assert_array_equal(index.select(1000.2, 1000.8, 100), [2])
+
+
+def test_declutter_index_update():
+    x = np.random.uniform(0, 1000, 10000)
+
+    index = DeclutterIndex(x)
+
+    # Move a block of points, hiding some of them
+    rows = np.arange(2000, 3000)
+    x[rows] *= 1.5
+    x[rows[::100]] = np.nan
+
+    index.update(rows, x[rows])
+    expected = DeclutterIndex(x)
+
+    assert len(index) == len(expected)
+    assert index.levels == expected.levels
+
+    for separation in (0, 1, 10, 100):
+        np.testing.assert_array_equal(index.select(0, 1500, separation),
+                                      expected.select(0, 1500, separation))
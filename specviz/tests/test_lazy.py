@@ -0,0 +1,284 @@
+import gc
+import os
+import weakref
+from collections import OrderedDict
+
+import astropy.units as u
+import numpy as np
+from astropy.io import fits
+from astropy.nddata import StdDevUncertainty
+from astropy.tests.helper import assert_quantity_allclose
+from astropy.wcs import WCS
+from specutils import Spectrum1D
+
+from ..core.items import DataItem
+from ..core.lazy import LazySpectrum, SourceArrays
+
+
+def _spectrum():
+    return Spectrum1D(flux=np.random.sample(100) * u.Jy,
+                      spectral_axis=np.arange(1, 101) * u.AA,
+                      uncertainty=StdDevUncertainty(np.random.sample(100)))
+
+
+def test_lazy_spectrum_round_trip(tmpdir):
+    spectrum = _spectrum()
+    lazy = LazySpectrum.from_spectrum(spectrum, directory=str(tmpdir))
+
+    assert os.path.isfile(lazy.path)
+    assert not lazy.is_materialized
+
+    assert_quantity_allclose(lazy.spectrum.flux, spectrum.flux)
+    assert_quantity_allclose(lazy.spectrum.spectral_axis,
+                             spectrum.spectral_axis)
+    np.testing.assert_allclose(lazy.spectrum.uncertainty.array,
+                               spectrum.uncertainty.array)
+    assert isinstance(lazy.spectrum.uncertainty, StdDevUncertainty)
+    assert lazy.is_materialized
+
+    lazy.release()
+
+    assert not lazy.is_materialized
+    assert_quantity_allclose(lazy.spectrum.flux, spectrum.flux)
+
+
+def test_lazy_spectrum_residency_limit(tmpdir, monkeypatch):
+    first = LazySpectrum.from_spectrum(_spectrum(), directory=str(tmpdir))
+    second = LazySpectrum.from_spectrum(_spectrum(), directory=str(tmpdir))
+
+    # Only allow a single spectrum to be materialised at a time
+    monkeypatch.setattr(LazySpectrum, 'max_resident_bytes', first.nbytes)
+
+    first.spectrum
+    second.spectrum
+
+    assert second.is_materialized
+    assert not first.is_materialized
+
+
+def test_lazy_spectrum_registry(tmpdir, monkeypatch):
+    monkeypatch.setattr(LazySpectrum, '_resident', OrderedDict())
+    monkeypatch.setattr(LazySpectrum, '_resident_bytes', 0)
+
+    spectra = [LazySpectrum.from_spectrum(_spectrum(), directory=str(tmpdir))
+               for _ in range(3)]
+    nbytes = spectra[0].nbytes
+
+    monkeypatch.setattr(LazySpectrum, 'max_resident_bytes', 2 * nbytes)
+
+    spectra[0].spectrum
+    spectra[1].spectrum
+
+    assert LazySpectrum._resident_bytes == 2 * nbytes
+
+    # Accessing the first spectrum again makes the second one the least
+    # recently used
+    spectra[0].spectrum
+    spectra[2].spectrum
+
+    assert spectra[0].is_materialized
+    assert not spectra[1].is_materialized
+    assert spectra[2].is_materialized
+    assert LazySpectrum._resident_bytes == 2 * nbytes
+
+    # Collected spectra leave the registry
+    del spectra
+    gc.collect()
+
+    assert len(LazySpectrum._resident) == 0
+    assert LazySpectrum._resident_bytes == 0
+
+
+def test_lazy_data_item(tmpdir):
+    spectrum = _spectrum()
+    data_item = DataItem("Lazy", identifier=None,
+                         data=LazySpectrum.from_spectrum(
+                             spectrum, directory=str(tmpdir)))
+
+    assert data_item.is_lazy
+    assert isinstance(data_item.spectrum, Spectrum1D)
+    assert_quantity_allclose(data_item.flux, spectrum.flux)
+    assert_quantity_allclose(data_item.spectral_axis, spectrum.spectral_axis)
+
+
+def test_lazy_spectrum_attributes(tmpdir):
+    spectrum = Spectrum1D(flux=np.random.sample(100) * u.Jy,
+                          spectral_axis=np.arange(1, 101) * u.AA,
+                          velocity_convention='optical',
+                          rest_value=50 * u.AA,
+                          radial_velocity=100 * u.km / u.s)
+    lazy = LazySpectrum.from_spectrum(spectrum, directory=str(tmpdir))
+
+    assert lazy.spectrum.velocity_convention == 'optical'
+    assert lazy.spectrum.rest_value == 50 * u.AA
+    assert lazy.spectrum.radial_velocity == 100 * u.km / u.s
+    assert lazy.spectrum.redshift == spectrum.redshift
+
+    # A spectrum with a FITS WCS keeps it, and computes its spectral axis
+    # from it
+    wcs = WCS(header={'CDELT1': 2, 'CRVAL1': 6000, 'CUNIT1': 'Angstrom',
+                      'CTYPE1': 'WAVE', 'RESTFRQ': 1400000000, 'CRPIX1': 1})
+    spectrum = Spectrum1D(flux=np.random.sample(100) * u.Jy, wcs=wcs)
+    lazy = LazySpectrum.from_spectrum(spectrum, directory=str(tmpdir))
+
+    assert lazy.spectrum.wcs is wcs
+    assert lazy.spectrum.rest_value == spectrum.rest_value
+    assert_quantity_allclose(lazy.spectrum.spectral_axis,
+                             spectrum.spectral_axis)
+    assert_quantity_allclose(lazy.spectrum.flux, spectrum.flux)
+
+
+def test_lazy_spectrum_in_place(tmpdir):
+    data_item = DataItem("Lazy", identifier=None,
+                         data=LazySpectrum.from_spectrum(
+                             _spectrum(), directory=str(tmpdir)))
+
+    data_item.flux[0] = 10 * u.Jy
+    data_item.uncertainty.array[0] = 2
+
+    # Changes made in place are kept when the arrays are mapped again
+    data_item.release()
+
+    assert data_item.flux[0] == 10 * u.Jy
+    assert data_item.uncertainty.array[0] == 2
+
+
+def test_lazy_spectrum_modified(tmpdir):
+    path = str(tmpdir.join('spectrum.fits'))
+    fits.PrimaryHDU(np.random.sample(100)).writeto(path)
+
+    with fits.open(path) as hdulist:
+        spectrum = Spectrum1D(flux=hdulist[0].data * u.Jy,
+                              spectral_axis=np.arange(1, 101) * u.AA)
+
+    with SourceArrays(path) as source:
+        lazy = LazySpectrum.from_spectrum(spectrum, directory=str(tmpdir),
+                                          source=source)
+
+    assert lazy.layout['flux'].path == path
+
+    lazy.spectrum
+
+    assert not lazy.is_modified
+    assert lazy.release()
+
+    # Changes to arrays mapped copy-on-write only live in memory, so the
+    # spectrum is no longer released
+    lazy.spectrum.flux[0] = 10 * u.Jy
+
+    assert lazy.is_modified
+    assert not lazy.release()
+    assert lazy.is_materialized
+    assert lazy.spectrum.flux[0] == 10 * u.Jy
+
+    # Arrays replaced in a materialised spectrum would be lost as well
+    data_item = DataItem("Lazy", identifier=None,
+                         data=LazySpectrum.from_spectrum(
+                             _spectrum(), directory=str(tmpdir)))
+    data_item.spectrum._data = np.zeros(100)
+
+    assert not data_item.release()
+    assert np.all(data_item.flux == 0 * u.Jy)
+
+
+def test_lazy_spectrum_source(tmpdir):
+    path = str(tmpdir.join('spectra.fits'))
+
+    # A table with one spectrum per row, as in time series products
+    flux = np.random.sample((3, 100)).astype(np.float32)
+    wavelength = np.arange(1, 101, dtype=float)
+    columns = [fits.Column('WAVELENGTH', '100D', array=[wavelength] * 3),
+               fits.Column('FLUX', '100E', array=flux),
+               fits.Column('ERROR', '100E', array=flux / 10, bscale=2.)]
+    fits.HDUList([fits.PrimaryHDU(),
+                  fits.BinTableHDU.from_columns(columns)]).writeto(path)
+
+    # Read as a loader would, converting the uncertainty
+    with fits.open(path) as hdulist:
+        data = hdulist[1].data
+        spectra = [Spectrum1D(flux=data['FLUX'][i] * u.Jy,
+                              spectral_axis=data['WAVELENGTH'][i] * u.AA,
+                              uncertainty=StdDevUncertainty(
+                                  data['ERROR'][i].astype(float)))
+                   for i in range(3)]
+
+    with SourceArrays(path) as source:
+        lazy = [LazySpectrum.from_spectrum(spectrum, directory=str(tmpdir),
+                                           source=source)
+                for spectrum in spectra]
+
+    for spectrum, lazy_spectrum in zip(spectra, lazy):
+        # Only the converted uncertainty is written to a backing file
+        assert lazy_spectrum.layout['flux'].path == path
+        assert lazy_spectrum.layout['spectral_axis'].path == path
+        assert lazy_spectrum.layout['uncertainty'].path == lazy_spectrum.path
+
+        assert_quantity_allclose(lazy_spectrum.spectrum.flux, spectrum.flux)
+        assert_quantity_allclose(lazy_spectrum.spectrum.spectral_axis,
+                                 spectrum.spectral_axis)
+        np.testing.assert_allclose(lazy_spectrum.spectrum.uncertainty.array,
+                                   spectrum.uncertainty.array)
+
+    # The source file is mapped copy-on-write
+    lazy[0].spectrum.flux[0] = 10 * u.Jy
+
+    with fits.open(path) as hdulist:
+        assert hdulist[1].data['FLUX'][0][0] == flux[0][0]
+
+    # Files that are not FITS files can't be referenced
+    text_path = str(tmpdir.join('spectrum.txt'))
+    np.savetxt(text_path, wavelength)
+
+    with SourceArrays(text_path) as source:
+        assert source.locate(wavelength) is None
+
+
+def test_load_spectra_releases_arrays(specviz_gui):
+    workspace = specviz_gui.current_workspace
+
+    spectra = [_spectrum() for _ in range(3)]
+    refs = [weakref.ref(spectrum.data) for spectrum in spectra]
+    specs_by_name = OrderedDict(("Spectrum {}".format(i), spectrum)
+                                for i, spectrum in enumerate(spectra))
+
+    del spectra
+
+    data_items = workspace._load_spectra_by_name(specs_by_name)
+
+    assert len(specs_by_name) == 3
+
+    del specs_by_name
+    gc.collect()
+
+    # Only the memory-mapped copies of the loaded spectra are kept
+    assert all(ref() is None for ref in refs)
+    assert all(data_item.is_lazy for data_item in data_items)
+
+
+def test_remove_plot_releases_arrays(specviz_gui):
+    workspace = specviz_gui.current_workspace
+
+    data_item, = workspace._load_spectra_by_name(
+        OrderedDict([("Spectrum", _spectrum())]))
+
+    workspace.add_plot_window()
+
+    plot_widgets = [window.plot_widget
+                    for window in workspace.mdi_area.subWindowList()]
+    plot_items = [plot_widget.proxy_model.item_from_id(data_item.identifier)
+                  for plot_widget in plot_widgets]
+
+    for plot_widget, plot_item in zip(plot_widgets, plot_items):
+        if plot_item not in plot_widget.listDataItems():
+            plot_widget.add_plot(item=plot_item)
+
+    data_item.spectrum
+
+    # The arrays are kept while the spectrum is plotted in another window
+    plot_widgets[0].remove_plot(item=plot_items[0])
+
+    assert data_item.lazy_spectrum.is_materialized
+
+    plot_widgets[-1].remove_plot(item=plot_items[-1])
+
+    assert not data_item.lazy_spectrum.is_materialized
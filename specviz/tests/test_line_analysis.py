@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from astropy.modeling.models import Gaussian1D
+
+from ..core import line_analysis
+
+
+def _spectrum():
+    x = np.linspace(4000, 6000, 2000)
+    y = (Gaussian1D(2, 4500, 20)(x) + Gaussian1D(1, 5200, 5)(x) +
+         np.random.sample(x.size) * 0.1)
+
+    return x, y
+
+
+# Closed-form versions of the measures of a single region, following the
+# definitions of `specutils.analysis` the kernels implement. The installed
+# specutils is not used as a reference since these definitions changed
+# across its versions, e.g. the line flux is computed from bin edges since
+# specutils 1.0.
+
+def _line_flux(x, y):
+    return np.sum(y[1:] * np.diff(x))
+
+
+def _centroid(x, y):
+    return np.sum(y * x) / np.sum(y)
+
+
+def _equivalent_width(x, y):
+    return (x[-1] - x[0]) - _line_flux(x, y)
+
+
+def _fwhm(x, y):
+    argmax = np.argmax(y)
+    halfval = y[argmax] / 2
+    below = np.flatnonzero(y < halfval)
+    before = below[below < argmax]
+    after = below[below > argmax]
+
+    def interpolate(i0, i1):
+        return (halfval - y[i0]) * (x[i1] - x[i0]) / (y[i1] - y[i0]) + x[i0]
+
+    left = interpolate(before[-1], before[-1] + 1) if before.size else x[0]
+    right = interpolate(after[0] - 1, after[0]) if after.size else x[-1]
+
+    return right - left
+
+
+REFERENCES = {'line_flux': _line_flux, 'centroid': _centroid,
+              'equivalent_width': _equivalent_width, 'fwhm': _fwhm}
+
+
+@pytest.mark.parametrize('name', sorted(REFERENCES))
+def test_matches_reference(name):
+    x, y = _spectrum()
+
+    # Regions over the whole spectrum, within it, and at its edges
+    bounds = [(0, 2000), (200, 800), (550, 1500), (1100, 1110), (7, 9),
+              (1990, 2000), (1500, 1502), (0, 2), (1995, 2010)]
+
+    result = getattr(line_analysis, name)(x, y, bounds)
+    expected = [REFERENCES[name](x[lo:hi], y[lo:hi]) for lo, hi in bounds]
+
+    np.testing.assert_allclose(result, expected, rtol=1e-10)
+
+
+@pytest.mark.parametrize('name', sorted(REFERENCES))
+def test_empty_regions(name):
+    x = np.arange(10.)
+    y = np.ones(10)
+
+    # Empty, reversed and out of range bounds hold no samples
+    result = getattr(line_analysis, name)(x, y, [(2, 2), (3, 6), (6, 3),
+                                                 (20, 30), (-5, 0)])
+
+    assert np.all(np.isnan(result[[0, 2, 3, 4]]))
+    assert not np.isnan(result[1])
+
+
+def test_single_sample_regions():
+    x = np.arange(10.)
+    y = np.arange(1., 11.)
+    bounds = [(0, 1), (4, 5), (9, 10)]
+
+    # A region of a single sample has no width, and no flux
+    assert np.all(line_analysis.line_flux(x, y, bounds) == 0)
+    assert np.all(line_analysis.equivalent_width(x, y, bounds) == 0)
+    assert np.all(line_analysis.fwhm(x, y, bounds) == 0)
+    np.testing.assert_allclose(line_analysis.centroid(x, y, bounds),
+                               [0, 4, 9])
+
+
+def test_fwhm_gaussian():
+    x = np.linspace(-50, 50, 10001)
+    y = Gaussian1D(1, 0, 5)(x)
+
+    result = line_analysis.fwhm(x, y, [(0, x.size), (5000, x.size)])
+
+    np.testing.assert_allclose(result[0], 2.3548 * 5, rtol=1e-4)
+    # The half maximum is not reached on the left of the second region
+    np.testing.assert_allclose(result[1], 2.3548 * 5 / 2, rtol=1e-4)
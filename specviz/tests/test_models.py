@@ -0,0 +1,58 @@
+import astropy.units as u
+import numpy as np
+from specutils import Spectrum1D
+
+from ..core.models import DataListModel
+
+
+def _spectrum():
+    return Spectrum1D(flux=np.random.sample(10) * u.Jy,
+                      spectral_axis=np.arange(10) * u.AA)
+
+
+def test_identifier_index(specviz_gui):
+    model = DataListModel()
+
+    data_items = [model.add_data(_spectrum(), "Spectrum {}".format(i))
+                  for i in range(5)]
+
+    for row, data_item in enumerate(data_items):
+        assert model.item_from_id(data_item.identifier) is data_item
+        assert model.row_from_id(data_item.identifier) == row
+
+    # Removing a row deletes its item, so keep its identifier around
+    removed_id = data_items[1].identifier
+
+    # Removing a row should shift the rows of the subsequent items
+    model.remove_data(removed_id)
+
+    assert model.item_from_id(removed_id) is None
+    assert model.row_from_id(removed_id) is None
+
+    for data_item in data_items[2:]:
+        assert model.row_from_id(data_item.identifier) == \
+            data_item.index().row()
+
+    cleared_id = data_items[0].identifier
+
+    model.clear()
+
+    assert model.item_from_id(cleared_id) is None
+    assert model.rowCount() == 0
+
+
+def test_add_data_batch(specviz_gui):
+    model = DataListModel()
+    batches = []
+    model.data_batch_added.connect(batches.append)
+
+    specs_by_name = {"Spectrum {}".format(i): _spectrum() for i in range(5)}
+    data_items = model.add_data_batch(specs_by_name)
+
+    assert len(batches) == 1
+    assert batches[0] == data_items
+    assert model.rowCount() == 5
+    assert [x.name for x in data_items] == list(specs_by_name.keys())
+
+    for row, data_item in enumerate(data_items):
+        assert model.row_from_id(data_item.identifier) == row
@@ -0,0 +1,72 @@
+import pytest
+
+from ..core.progress import ProcessAborted, ProgressTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_progress_tracker_throttles_updates():
+    clock = FakeClock()
+    updates = []
+    tracker = ProgressTracker(1000, update=lambda t: updates.append(
+        t.percent_value), min_interval=1, min_delta=0.1, clock=clock)
+
+    # The first call is always reported
+    tracker(1)
+    assert updates == [0.001]
+
+    # Neither enough time has passed nor enough progress has been made
+    for value in range(2, 500):
+        tracker(value)
+
+    assert len(updates) == 1
+
+    # Enough time, but too little progress since the last report
+    clock.time = 2
+    tracker(50)
+    assert len(updates) == 1
+
+    # Enough time and progress
+    tracker(500)
+    assert updates[-1] == 0.5
+
+    # Completion is always reported
+    tracker(1000)
+    assert updates[-1] == 1
+
+
+def test_progress_tracker_throughput_and_eta():
+    clock = FakeClock()
+    tracker = ProgressTracker(100, clock=clock)
+
+    assert tracker.eta is None
+
+    clock.time = 5
+    tracker(25)
+
+    assert tracker.throughput == 5
+    assert tracker.eta == 15
+
+
+def test_progress_tracker_abort():
+    tracker = ProgressTracker(10)
+    tracker()
+
+    assert tracker.current_value == 1
+    assert not tracker.aborted
+
+    tracker.abort()
+
+    with pytest.raises(ProcessAborted):
+        tracker.check_aborted()
+
+    with pytest.raises(ProcessAborted):
+        tracker()
+
+    assert tracker.current_value == 1
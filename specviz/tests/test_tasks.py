@@ -0,0 +1,77 @@
+import time
+
+from ..core.tasks import TaskRunner
+
+
+def test_runner_results(qtbot):
+    runner = TaskRunner(max_workers=2)
+    results = []
+    errors = []
+    runner.failed.connect(errors.append)
+
+    with qtbot.waitSignal(runner.busy) as blocker:
+        for value in range(4):
+            runner.submit(lambda value=value: value * 2, results.append)
+        runner.submit(lambda: 1 / 0, results.append)
+
+    assert blocker.args == [True]
+
+    qtbot.waitUntil(lambda: runner.pending == 0)
+
+    assert sorted(results) == [0, 2, 4, 6]
+    assert len(errors) == 1
+
+
+def test_runner_iterate(qtbot):
+    runner = TaskRunner()
+    results = []
+    finished = []
+
+    runner.submit(lambda: iter(range(3)), results.append,
+                  finished=lambda: finished.append(True), iterate=True)
+
+    qtbot.waitUntil(lambda: runner.pending == 0)
+
+    assert results == [0, 1, 2]
+    assert finished == [True]
+
+
+def test_runner_cancel(qtbot):
+    runner = TaskRunner(max_workers=1)
+    results = []
+
+    for value in range(4):
+        runner.submit(lambda value=value: time.sleep(0.1) or value,
+                      results.append)
+
+    with qtbot.waitSignal(runner.busy) as blocker:
+        runner.cancel()
+
+    assert blocker.args == [False]
+    assert runner.pending == 0
+
+    # Results of jobs that were running when cancelled are discarded
+    runner.wait()
+    qtbot.wait(50)
+
+    assert results == []
+
+
+def test_runner_cancel_iterate(qtbot):
+    runner = TaskRunner(max_workers=1)
+    produced = []
+
+    def job():
+        for value in range(100):
+            produced.append(value)
+            time.sleep(0.01)
+            yield value
+
+    runner.submit(job, iterate=True)
+    qtbot.waitUntil(lambda: len(produced) > 0)
+
+    runner.cancel()
+    runner.wait()
+
+    # The job stops producing items as soon as it has been cancelled
+    assert len(produced) < 100
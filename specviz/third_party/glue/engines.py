@@ -0,0 +1,491 @@
+import logging
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from astropy import convolution
+from astropy.modeling.fitting import LevMarLSQFitter
+from scipy.signal import medfilt
+
+__all__ = ['spaxel_tiles', 'allocate_output', 'linemap', 'fit_cube',
+           'apply_spectral_function', 'smooth_cube']
+
+# The cube engines work on tiles of spaxels so that only a bounded part of the
+# cube is held in memory at any time, and report progress once per tile. This
+# is the upper bound on the size in bytes of a single tile of cube data.
+TILE_BYTES = 64 * 1024 ** 2
+
+# Fitting is expensive per spaxel, so smaller tiles are used to balance the
+# load between worker processes and to keep aborting responsive
+FIT_TILE_SPAXELS = 256
+
+LINEMAP_STATISTICS = {'sum': np.sum,
+                      'mean': np.mean}
+
+
+def _convolution_smooth(kernel_class):
+    def smooth(fluxes, size):
+        # A kernel extending only along the spectral axis convolves every
+        # spectrum independently, giving the same result as convolving each
+        # spectrum on its own as `~specutils.manipulation.convolution_smooth`
+        # does
+        kernel = kernel_class(size).array[:, np.newaxis]
+
+        return convolution.convolve(fluxes, kernel)
+
+    return smooth
+
+
+def _median_smooth(fluxes, size):
+    out = medfilt(fluxes, (size, 1))
+
+    # The multi-dimensional median filter orders NaN values differently
+    # from the one-dimensional filter, so spectra containing NaN are
+    # filtered on their own to match `~specutils.manipulation.median_smooth`
+    for i in np.flatnonzero(np.isnan(fluxes).any(axis=0)):
+        out[:, i] = medfilt(fluxes[:, i], size)
+
+    return out
+
+
+# Smoothing functions applied to a two dimensional array of spectra along the
+# first axis, keyed as in `specviz.plugins.smoothing.KERNEL_REGISTRY`
+SMOOTHING_KERNELS = {'box': _convolution_smooth(convolution.Box1DKernel),
+                     'gaussian': _convolution_smooth(
+                         convolution.Gaussian1DKernel),
+                     'trapezoid': _convolution_smooth(
+                         convolution.Trapezoid1DKernel),
+                     'median': _median_smooth}
+
+
+def spaxel_tiles(shape, tile_spaxels=None, itemsize=8):
+    """
+    Generate slices splitting the spatial axes of a cube into tiles.
+
+    Tiles are made of whole rows of the cube where possible, otherwise of
+    parts of a single row.
+
+    Parameters
+    ----------
+    shape : tuple
+        The shape of the cube, with the spectral axis first.
+    tile_spaxels : int, optional
+        The maximum number of spaxels in each tile. By default, this is chosen
+        so that a tile holds at most ``TILE_BYTES`` bytes of data.
+    itemsize : int, optional
+        The size in bytes of a single value of the cube.
+
+    Yields
+    ------
+    tuple of slice
+        The slices selecting the tile from the cube.
+    """
+    n_spectral, n_rows, n_columns = shape
+
+    if tile_spaxels is None:
+        tile_spaxels = TILE_BYTES // (max(n_spectral, 1) * itemsize)
+
+    tile_spaxels = max(int(tile_spaxels), 1)
+
+    if tile_spaxels >= n_columns:
+        rows, columns = tile_spaxels // max(n_columns, 1), n_columns
+    else:
+        rows, columns = 1, tile_spaxels
+
+    for row in range(0, n_rows, rows):
+        for column in range(0, n_columns, columns):
+            yield (slice(None),
+                   slice(row, min(row + rows, n_rows)),
+                   slice(column, min(column + columns, n_columns)))
+
+
+def _tile_size(view):
+    return (view[1].stop - view[1].start) * (view[2].stop - view[2].start)
+
+
+def allocate_output(shape, filename=None):
+    """
+    Allocate the array into which the result of a cube operation is written.
+
+    Parameters
+    ----------
+    shape : tuple
+        The shape of the result.
+    filename : str, optional
+        If given, the result is backed by a memory-mapped file at this path
+        rather than held in memory, so that results larger than the
+        available memory can be produced. The file is created, or
+        overwritten if it exists.
+
+    Returns
+    -------
+    `~numpy.ndarray` or `~numpy.memmap`
+        The uninitialised output array.
+    """
+    if filename is None:
+        return np.empty(shape)
+
+    return np.memmap(filename, dtype=float, mode='w+', shape=tuple(shape))
+
+
+def _check_output(out, shape):
+    if out is None:
+        return np.empty(shape)
+
+    if out.shape != tuple(shape):
+        raise ValueError("Output array has shape {}, but {} is "
+                         "required.".format(out.shape, tuple(shape)))
+
+    return out
+
+
+def linemap(data, spectral_mask=None, statistic='sum', shape=None,
+            tile_spaxels=None, out=None, tracker=None):
+    """
+    Collapse a cube along its spectral axis.
+
+    Parameters
+    ----------
+    data : array-like
+        The cube data, with the spectral axis first. Any object supporting
+        numpy-style slicing can be used, e.g. the ``filled_data`` attribute
+        of a :class:`~spectral_cube.SpectralCube`, in which case values
+        excluded by the cube mask are filled with NaN.
+    spectral_mask : `~numpy.ndarray`, optional
+        Boolean mask along the spectral axis selecting the values to
+        include.
+    statistic : {'sum', 'mean'}
+        The statistic used to collapse each spectrum.
+    shape : tuple, optional
+        The shape of the cube. Required if ``data`` has no ``shape``
+        attribute.
+    tile_spaxels : int, optional
+        The maximum number of spaxels processed at a time.
+    out : `~numpy.ndarray`, optional
+        The array into which the result is written, e.g. one created by
+        `allocate_output`. Must have the shape of the spatial axes.
+    tracker : callable, optional
+        Called after each tile with the total number of processed spaxels.
+
+    Returns
+    -------
+    `~numpy.ndarray`
+        The two dimensional collapsed image.
+    """
+    if statistic not in LINEMAP_STATISTICS:
+        raise ValueError("Unknown linemap statistic '{}', must be one of "
+                         "{}.".format(statistic, list(LINEMAP_STATISTICS)))
+
+    reduce = LINEMAP_STATISTICS[statistic]
+
+    shape = shape or data.shape
+    out = _check_output(out, shape[1:])
+    processed = 0
+
+    for view in spaxel_tiles(shape, tile_spaxels):
+        tile = np.asarray(data[view])
+
+        if spectral_mask is not None:
+            tile = tile[spectral_mask]
+
+        out[view[1:]] = reduce(tile, axis=0)
+
+        processed += _tile_size(view)
+
+        if tracker is not None:
+            tracker(processed)
+
+    return out
+
+
+def _fit_tile(model, fitter, spectral_axis, spectral_mask, fluxes, collapse):
+    """
+    Fit the model to each column of ``fluxes``. This is defined at the module
+    level so that it can be run in a worker process.
+
+    Non-finite values, e.g. those outside the mask of a subset, are left out
+    of the fit. Spaxels without any finite values, or whose fit fails, give
+    NaN rather than aborting the whole cube.
+    """
+    masked_axis = spectral_axis[spectral_mask]
+
+    if collapse:
+        out = np.full(fluxes.shape[1], np.nan)
+    else:
+        out = np.full((spectral_axis.size, fluxes.shape[1]), np.nan)
+
+    for i in range(fluxes.shape[1]):
+        flux = fluxes[spectral_mask, i]
+        finite = np.isfinite(flux)
+
+        if not finite.any():
+            continue
+
+        try:
+            fit_model = fitter(model, masked_axis[finite], flux[finite])
+        except Exception as e:
+            logging.warning("Fitting spaxel failed: %s", e)
+            continue
+
+        if collapse:
+            out[i] = np.sum(fit_model(masked_axis))
+        else:
+            out[:, i] = fit_model(spectral_axis)
+
+    return out
+
+
+def _process_pool(workers):
+    """
+    Create a process pool. Worker processes are spawned rather than forked,
+    since forking a process running Qt threads is not safe.
+    """
+    try:
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    except TypeError:
+        # Python 3.6 does not support choosing the start method
+        return ProcessPoolExecutor(max_workers=workers)
+
+
+def fit_cube(data, model, spectral_axis, spectral_mask=None, collapse=False,
+             shape=None, fitter=None, workers=1, tile_spaxels=None, out=None,
+             tracker=None):
+    """
+    Fit a model to every spectrum of a cube.
+
+    If more than one worker is requested, tiles of spaxels are fitted in a
+    pool of worker processes, each receiving the pickled model along with
+    its tile. At most two tiles per worker are queued at a time, and results
+    are written into the output array as they arrive.
+
+    Parameters
+    ----------
+    data : array-like
+        The cube data, with the spectral axis first.
+    model : :class:`~astropy.modeling.Model`
+        The model to fit. It must be picklable if ``workers`` is more than
+        one.
+    spectral_axis : `~numpy.ndarray`
+        The spectral axis values of the cube.
+    spectral_mask : `~numpy.ndarray`, optional
+        Boolean mask along the spectral axis selecting the values to fit.
+    collapse : bool, optional
+        If `True`, the result is the sum of each fitted model evaluated on
+        the masked spectral axis, giving a two dimensional image. Otherwise,
+        the result is each fitted model evaluated on the full spectral axis.
+    shape : tuple, optional
+        The shape of the cube. Required if ``data`` has no ``shape``
+        attribute.
+    fitter : :class:`~astropy.modeling.fitting.Fitter`, optional
+        The fitter to use. Defaults to a
+        :class:`~astropy.modeling.fitting.LevMarLSQFitter`.
+    workers : int, optional
+        The number of worker processes. If one, the fit is performed in the
+        calling thread.
+    tile_spaxels : int, optional
+        The maximum number of spaxels in each tile. Defaults to
+        ``FIT_TILE_SPAXELS``.
+    out : `~numpy.ndarray`, optional
+        The array into which the result is written, e.g. one created by
+        `allocate_output`. Must have the shape of the spatial axes if
+        ``collapse`` is `True`, otherwise the shape of the cube.
+    tracker : callable, optional
+        Called with the total number of processed spaxels after each tile,
+        and periodically while waiting for worker processes. If the tracker
+        raises an exception, e.g. because the operation has been aborted,
+        queued tiles are cancelled and the exception propagated.
+
+    Returns
+    -------
+    `~numpy.ndarray`
+        The fit results.
+    """
+    shape = shape or data.shape
+    fitter = fitter or LevMarLSQFitter()
+    spectral_axis = np.asarray(spectral_axis)
+
+    if spectral_mask is None:
+        spectral_mask = np.ones(shape[0], dtype=bool)
+
+    out = _check_output(out, shape[1:] if collapse else shape)
+    processed = 0
+
+    def _read(view):
+        return np.asarray(data[view]).reshape(shape[0], -1)
+
+    def _store(view, result):
+        target = view[1:] if collapse else view
+        out[target] = result.reshape(out[target].shape)
+
+    tiles = spaxel_tiles(shape, tile_spaxels or FIT_TILE_SPAXELS)
+
+    if workers <= 1:
+        for view in tiles:
+            _store(view, _fit_tile(model, fitter, spectral_axis,
+                                   spectral_mask, _read(view), collapse))
+
+            processed += _tile_size(view)
+
+            if tracker is not None:
+                tracker(processed)
+
+        return out
+
+    executor = _process_pool(workers)
+    pending = {}
+
+    try:
+        while True:
+            # Keep the workers busy without reading the whole cube at once
+            while len(pending) < 2 * workers:
+                view = next(tiles, None)
+
+                if view is None:
+                    break
+
+                future = executor.submit(_fit_tile, model, fitter,
+                                         spectral_axis, spectral_mask,
+                                         _read(view), collapse)
+                pending[future] = view
+
+            if len(pending) == 0:
+                break
+
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                view = pending.pop(future)
+                _store(view, future.result())
+                processed += _tile_size(view)
+
+            if tracker is not None:
+                tracker(processed)
+    finally:
+        for future in pending:
+            future.cancel()
+
+        # Also cancel the tiles the executor has already queued for its
+        # worker processes, so that an aborted fit stops once the running
+        # tiles are done
+        try:
+            executor.shutdown(wait=False, cancel_futures=True)
+        except TypeError:
+            # Python < 3.9 does not support cancelling queued work
+            executor.shutdown(wait=False)
+
+    return out
+
+
+def apply_spectral_function(data, function, spectral_axis, shape=None,
+                            tile_spaxels=None, out=None, tracker=None):
+    """
+    Apply a function to every spectrum of a cube, one tile of spaxels at a
+    time.
+
+    Parameters
+    ----------
+    data : array-like
+        The cube data, with the spectral axis first.
+    function : callable
+        Called with the flux of a single spectrum and ``spectral_axis``, and
+        returning the new flux values of the spectrum.
+    spectral_axis : `~numpy.ndarray` or `~astropy.units.Quantity`
+        The spectral axis values of the cube.
+    shape : tuple, optional
+        The shape of the cube. Required if ``data`` has no ``shape``
+        attribute.
+    tile_spaxels : int, optional
+        The maximum number of spaxels processed at a time.
+    out : `~numpy.ndarray`, optional
+        The array into which the result is written, e.g. one created by
+        `allocate_output`. Must have the shape of the cube.
+    tracker : callable, optional
+        Called after each tile with the total number of processed spaxels.
+
+    Returns
+    -------
+    `~numpy.ndarray`
+        The cube of new spectra.
+    """
+    shape = shape or data.shape
+    out = _check_output(out, shape)
+    processed = 0
+
+    for view in spaxel_tiles(shape, tile_spaxels):
+        tile = data[view]
+        tile = tile.reshape(shape[0], -1)
+        result = np.empty(tile.shape)
+
+        for i in range(tile.shape[1]):
+            result[:, i] = function(tile[:, i], spectral_axis)
+
+        out[view] = result.reshape(out[view].shape)
+
+        processed += _tile_size(view)
+
+        if tracker is not None:
+            tracker(processed)
+
+    return out
+
+
+def smooth_cube(data, kernel, size, shape=None, tile_spaxels=None, out=None,
+                tracker=None):
+    """
+    Smooth every spectrum of a cube, one tile of spaxels at a time.
+
+    Each tile is smoothed in a single operation along its spectral axis. The
+    result is identical to smoothing each spectrum with the corresponding
+    :mod:`specutils.manipulation.smoothing` function.
+
+    Parameters
+    ----------
+    data : array-like
+        The cube data, with the spectral axis first.
+    kernel : {'box', 'gaussian', 'trapezoid', 'median'}
+        The smoothing kernel.
+    size : int
+        The size of the kernel in pixels, i.e. the width, or the standard
+        deviation for the gaussian kernel.
+    shape : tuple, optional
+        The shape of the cube. Required if ``data`` has no ``shape``
+        attribute.
+    tile_spaxels : int, optional
+        The maximum number of spaxels processed at a time.
+    out : `~numpy.ndarray`, optional
+        The array into which the result is written, e.g. one created by
+        `allocate_output`. Must have the shape of the cube.
+    tracker : callable, optional
+        Called after each tile with the total number of processed spaxels.
+
+    Returns
+    -------
+    `~numpy.ndarray`
+        The smoothed cube.
+    """
+    if kernel not in SMOOTHING_KERNELS:
+        raise ValueError("Unknown smoothing kernel '{}', must be one of "
+                         "{}.".format(kernel, list(SMOOTHING_KERNELS)))
+
+    if not isinstance(size, (int, float)) or size <= 0:
+        raise ValueError("The kernel size, {}, must be a number greater "
+                         "than 0.".format(size))
+
+    smooth = SMOOTHING_KERNELS[kernel]
+
+    shape = shape or data.shape
+    out = _check_output(out, shape)
+    processed = 0
+
+    for view in spaxel_tiles(shape, tile_spaxels):
+        tile = np.asarray(data[view]).reshape(shape[0], -1)
+
+        out[view] = smooth(tile, size).reshape(out[view].shape)
+
+        processed += _tile_size(view)
+
+        if tracker is not None:
+            tracker(processed)
+
+    return out
@@ -1,4 +1,6 @@
 import os
+import uuid
+from functools import partial
 
 import numpy as np
 from glue.core import Component, Data, Subset
@@ -6,9 +8,10 @@ from glue.core.coordinates import WCSCoordinates
 from qtpy.QtWidgets import QDialog, QDialogButtonBox
 from qtpy.uic import loadUi
 from qtpy.QtCore import QThread, Signal
-from spectral_cube import BooleanArrayMask, SpectralCube
+from spectral_cube import BooleanArrayMask, LazyMask, SpectralCube
 
 from .workers import OperationWorker
+from ...core.lazy import get_spill_directory
 
 
 class SpectralOperationHandler(QDialog):
@@ -25,9 +28,22 @@ class SpectralOperationHandler(QDialog):
     function : :class:`specviz.analysis.operations.FunctionalOperation`
         Python class instance whose `call` function will be performed on the
         :class:`~spectral_cube.SpectralCube` object.
+    parallel : bool, optional
+        Whether the operation can be run in multiple processes. If `True`,
+        the user can choose the number of worker processes, which is passed
+        to the function as the ``workers`` keyword argument.
+
+    Notes
+    -----
+    The operation is always passed the ``tile_spaxels`` keyword argument,
+    the maximum number of spaxels to process at a time or `None` to choose
+    it automatically, and the ``filename`` keyword argument, the path of a
+    file in which to store the result as a memory-mapped array or `None` to
+    hold the result in memory.
     """
     def __init__(self, data, component_id, layout, function=None, func_proxy=None,
-                 stack=None, operation_name=None, ui_settings=None, *args, **kwargs):
+                 stack=None, operation_name=None, ui_settings=None,
+                 parallel=False, *args, **kwargs):
         super(SpectralOperationHandler, self).__init__(*args, **kwargs)
         self._data = data
         self._stack = stack
@@ -39,8 +55,10 @@ class SpectralOperationHandler(QDialog):
         self._operation_thread = None
         self._layout = layout
         self._ui_settings = ui_settings
+        self._parallel = parallel
 
         self._op_thread = None
+        self._op_worker = None
 
         self.setup_ui()
         self.setup_connections()
@@ -85,6 +103,12 @@ class SpectralOperationHandler(QDialog):
         self.data_component_combo_box.addItems(component_ids)
         self.data_component_combo_box.setCurrentIndex(cur_ind)
 
+        # Only show the worker count for operations that can run in parallel
+        self.workers_label.setVisible(self._parallel)
+        self.workers_spin_box.setVisible(self._parallel)
+        self.workers_spin_box.setMaximum(os.cpu_count() or 1)
+        self.workers_spin_box.setValue(os.cpu_count() or 1)
+
         # Disable the button box if there are no available operations
         if self._function is None:
             self.button_box.button(QDialogButtonBox.Ok).setEnabled(False)
@@ -110,13 +134,14 @@ class SpectralOperationHandler(QDialog):
         if issubclass(self._data.__class__, Subset):
             wcs = self._data.data.coords.wcs
             data = self._data.data
-            mask = self._data.to_mask()
+            mask = BooleanArrayMask(mask=self._data.to_mask(), wcs=wcs)
         else:
             wcs = self._data.coords.wcs
             data = self._data
-            mask = np.ones(self._data.shape).astype(bool)
-
-        mask = BooleanArrayMask(mask=mask, wcs=wcs)
+            # Evaluate the mask tile by tile instead of allocating a mask
+            # the size of the whole cube
+            mask = LazyMask(np.isfinite, data=data[self._component_id],
+                            wcs=wcs)
 
         return SpectralCube(data[self._component_id], wcs=wcs, mask=mask,
                             meta={'unit':self._data.get_component(self._component_id).units})
@@ -131,6 +156,10 @@ class SpectralOperationHandler(QDialog):
 
     def accept(self):
         """Called when the user clicks the "Okay" button of the dialog."""
+        # An aborted operation may still be winding down
+        if self._op_thread is not None:
+            return
+
         # Show the progress bar and abort button
         self.progress_bar.setEnabled(True)
         self.abort_button.setEnabled(True)
@@ -144,6 +173,20 @@ class SpectralOperationHandler(QDialog):
         else:
             op_func = self._function
 
+        if self._parallel:
+            op_func = partial(op_func, workers=self.workers_spin_box.value())
+
+        filename = None
+
+        if self.out_of_core_check_box.isChecked():
+            filename = os.path.join(get_spill_directory(),
+                                    "{}.dat".format(uuid.uuid4()))
+
+        # A tile size of zero lets the operation choose the tile size
+        op_func = partial(op_func,
+                          tile_spaxels=self.tile_size_spin_box.value() or None,
+                          filename=filename)
+
         self._op_thread = QThread()
 
         self._op_worker = OperationWorker(self._compose_cube(), op_func)
@@ -152,6 +195,9 @@ class SpectralOperationHandler(QDialog):
         self._op_worker.status.connect(self.on_status_updated)
 
         self._op_thread.started.connect(self._op_worker.run)
+        self._op_thread.finished.connect(self._op_worker.deleteLater)
+        self._op_thread.finished.connect(self._op_thread.deleteLater)
+        self._op_thread.finished.connect(self.on_thread_finished)
         self._op_thread.start()
 
         # data, unit = op_func(self._compose_cube(), None)
@@ -159,16 +205,33 @@ class SpectralOperationHandler(QDialog):
 
     def on_aborted(self):
         """Called when the user aborts the operation."""
-        self._op_thread.terminate()
+        # Flag the operation as aborted, which raises an error the next time
+        # it reports its progress and lets it cancel any queued work in
+        # worker processes before the thread exits. The thread is kept
+        # until it has finished, and a new operation can only be started
+        # from then on.
+        self._op_worker.abort()
+        self._op_thread.quit()
         self.progress_bar.reset()
+        self.progress_bar.setFormat("%p%")
 
         # Hide the progress bar and abort button
         self.abort_button.setEnabled(False)
 
-        self.button_box.button(QDialogButtonBox.Ok).setEnabled(True)
+    def on_thread_finished(self):
+        """
+        Called when the operation thread has exited, after the operation
+        completed or was aborted.
+        """
+        self._op_thread = None
+        self._op_worker = None
+
+        if self._function is not None:
+            self.button_box.button(QDialogButtonBox.Ok).setEnabled(True)
+
         self.button_box.button(QDialogButtonBox.Cancel).setEnabled(True)
 
-    def on_status_updated(self, value):
+    def on_status_updated(self, value, throughput=None, eta=None):
         """
         Called when the status of the operation has been updated. This can be
         optionally be passed a value to use as the new progress bar value.
@@ -176,10 +239,21 @@ class SpectralOperationHandler(QDialog):
         Parameters
         ----------
         value : float
-            The value passed to the :class:`~qtpy.QtWidgets.QProgressBar`
-            instance.
+            The completed fraction of the operation, used to set the value of
+            the :class:`~qtpy.QtWidgets.QProgressBar` instance.
+        throughput : float, optional
+            The number of spaxels processed per second.
+        eta : float, optional
+            The estimated number of seconds remaining. Negative if unknown.
         """
-        self.progress_bar.setValue(value * 100)
+        self.progress_bar.setValue(int(value * 100))
+
+        if throughput is None or eta is None or eta < 0:
+            self.progress_bar.setFormat("%p%")
+        else:
+            self.progress_bar.setFormat(
+                "%p% ({:.0f} spaxels/s, {:.0f} s remaining)".format(
+                    throughput, eta))
 
     def on_finished(self, data, unit=None):
         """
@@ -191,6 +265,10 @@ class SpectralOperationHandler(QDialog):
         data : ndarray
             The result of the operation performed on the `SpectralCube` object.
         """
+        # The operation may have completed just as it was aborted
+        if self._op_worker.aborted:
+            return
+
         component_name = "{} {}".format(self._component_id,
                                         self._operation_name)
 
@@ -1,24 +1,27 @@
 import logging
 
-import numpy as np
 from astropy.modeling.fitting import LevMarLSQFitter
 from qtpy.QtWidgets import QMessageBox
 
+from .engines import (allocate_output, apply_spectral_function, fit_cube,
+                      linemap, smooth_cube)
 from .operation_handler import SpectralOperationHandler
 from ...core.operations import FunctionalOperation
+from ...plugins.smoothing.smoothing_dialog import KERNEL_REGISTRY
 
 __all__ = ['simple_linemap', 'fitted_linemap', 'fit_spaxels',
            'spectral_smoothing']
 
 
-def simple_linemap(viewer):
-    def threadable_function(data, tracker, mask):
-        out = np.empty(shape=data.shape[1:])
-
-        for x in range(data.shape[1]):
-            for y in range(data.shape[2]):
-                out[x, y] = np.sum(data[:, x, y][mask])
-                tracker()
+def simple_linemap(viewer, statistic='sum'):
+    def threadable_function(data, tracker, mask, tile_spaxels=None,
+                            filename=None):
+        # Values excluded by the cube mask are filled with NaN
+        out = linemap(data.filled_data, spectral_mask=mask,
+                      statistic=statistic, shape=data.shape,
+                      tile_spaxels=tile_spaxels,
+                      out=allocate_output(data.shape[1:], filename),
+                      tracker=tracker)
 
         return out, data.meta.get('unit')
 
@@ -28,17 +31,19 @@ def simple_linemap(viewer):
 
     spectral_operation = SpectralOperationHandler(
         data=data,
-        function=lambda *args: threadable_function(*args, mask=mask),
-        operation_name="Simple Linemap",
+        function=lambda *args, **kwargs: threadable_function(
+            *args, mask=mask, **kwargs),
+        operation_name="Simple Linemap ({})".format(statistic.capitalize()),
         component_id=component_id,
         layout=viewer._layout,
         ui_settings={
             'title': "Simple Linemap",
             'group_box_title': "Choose the component to use for linemap "
                                 "generation",
-            'description': "Sums the values of the chosen component in the "
+            'description': "{} the values of the chosen component in the "
                             "range of the current ROI in the spectral view "
-                            "for each spectrum in the data cube."},
+                            "for each spectrum in the data cube.".format(
+                                "Sums" if statistic == 'sum' else "Averages")},
         parent=viewer)
 
     spectral_operation.exec_()
@@ -61,23 +66,14 @@ def fitted_linemap(viewer):
                             "linemap operation.")
         return
 
-    def threadable_function(data, tracker, spectral_axis, mask, model, fitter):
-        out = np.empty(shape=data.shape[1:])
-
-        for x in range(data.shape[1]):
-            for y in range(data.shape[2]):
-                flux = data[:, x, y].value
-
-                fit_model = fitter(model,
-                                   spectral_axis[mask],
-                                   flux[mask])
-
-                new_data = fit_model(spectral_axis[mask])
-
-                out[x, y] = np.sum(new_data)
-
-                if tracker is not None:
-                    tracker()
+    def threadable_function(data, tracker, spectral_axis, mask, model, fitter,
+                            workers=1, tile_spaxels=None, filename=None):
+        out = fit_cube(data.filled_data, model, spectral_axis,
+                       spectral_mask=mask, collapse=True, shape=data.shape,
+                       fitter=fitter, workers=workers,
+                       tile_spaxels=tile_spaxels,
+                       out=allocate_output(data.shape[1:], filename),
+                       tracker=tracker)
 
         return out, data.meta.get('unit')
 
@@ -90,12 +86,13 @@ def fitted_linemap(viewer):
     spectral_operation = SpectralOperationHandler(
         data=data,
         function=lambda *args, model=model, spectral_axis=spectral_axis, mask=mask,
-            fitter=LevMarLSQFitter(): threadable_function(
+            fitter=LevMarLSQFitter(), **kwargs: threadable_function(
             *args, model=model, spectral_axis=spectral_axis, mask=mask,
-            fitter=fitter),
+            fitter=fitter, **kwargs),
         operation_name="Fitted Linemap",
         component_id=component_id,
         layout=viewer._layout,
+        parallel=True,
         ui_settings={
             'title': "Fitted Linemap",
             'group_box_title': "Choose the component to use for linemap "
@@ -126,23 +123,13 @@ def fit_spaxels(viewer):
                             "linemap operation.")
         return
 
-    def threadable_function(data, tracker, spectral_axis, mask, model, fitter):
-        out = np.empty(shape=data.shape)
-
-        for x in range(data.shape[1]):
-            for y in range(data.shape[2]):
-                flux = data[:, x, y].value
-
-                fit_model = fitter(model,
-                                   spectral_axis[mask],
-                                   flux[mask])
-
-                new_data = fit_model(spectral_axis)
-
-                out[:, x, y] = new_data
-
-                if tracker is not None:
-                    tracker()
+    def threadable_function(data, tracker, spectral_axis, mask, model, fitter,
+                            workers=1, tile_spaxels=None, filename=None):
+        out = fit_cube(data.filled_data, model, spectral_axis,
+                       spectral_mask=mask, shape=data.shape, fitter=fitter,
+                       workers=workers, tile_spaxels=tile_spaxels,
+                       out=allocate_output(data.shape, filename),
+                       tracker=tracker)
 
         return out, data.meta.get('unit')
 
@@ -155,12 +142,13 @@ def fit_spaxels(viewer):
     spectral_operation = SpectralOperationHandler(
         data=data,
         function=lambda *args, model=model, spectral_axis=spectral_axis, mask=mask,
-            fitter=LevMarLSQFitter(): threadable_function(
+            fitter=LevMarLSQFitter(), **kwargs: threadable_function(
             *args, model=model, spectral_axis=spectral_axis, mask=mask,
-            fitter=fitter),
+            fitter=fitter, **kwargs),
         operation_name="Fit Spaxels",
         component_id=component_id,
         layout=viewer._layout,
+        parallel=True,
         ui_settings={
             'title': "Fit Spaxel",
             'group_box_title': "Choose the component to use for spaxel "
@@ -174,15 +162,39 @@ def fit_spaxels(viewer):
     spectral_operation.exec_()
 
 
+def _smoothing_kernel(operation):
+    """
+    Returns the key in ``KERNEL_REGISTRY`` of the smoothing function applied
+    by an operation, or `None` if it does not apply one of them.
+    """
+    # The smoothing dialog wraps the specutils function to accept arrays
+    function = getattr(operation.function, '__wrapped__', None)
+
+    if len(operation.args) != 1 or operation.kwargs:
+        return
+
+    for key, kernel in KERNEL_REGISTRY.items():
+        if kernel['function'] is function:
+            return key
+
+
 def spectral_smoothing(viewer):
-    def threadable_function(func, data, tracker):
-        out = np.empty(shape=data.shape)
-
-        for x in range(data.shape[1]):
-            for y in range(data.shape[2]):
-                out[:, x, y] = func(data[:, x, y],
-                                    data.spectral_axis)
-                tracker()
+    def threadable_function(func, data, tracker, tile_spaxels=None,
+                            filename=None):
+        out = allocate_output(data.shape, filename)
+        kernel = _smoothing_kernel(func)
+
+        # Smoothing operations are applied to whole tiles at once, anything
+        # else is replayed for each spectrum
+        if kernel is not None:
+            smooth_cube(data.filled_data, kernel, func.args[0],
+                        shape=data.shape, tile_spaxels=tile_spaxels, out=out,
+                        tracker=tracker)
+        else:
+            apply_spectral_function(data.filled_data, func,
+                                    data.spectral_axis, shape=data.shape,
+                                    tile_spaxels=tile_spaxels, out=out,
+                                    tracker=tracker)
 
         return out, data.meta.get('unit')
 
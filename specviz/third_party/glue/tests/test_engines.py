@@ -0,0 +1,207 @@
+import numpy as np
+import pytest
+from astropy import convolution
+from astropy.modeling.models import Gaussian1D
+from astropy.wcs import WCS
+from numpy.testing import assert_allclose, assert_array_equal
+from scipy.signal import medfilt
+from spectral_cube import BooleanArrayMask, SpectralCube
+
+from ..engines import (allocate_output, apply_spectral_function, fit_cube,
+                       linemap, smooth_cube, spaxel_tiles)
+
+
+def test_spaxel_tiles_cover_cube():
+    shape = (10, 7, 5)
+    covered = np.zeros(shape[1:], dtype=int)
+
+    for tile_spaxels in (1, 3, 5, 12, 100):
+        covered[:] = 0
+
+        for view in spaxel_tiles(shape, tile_spaxels):
+            covered[view[1:]] += 1
+
+        assert np.all(covered == 1)
+
+
+@pytest.mark.parametrize('statistic', ['sum', 'mean'])
+def test_linemap_matches_per_spaxel(statistic):
+    data = np.random.sample((20, 6, 4))
+    data[:, 2, 3] = np.nan
+    mask = np.zeros(20, dtype=bool)
+    mask[5:12] = True
+
+    progress = []
+    result = linemap(data, spectral_mask=mask, statistic=statistic,
+                     tile_spaxels=5, tracker=progress.append)
+
+    reduce = np.sum if statistic == 'sum' else np.mean
+    expected = np.empty(data.shape[1:])
+
+    for x in range(data.shape[1]):
+        for y in range(data.shape[2]):
+            expected[x, y] = reduce(data[:, x, y][mask])
+
+    assert_allclose(result, expected)
+    assert progress[-1] == 24
+
+
+def test_linemap_unknown_statistic():
+    with pytest.raises(ValueError):
+        linemap(np.ones((3, 2, 2)), statistic='median')
+
+
+@pytest.mark.parametrize('collapse', [False, True])
+def test_fit_cube_parallel_matches_serial(collapse):
+    spectral_axis = np.linspace(-5, 5, 50)
+    data = np.empty((50, 3, 4))
+
+    for x in range(data.shape[1]):
+        for y in range(data.shape[2]):
+            data[:, x, y] = Gaussian1D(amplitude=x + 1, mean=y * 0.5,
+                                       stddev=1)(spectral_axis)
+
+    model = Gaussian1D(amplitude=1, mean=0, stddev=1)
+    mask = spectral_axis > -4
+
+    serial = fit_cube(data, model, spectral_axis, spectral_mask=mask,
+                      collapse=collapse, tile_spaxels=5)
+    parallel = fit_cube(data, model, spectral_axis, spectral_mask=mask,
+                        collapse=collapse, tile_spaxels=5, workers=2)
+
+    assert serial.shape == (data.shape[1:] if collapse else data.shape)
+    assert_allclose(serial, parallel)
+
+    if not collapse:
+        assert_allclose(serial, data, atol=1e-6)
+
+
+def test_fit_cube_abort():
+    data = np.random.sample((20, 4, 4))
+
+    def tracker(value):
+        raise RuntimeError("Process aborted.")
+
+    with pytest.raises(RuntimeError):
+        fit_cube(data, Gaussian1D(), np.arange(20), workers=2, tracker=tracker)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_fit_cube_masked_subset(workers):
+    spectral_axis = np.linspace(-5, 5, 50)
+    data = np.empty((50, 2, 3))
+    data[:] = Gaussian1D(amplitude=2, mean=0.5, stddev=1)(
+        spectral_axis)[:, np.newaxis, np.newaxis]
+
+    # A subset selecting some spaxels entirely, and one only in part
+    subset = np.zeros(data.shape, dtype=bool)
+    subset[:, 0, :2] = True
+    subset[10:, 1, 2] = True
+
+    wcs = WCS(naxis=3)
+    wcs.wcs.ctype = ['RA---TAN', 'DEC--TAN', 'VELO-LSR']
+    cube = SpectralCube(data, wcs=wcs, mask=BooleanArrayMask(subset, wcs))
+
+    model = Gaussian1D(amplitude=1, mean=0, stddev=1)
+
+    result = fit_cube(cube.filled_data, model, spectral_axis,
+                      shape=cube.shape, workers=workers)
+
+    selected = subset.any(axis=0)
+
+    # Spaxels outside the subset are not fitted
+    assert np.all(np.isnan(result[:, ~selected]))
+    assert_allclose(result[:, selected], data[:, selected], atol=1e-6)
+
+    collapsed = fit_cube(cube.filled_data, model, spectral_axis,
+                         collapse=True, shape=cube.shape, workers=workers)
+
+    assert_array_equal(np.isnan(collapsed), ~selected)
+
+
+def test_fit_cube_failed_spaxel():
+    spectral_axis = np.linspace(-5, 5, 20)
+    data = np.repeat(Gaussian1D()(spectral_axis)[:, np.newaxis, np.newaxis],
+                     2, axis=2)
+
+    def fitter(model, x, y):
+        if y.max() > 1.5:
+            raise ValueError("Fit failed.")
+
+        return model
+
+    data[:, 0, 1] *= 2
+
+    result = fit_cube(data, Gaussian1D(), spectral_axis, collapse=True,
+                      fitter=fitter)
+
+    # Only the spaxel whose fit failed is left out
+    assert np.isfinite(result[0, 0])
+    assert np.isnan(result[0, 1])
+
+
+def test_memory_mapped_output(tmpdir):
+    data = np.random.sample((20, 6, 4))
+    filename = str(tmpdir.join('linemap.dat'))
+
+    out = allocate_output(data.shape[1:], filename)
+    result = linemap(data, tile_spaxels=3, out=out)
+
+    assert result is out
+    assert isinstance(result, np.memmap)
+    assert_allclose(result, data.sum(axis=0))
+
+    with pytest.raises(ValueError):
+        linemap(data, out=allocate_output(data.shape))
+
+
+def test_apply_spectral_function_matches_per_spaxel():
+    data = np.random.sample((20, 6, 4))
+    spectral_axis = np.arange(20)
+
+    def function(flux, spectral_axis):
+        return np.cumsum(flux) * spectral_axis
+
+    progress = []
+    result = apply_spectral_function(data, function, spectral_axis,
+                                     tile_spaxels=5, tracker=progress.append)
+
+    expected = np.empty(data.shape)
+
+    for x in range(data.shape[1]):
+        for y in range(data.shape[2]):
+            expected[:, x, y] = function(data[:, x, y], spectral_axis)
+
+    assert_allclose(result, expected)
+    assert progress[-1] == 24
+
+
+@pytest.mark.parametrize(('kernel', 'smooth'), [
+    ('box', lambda flux, size: convolution.convolve(
+        flux, convolution.Box1DKernel(size))),
+    ('gaussian', lambda flux, size: convolution.convolve(
+        flux, convolution.Gaussian1DKernel(size))),
+    ('trapezoid', lambda flux, size: convolution.convolve(
+        flux, convolution.Trapezoid1DKernel(size))),
+    ('median', medfilt)])
+def test_smooth_cube_matches_per_spaxel(kernel, smooth):
+    data = np.random.sample((50, 6, 4))
+    data[10:12, 2, 3] = np.nan
+
+    result = smooth_cube(data, kernel, 3, tile_spaxels=5)
+    expected = np.empty(data.shape)
+
+    # The per-spectrum computations of the specutils smoothing functions
+    for x in range(data.shape[1]):
+        for y in range(data.shape[2]):
+            expected[:, x, y] = smooth(data[:, x, y], 3)
+
+    assert_array_equal(result, expected)
+
+
+def test_smooth_cube_invalid_arguments():
+    with pytest.raises(ValueError):
+        smooth_cube(np.ones((3, 2, 2)), 'triangle', 3)
+
+    with pytest.raises(ValueError):
+        smooth_cube(np.ones((3, 2, 2)), 'box', 0)
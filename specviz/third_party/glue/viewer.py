@@ -432,6 +432,10 @@ class SpecvizDataViewer(DataViewer):
             act.triggered.connect(lambda: simple_linemap(self))
             menu.addAction(act)
 
+            act = QAction("Mean Linemap", self)
+            act.triggered.connect(lambda: simple_linemap(self, statistic='mean'))
+            menu.addAction(act)
+
             act = QAction("Fitted Linemap", self)
             act.triggered.connect(lambda: fitted_linemap(self))
             menu.addAction(act)
@@ -1,5 +1,9 @@
+import logging
+
 from qtpy.QtCore import Signal, QObject
 
+from ...core.progress import ProcessAborted, ProgressTracker
+
 
 class OperationWorker(QObject):
     """
@@ -13,8 +17,15 @@ class OperationWorker(QObject):
         The cube data on which the operation will be performed.
     function : callable
         The function-like callable used to perform the operation on the cube.
+
+    Signals
+    -------
+    status : Signal
+        Emitted with the completed fraction of the operation, the number of
+        spaxels processed per second, and the estimated number of seconds
+        remaining, or a negative number if unknown.
     """
-    status = Signal(float)
+    status = Signal(float, float, float)
     result = Signal(object, str)
     log = Signal(str)
 
@@ -27,7 +38,11 @@ class OperationWorker(QObject):
 
     def run(self):
         """Run the thread."""
-        new_data, unit = self._function(self._data, self._tracker)
+        try:
+            new_data, unit = self._function(self._data, self._tracker)
+        except ProcessAborted:
+            logging.info("Operation aborted.")
+            return
 
         self.result.emit(new_data, unit)
 
@@ -38,46 +53,24 @@ class OperationWorker(QObject):
         """
         self._tracker.abort()
 
-    def _on_tracker_update(self, value):
-        self.status.emit(value)
+    @property
+    def aborted(self):
+        """Whether the operation has been aborted."""
+        return self._tracker.aborted
+
+    def _on_tracker_update(self, tracker):
+        eta = tracker.eta
 
+        self.status.emit(tracker.percent_value, tracker.throughput,
+                         eta if eta is not None else -1)
 
-class SimpleProgressTracker:
+
+class SimpleProgressTracker(ProgressTracker):
     """
     Simple container object to track the progress of an operation occuring in a
     :class:`~qtpyt.QtCore.QThread` instance. It is designed to be passed to
     :class:`~spectral_cube.SpectralCube` object to be called while performing
     operations.
 
-    Attributes
-    ----------
-    total_value : float
-        The maximum value of the progress.
+    See :class:`~specviz.core.progress.ProgressTracker` for the parameters.
     """
-
-    def __init__(self, total_value, update=None):
-        self._current_value = 0.0
-        self._total_value = total_value
-        self._abort_flag = False
-        self._update = update
-
-    def __call__(self, value=None):
-        self._current_value = value or self._current_value + 1
-
-        if self._update is not None:
-            self._update(self.percent_value)
-
-        if self._abort_flag:
-            raise Exception("Process aborted.")
-
-    @property
-    def percent_value(self):
-        """Return the completion amount as a percentage."""
-        return self._current_value / self._total_value
-
-    def abort(self):
-        """
-        Set the abort flag which will raise an error causing the operation
-        to return immediately.
-        """
-        self._abort_flag = True
@@ -245,6 +245,9 @@ class PlotWidget(pg.PlotWidget):
     ----------
     plot_added : None
         Fired when a plot data item has been added to the plot widget.
+    plots_added : Signal
+        Fired once when several plot data items have been added to the plot
+        widget in a batch. Delivers the list of added plot data items.
     plot_removed : None
         Fired when a plot data item has been removed from the plot widget.
     roi_moved : Signal
@@ -255,6 +258,7 @@ class PlotWidget(pg.PlotWidget):
         Fired when mouse enters or exits the window. Delivers the event type.
     """
     plot_added = Signal(PlotDataItem)
+    plots_added = Signal(list)
     plot_removed = Signal(PlotDataItem)
     roi_moved = Signal(u.Quantity)
     roi_removed = Signal(LinearRegionItem)
@@ -307,6 +311,8 @@ class PlotWidget(pg.PlotWidget):
 
         # Listen for model events to add/remove items from the plot
         self.proxy_model.sourceModel().data_added.connect(self._check_unit_compatibility)
+        self.proxy_model.sourceModel().data_batch_added.connect(
+            self._check_batch_unit_compatibility)
         self.proxy_model.rowsAboutToBeRemoved.connect(
             lambda idx: self.remove_plot(index=idx))
 
@@ -481,6 +487,30 @@ class PlotWidget(pg.PlotWidget):
                                                    self.data_unit):
             plot_data_item.data_item.setEnabled(False)
 
+    def _check_batch_unit_compatibility(self, items):
+        for item in items:
+            self._check_unit_compatibility(item)
+
+    def _add_plot_item(self, item):
+        """
+        Converts the plot data item to the units of the plot, if possible, and
+        adds it and its uncertainties to the plot.
+        """
+        if item.are_units_compatible(self.spectral_axis_unit,
+                                               self.data_unit):
+            item.data_unit = self.data_unit
+            item.spectral_axis_unit = self.spectral_axis_unit
+        else:
+            item.reset_units()
+
+        # Include uncertainty item
+        if item.uncertainty is not None:
+            self.addItem(item.error_bar_item)
+
+        self.addItem(item)
+
+        item.data_item.plot_items.add(item)
+
     def add_plot(self, item=None, index=None, visible=True, initialize=False):
         """
         Adds a plot data item given an index in the current plot sub
@@ -503,18 +533,7 @@ class PlotWidget(pg.PlotWidget):
             item = self._proxy_model.item_from_index(index)
             item.visible = visible or self._visible
 
-        if item.are_units_compatible(self.spectral_axis_unit,
-                                               self.data_unit):
-            item.data_unit = self.data_unit
-            item.spectral_axis_unit = self.spectral_axis_unit
-        else:
-            item.reset_units()
-
-        # Include uncertainty item
-        if item.uncertainty is not None:
-            self.addItem(item.error_bar_item)
-
-        self.addItem(item)
+        self._add_plot_item(item)
 
         if initialize:
             self.initialize_plot(item.data_unit,
@@ -523,6 +542,58 @@ class PlotWidget(pg.PlotWidget):
         # Emit a plot added signal
         self.plot_added.emit(item)
 
+    def add_plots(self, items):
+        """
+        Adds several plot data items to the plot at once. Unit compatibility
+        is evaluated in a single pass and the plot range is updated once all
+        items have been added. If the plot is currently empty, the first
+        item defines the units of the plot.
+
+        Items that are not visible, or whose units are not compatible with
+        the plot, are not added.
+
+        Parameters
+        ----------
+        items : list
+            The :class:`~specviz.core.items.PlotDataItem` objects to add.
+
+        Returns
+        -------
+        list
+            The plot data items that were added to the plot.
+        """
+        plotted = set(self.listDataItems())
+        items = [item for item in items if item not in plotted]
+        initialize = len(plotted) == 0
+
+        if len(items) == 0:
+            return []
+
+        if initialize:
+            # The first item defines the units of the plot, to which any ROIs
+            # are converted
+            items[0].reset_units()
+            self.initialize_plot(items[0].data_unit,
+                                 items[0].spectral_axis_unit)
+
+        # Re-evaluate plot unit compatibilities, which hides incompatible items
+        self.check_plot_compatibility()
+
+        added = [item for item in items if item.visible]
+
+        # Avoid re-evaluating the view range for every item added, and
+        # range the view once all items have been added
+        self.disableAutoRange()
+
+        for item in added:
+            self._add_plot_item(item)
+
+        self.enableAutoRange()
+
+        self.plots_added.emit(added)
+
+        return added
+
     def initialize_plot(self, data_unit=None, spectral_axis_unit=None):
         """
         Routine to re-configure the display settings of the plot to fit the
@@ -607,6 +678,13 @@ class PlotWidget(pg.PlotWidget):
             if item.uncertainty is not None:
                 self.removeItem(item.error_bar_item)
 
+            # Unmap the arrays of lazily loaded spectra once they are no
+            # longer plotted in any plot window
+            item.data_item.plot_items.discard(item)
+
+            if len(item.data_item.plot_items) == 0:
+                item.data_item.release()
+
             # If there are no current plots, reset unit information for plot
             if len(self.listDataItems()) == 0:
                 self._data_unit = None
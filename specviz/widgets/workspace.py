@@ -15,6 +15,7 @@ from specutils import Spectrum1D, SpectrumList
 
 from .plotting import PlotWindow
 from ..core.items import PlotDataItem
+from ..core.lazy import LazySpectrum, SourceArrays
 from ..core.models import DataListModel
 from ..core.plugin import plugin
 from ..widgets.delegates import DataItemDelegate
@@ -415,14 +416,19 @@ class Workspace(QMainWindow):
                                                 filters=";;".join(filters))
         return file_path, loader_name_map[fmt]
 
-    def _load_spectra_by_name(self, specs_by_name):
-        data_items = []
+    def _load_spectra_by_name(self, specs_by_name, source=None):
+        # Spectra loaded from file are memory-mapped rather than kept in
+        # memory, from the file they were read from where possible and
+        # otherwise from a backing file. The spectra themselves are not
+        # referenced, so that their arrays are freed once the caller drops
+        # them.
+        lazy_by_name = OrderedDict(
+            (name, LazySpectrum.from_spectrum(spec, source=source))
+            for name, spec in specs_by_name.items())
 
-        for name, spec in specs_by_name.items():
-            data_items.append(self._add_and_plot_data(spec, name))
+        data_items = self.model.add_data_batch(lazy_by_name)
 
-        for di in data_items:
-            self.force_plot(di)
+        self.force_plot_batch(data_items)
 
         # TODO: is this return value useful? Potentially just for testing
         return data_items
@@ -465,7 +471,13 @@ class Workspace(QMainWindow):
             else:
                 specs_to_load = specs_by_name
 
-        return self._load_spectra_by_name(specs_to_load)
+            del specs_by_name
+
+        # Only keep references to the spectra to load
+        del speclist
+
+        with SourceArrays(file_path) as source:
+            return self._load_spectra_by_name(specs_to_load, source=source)
 
     def _on_load_data(self):
         """
@@ -681,6 +693,30 @@ class Workspace(QMainWindow):
         self.current_plot_window.plot_widget.on_item_changed(data_item)
         self._on_item_changed(item=plot_data_item.data_item)
 
+    def force_plot_batch(self, data_items):
+        """
+        Enable the checkboxes of, and plot, the
+        `~specviz.core.items.PlotDataItem` objects representing each of the
+        provided data items, adjusting the plot range once. The row of the
+        last plotted item is highlighted.
+
+        Parameters
+        ----------
+        data_items : list
+            The :class:`~specviz.core.items.DataItem` objects for which
+            specviz will force render the plots.
+        """
+        plot_data_items = [self.proxy_model.item_from_id(data_item.identifier)
+                           for data_item in data_items]
+
+        for plot_data_item in plot_data_items:
+            plot_data_item.visible = True
+
+        added = self.current_plot_window.plot_widget.add_plots(plot_data_items)
+
+        if len(added) > 0:
+            self._on_item_changed(item=added[-1].data_item)
+
     def _on_delete_data(self):
         """
         Listens for data deletion events from the